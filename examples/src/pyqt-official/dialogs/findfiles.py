@@ -42,13 +42,344 @@
 #############################################################################
 
 
-from PyQt5.QtCore import (QDir, QIODevice, QFile, QFileInfo, Qt, QTextStream,
-        QUrl)
+import array
+import concurrent.futures
+import os
+import queue
+
+from PyQt5.QtCore import (pyqtSignal, QAbstractTableModel, QDir,
+        QElapsedTimer, QModelIndex, Qt, QThread, QUrl)
 from PyQt5.QtGui import QDesktopServices
-from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QComboBox,
-        QDialog, QFileDialog, QGridLayout, QHBoxLayout, QHeaderView, QLabel,
-        QProgressDialog, QPushButton, QSizePolicy, QTableWidget,
-        QTableWidgetItem)
+from PyQt5.QtWidgets import (QAbstractItemView, QApplication, QCheckBox,
+        QComboBox, QDialog, QFileDialog, QGridLayout, QHBoxLayout,
+        QHeaderView, QLabel, QPushButton, QSizePolicy, QTableView)
+
+from findfilesindex import (ContentIndex, fileContains, ruledOutByIndex,
+        searchPatterns, walkFiles)
+
+
+class SearchThread(QThread):
+    # Found files are passed to the GUI in batches at most this often (in
+    # milliseconds).
+    BatchInterval = 100
+
+    filesFound = pyqtSignal(list)
+    progressChanged = pyqtSignal(int, int)
+
+    def __init__(self, parent=None):
+        super(SearchThread, self).__init__(parent)
+
+        self.path = ''
+        self.fileName = '*'
+        self.text = ''
+        self.useIndex = False
+        self.workerCount = max(1, QThread.idealThreadCount())
+        self.abort = False
+
+    def search(self, path, fileName, text, useIndex=False):
+        self.cancel()
+        self.wait()
+
+        self.path = path
+        self.fileName = fileName
+        self.text = text
+        self.useIndex = useIndex
+        self.abort = False
+        self.start()
+
+    def cancel(self):
+        self.abort = True
+
+    def run(self):
+        states = {}
+        candidates = None
+
+        if self.text:
+            patterns, utf16Patterns = searchPatterns(self.text)
+            pool = concurrent.futures.ThreadPoolExecutor(self.workerCount)
+
+            # Use the content index, if there is one, to rule out files.
+            if self.useIndex and ContentIndex.exists(self.path):
+                index = ContentIndex(self.path)
+                states = index.fileStates()
+                candidates = index.candidates(patterns + utf16Patterns)
+                index.close()
+        else:
+            pool = None
+
+        # Bound the number of files queued on the pool so that walking a
+        # huge tree does not get too far ahead of the search.
+        maxPending = 4 * self.workerCount
+        self.pending = {}
+        self.batch = []
+        self.scanned = 0
+        self.found = 0
+        self.elapsed = QElapsedTimer()
+        self.elapsed.start()
+
+        for fileName in walkFiles(self.path, self.fileName,
+                lambda: self.abort):
+            if self.abort:
+                break
+
+            if pool is None:
+                self.scanned += 1
+                self.found += 1
+                self.batch.append(fileName)
+            elif ruledOutByIndex(self.path, fileName, states, candidates):
+                self.scanned += 1
+            else:
+                future = pool.submit(fileContains,
+                        os.path.join(self.path, fileName), patterns,
+                        utf16Patterns)
+                self.pending[future] = fileName
+
+                while len(self.pending) >= maxPending and not self.abort:
+                    self.collectResults()
+
+            self.emitBatch(False)
+
+        while self.pending and not self.abort:
+            self.collectResults()
+            self.emitBatch(False)
+
+        if pool is not None:
+            for future in self.pending:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+        # Report any files already found, even if the search was stopped, so
+        # that the count agrees with the list.
+        self.emitBatch(True)
+        self.progressChanged.emit(self.scanned, self.found)
+
+    def collectResults(self):
+        done, _ = concurrent.futures.wait(self.pending, timeout=0.1,
+                return_when=concurrent.futures.FIRST_COMPLETED)
+
+        for future in done:
+            fileName = self.pending.pop(future)
+            self.scanned += 1
+
+            if future.result():
+                self.found += 1
+                self.batch.append(fileName)
+
+    def emitBatch(self, force):
+        if not self.batch:
+            return
+
+        if force or self.elapsed.elapsed() >= SearchThread.BatchInterval:
+            self.filesFound.emit(self.batch)
+            self.progressChanged.emit(self.scanned, self.found)
+            self.batch = []
+            self.elapsed.restart()
+
+
+class IndexThread(QThread):
+    indexUpdated = pyqtSignal(int, int, float)
+
+    def __init__(self, parent=None):
+        super(IndexThread, self).__init__(parent)
+
+        self.path = ''
+        self.abort = False
+
+    def update(self, path):
+        self.cancel()
+        self.wait()
+
+        self.path = path
+        self.abort = False
+        self.start(QThread.LowPriority)
+
+    def cancel(self):
+        self.abort = True
+
+    def run(self):
+        elapsed = QElapsedTimer()
+        elapsed.start()
+
+        index = ContentIndex(self.path)
+        updated, removed = index.update(lambda: self.abort)
+        index.close()
+
+        if not self.abort:
+            self.indexUpdated.emit(updated, removed, elapsed.elapsed() / 1000.0)
+
+
+class SizeThread(QThread):
+    sizesFound = pyqtSignal(int, int, list)
+
+    def __init__(self, parent=None):
+        super(SizeThread, self).__init__(parent)
+
+        self.requests = queue.Queue()
+
+    def requestSizes(self, generation, path, first, fileNames):
+        """Ask for the sizes of some files to be found.  They are passed back
+        with sizesFound() together with the generation and the storage index
+        of the first file.
+        """
+
+        self.requests.put((generation, path, first, fileNames))
+
+        if not self.isRunning():
+            self.start(QThread.LowPriority)
+
+    def stop(self):
+        self.requests.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+
+            generation, path, first, fileNames = request
+            sizes = []
+
+            for fileName in fileNames:
+                try:
+                    sizes.append(os.stat(os.path.join(path, fileName)).st_size)
+                except OSError:
+                    sizes.append(0)
+
+            self.sizesFound.emit(generation, first, sizes)
+
+
+class FilesModel(QAbstractTableModel):
+    """A model of the files found by a search.  The names and sizes are
+    kept in separate columns in the order the files were found and the view
+    order is a permutation of them, so sorting never moves the data itself.
+    """
+
+    UnknownSize = -1
+
+    def __init__(self, parent=None):
+        super(FilesModel, self).__init__(parent)
+
+        self.path = ''
+        self.names = []
+        self.sizes = array.array('q')
+        self.order = array.array('q')
+        self.generation = 0
+        self.sortColumn = -1
+        self.sortOrder = Qt.AscendingOrder
+
+        self.sizeThread = SizeThread(self)
+        self.sizeThread.sizesFound.connect(self.setSizes)
+
+    def clear(self, path):
+        self.beginResetModel()
+        self.path = path
+        self.names = []
+        self.sizes = array.array('q')
+        self.order = array.array('q')
+        self.generation += 1
+        self.endResetModel()
+
+    def addFiles(self, fileNames):
+        first = len(self.names)
+        last = first + len(fileNames) - 1
+
+        self.beginInsertRows(QModelIndex(), first, last)
+        self.names.extend(fileNames)
+        self.sizes.extend([FilesModel.UnknownSize] * len(fileNames))
+        self.order.extend(range(first, last + 1))
+        self.endInsertRows()
+
+        self.sizeThread.requestSizes(self.generation, self.path, first,
+                fileNames)
+
+    def setSizes(self, generation, first, sizes):
+        if generation != self.generation:
+            return
+
+        self.sizes[first:first + len(sizes)] = array.array('q', sizes)
+
+        # The rows may have been sorted so just refresh the whole column, the
+        # view only repaints what is visible.
+        self.dataChanged.emit(self.index(0, 1),
+                self.index(len(self.names) - 1, 1))
+
+    def fileName(self, row):
+        return self.names[self.order[row]]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self.names)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return 2
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if role == Qt.DisplayRole:
+            item = self.order[index.row()]
+
+            if index.column() == 0:
+                return self.names[item]
+
+            size = self.sizes[item]
+            if size == FilesModel.UnknownSize:
+                return "..."
+
+            return "%d KB" % (int((size + 1023) / 1024))
+
+        if role == Qt.TextAlignmentRole and index.column() == 1:
+            return Qt.AlignVCenter | Qt.AlignRight
+
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return ("File Name", "Size")[section]
+
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sortColumn = column
+        self.sortOrder = order
+
+        if column == 0:
+            key = self.names.__getitem__
+        elif column == 1:
+            key = self.sizes.__getitem__
+        else:
+            key = None
+
+        self.layoutAboutToBeChanged.emit()
+
+        oldOrder = self.order
+        persistent = self.persistentIndexList()
+        persistentItems = [oldOrder[index.row()] for index in persistent]
+
+        items = range(len(self.names))
+        if key is not None:
+            items = sorted(items, key=key, reverse=(order == Qt.DescendingOrder))
+
+        self.order = array.array('q', items)
+
+        # Keep the selection and current item on the same files.
+        if persistent:
+            rows = array.array('q', bytes(8 * len(self.order)))
+            for row, item in enumerate(self.order):
+                rows[item] = row
+
+            self.changePersistentIndexList(persistent,
+                    [self.index(rows[item], index.column())
+                            for item, index in zip(persistentItems, persistent)])
+
+        self.layoutChanged.emit()
 
 
 class Window(QDialog):
@@ -56,7 +387,11 @@ class Window(QDialog):
         super(Window, self).__init__(parent)
 
         browseButton = self.createButton("&Browse...", self.browse)
-        findButton = self.createButton("&Find", self.find)
+        self.findButton = self.createButton("&Find", self.find)
+        self.stopButton = self.createButton("&Stop", self.stop)
+        self.stopButton.setEnabled(False)
+        self.indexButton = self.createButton("&Index", self.updateIndex)
+        self.useIndexCheckBox = QCheckBox("&Use content index")
 
         self.fileComboBox = self.createComboBox("*")
         self.textComboBox = self.createComboBox()
@@ -66,12 +401,27 @@ class Window(QDialog):
         textLabel = QLabel("Containing text:")
         directoryLabel = QLabel("In directory:")
         self.filesFoundLabel = QLabel()
+        self.indexLabel = QLabel()
 
         self.createFilesTable()
 
+        self.searchThread = SearchThread(self)
+        self.searchThread.filesFound.connect(self.filesModel.addFiles)
+        self.searchThread.progressChanged.connect(self.updateProgress)
+        self.searchThread.finished.connect(self.searchFinished)
+        self.scannedCount = 0
+        self.foundCount = 0
+
+        self.indexThread = IndexThread(self)
+        self.indexThread.indexUpdated.connect(self.indexUpdated)
+
         buttonsLayout = QHBoxLayout()
+        buttonsLayout.addWidget(self.useIndexCheckBox)
+        buttonsLayout.addWidget(self.indexButton)
+        buttonsLayout.addWidget(self.indexLabel)
         buttonsLayout.addStretch()
-        buttonsLayout.addWidget(findButton)
+        buttonsLayout.addWidget(self.findButton)
+        buttonsLayout.addWidget(self.stopButton)
 
         mainLayout = QGridLayout()
         mainLayout.addWidget(fileLabel, 0, 0)
@@ -105,8 +455,6 @@ class Window(QDialog):
             comboBox.addItem(comboBox.currentText())
 
     def find(self):
-        self.filesTable.setRowCount(0)
-
         fileName = self.fileComboBox.currentText()
         text = self.textComboBox.currentText()
         path = self.directoryComboBox.currentText()
@@ -118,63 +466,51 @@ class Window(QDialog):
         self.currentDir = QDir(path)
         if not fileName:
             fileName = "*"
-        files = self.currentDir.entryList([fileName],
-                QDir.Files | QDir.NoSymLinks)
-
-        if text:
-            files = self.findFiles(files, text)
-        self.showFiles(files)
 
-    def findFiles(self, files, text):
-        progressDialog = QProgressDialog(self)
+        self.filesModel.clear(self.currentDir.absolutePath())
 
-        progressDialog.setCancelButtonText("&Cancel")
-        progressDialog.setRange(0, files.count())
-        progressDialog.setWindowTitle("Find Files")
+        self.scannedCount = 0
+        self.foundCount = 0
+        self.filesFoundLabel.setText("Searching...")
+        self.findButton.setEnabled(False)
+        self.stopButton.setEnabled(True)
 
-        foundFiles = []
-
-        for i in range(files.count()):
-            progressDialog.setValue(i)
-            progressDialog.setLabelText("Searching file number %d of %d..." % (i, files.count()))
-            QApplication.processEvents()
-
-            if progressDialog.wasCanceled():
-                break
+        # The search runs in the background and the results are added to the
+        # table as they are found.
+        self.searchThread.search(self.currentDir.absolutePath(), fileName,
+                text, self.useIndexCheckBox.isChecked())
 
-            inFile = QFile(self.currentDir.absoluteFilePath(files[i]))
+    def updateIndex(self):
+        path = QDir(self.directoryComboBox.currentText()).absolutePath()
 
-            if inFile.open(QIODevice.ReadOnly):
-                stream = QTextStream(inFile)
-                while not stream.atEnd():
-                    if progressDialog.wasCanceled():
-                        break
-                    line = stream.readLine()
-                    if text in line:
-                        foundFiles.append(files[i])
-                        break
+        self.updateComboBox(self.directoryComboBox)
+        self.indexButton.setEnabled(False)
+        self.indexLabel.setText("Indexing...")
+        self.indexThread.update(path)
 
-        progressDialog.close()
+    def indexUpdated(self, updated, removed, seconds):
+        self.indexButton.setEnabled(True)
+        self.indexLabel.setText("%d file(s) indexed, %d removed in %.2fs" % (updated, removed, seconds))
 
-        return foundFiles
+    def stop(self):
+        self.searchThread.cancel()
 
-    def showFiles(self, files):
-        for fn in files:
-            file = QFile(self.currentDir.absoluteFilePath(fn))
-            size = QFileInfo(file).size()
+    def updateProgress(self, scanned, found):
+        self.scannedCount = scanned
+        self.foundCount = found
 
-            fileNameItem = QTableWidgetItem(fn)
-            fileNameItem.setFlags(fileNameItem.flags() ^ Qt.ItemIsEditable)
-            sizeItem = QTableWidgetItem("%d KB" % (int((size + 1023) / 1024)))
-            sizeItem.setTextAlignment(Qt.AlignVCenter | Qt.AlignRight)
-            sizeItem.setFlags(sizeItem.flags() ^ Qt.ItemIsEditable)
+        if self.searchThread.isRunning():
+            self.filesFoundLabel.setText(
+                    "Searching... %d file(s) found, %d searched" % (found, scanned))
 
-            row = self.filesTable.rowCount()
-            self.filesTable.insertRow(row)
-            self.filesTable.setItem(row, 0, fileNameItem)
-            self.filesTable.setItem(row, 1, sizeItem)
+    def searchFinished(self):
+        # Files found since the view was sorted were added at the end.
+        self.filesModel.sort(self.filesModel.sortColumn,
+                self.filesModel.sortOrder)
 
-        self.filesFoundLabel.setText("%d file(s) found (Double click on a file to open it)" % len(files))
+        self.findButton.setEnabled(True)
+        self.stopButton.setEnabled(False)
+        self.filesFoundLabel.setText("%d file(s) found (Double click on a file to open it)" % self.foundCount)
 
     def createButton(self, text, member):
         button = QPushButton(text)
@@ -189,20 +525,35 @@ class Window(QDialog):
         return comboBox
 
     def createFilesTable(self):
-        self.filesTable = QTableWidget(0, 2)
+        self.filesModel = FilesModel(self)
+
+        self.filesTable = QTableView()
+        self.filesTable.setModel(self.filesModel)
         self.filesTable.setSelectionBehavior(QAbstractItemView.SelectRows)
 
-        self.filesTable.setHorizontalHeaderLabels(("File Name", "Size"))
         self.filesTable.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
         self.filesTable.verticalHeader().hide()
         self.filesTable.setShowGrid(False)
 
-        self.filesTable.cellActivated.connect(self.openFileOfItem)
+        # Start in the order the files are found.
+        self.filesTable.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.filesTable.setSortingEnabled(True)
+
+        self.filesTable.activated.connect(self.openFileOfItem)
+
+    def closeEvent(self, event):
+        self.searchThread.cancel()
+        self.indexThread.cancel()
+        self.searchThread.wait()
+        self.indexThread.wait()
+        self.filesModel.sizeThread.stop()
+
+        super(Window, self).closeEvent(event)
 
-    def openFileOfItem(self, row, column):
-        item = self.filesTable.item(row, 0)
+    def openFileOfItem(self, index):
+        fileName = self.filesModel.fileName(index.row())
 
-        QDesktopServices.openUrl(QUrl(self.currentDir.absoluteFilePath(item.text())))
+        QDesktopServices.openUrl(QUrl(self.currentDir.absoluteFilePath(fileName)))
 
 
 if __name__ == '__main__':
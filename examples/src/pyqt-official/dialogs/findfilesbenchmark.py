@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure the Find Files content index.
+
+A temporary index is built for a directory, then updated again when nothing
+has changed.  For each piece of text the best time of searching the
+directory with and without the index is reported.
+"""
+
+
+import os
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser,
+        QCoreApplication)
+
+from findfilesindex import ContentIndex, searchDirectory
+
+
+def bestTime(repeat, function, *args):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best, result
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription("Benchmark the Find Files content index.")
+    parser.addHelpOption()
+    repeatOption = QCommandLineOption(['r', 'repeat'],
+            "Report the best of <count> queries.", 'count', '3')
+    parser.addOption(repeatOption)
+    parser.addPositionalArgument('directory', "The directory to index.")
+    parser.addPositionalArgument('text', "The text to search for.", "text...")
+    parser.process(app)
+
+    arguments = parser.positionalArguments()
+    if len(arguments) < 2:
+        parser.showHelp(1)
+
+    path = os.path.abspath(arguments[0])
+    repeat = int(parser.value(repeatOption))
+
+    indexDir = tempfile.mkdtemp()
+    index = ContentIndex(path, os.path.join(indexDir, 'index.sqlite'))
+
+    start = time.perf_counter()
+    updated, _ = index.update()
+    print("build:  %d files in %.2fs" % (updated, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    updated, removed = index.update()
+    print("update: %d files changed, %d removed in %.2fs" % (updated, removed,
+            time.perf_counter() - start))
+
+    print("%-24s %8s %12s %12s" % ("query", "found", "unindexed", "indexed"))
+
+    for text in arguments[1:]:
+        unindexed, _ = bestTime(repeat, searchDirectory, path, text)
+        indexed, found = bestTime(repeat, searchDirectory, path, text, index)
+
+        print("%-24s %8d %10.1fms %10.1fms" % (text, len(found),
+                unindexed * 1000, indexed * 1000))
+
+    index.close()
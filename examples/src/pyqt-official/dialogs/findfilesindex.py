@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Content searching for the Find Files example, and a persistent trigram
+index of the contents of a directory tree.
+
+The index records, for every byte trigram, the files that contain it.  A
+search only needs to verify the files that contain all the trigrams of the
+text being looked for.  Files are re-indexed when their modification time or
+size changes.
+"""
+
+
+import array
+import fnmatch
+import hashlib
+import mmap
+import os
+import sqlite3
+import stat
+
+from PyQt5.QtCore import QDir, QStandardPaths
+
+
+def searchPatterns(text):
+    """Return the byte strings to look for in ordinary files and in files
+    that start with a UTF-16 byte order mark.
+    """
+
+    patterns = [text.encode('utf-8')]
+
+    # Fall back to Latin-1 for non-ASCII text that has a different encoding.
+    try:
+        latin1 = text.encode('latin-1')
+    except UnicodeEncodeError:
+        pass
+    else:
+        if latin1 not in patterns:
+            patterns.append(latin1)
+
+    utf16Patterns = [text.encode('utf-16-le'), text.encode('utf-16-be')]
+
+    return patterns, utf16Patterns
+
+
+def fileContains(fileName, patterns, utf16Patterns):
+    """Return True if a file contains any of the patterns.  The file is
+    memory mapped so that it is searched without being read into Python.
+    """
+
+    try:
+        with open(fileName, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:2] in (b'\xff\xfe', b'\xfe\xff'):
+                    patterns = utf16Patterns
+
+                for pattern in patterns:
+                    if data.find(pattern) >= 0:
+                        return True
+    except (OSError, ValueError):
+        # The file could not be opened or is empty.
+        pass
+
+    return False
+
+
+def walkFiles(path, pattern='*', isCancelled=None):
+    """Yield the paths, relative to path, of the regular files in the
+    directory tree whose names match pattern.  Symbolic links are not
+    followed and FIFOs, sockets and device nodes are skipped as opening them
+    may block.
+    """
+
+    for dirPath, dirNames, fileNames in os.walk(path):
+        if isCancelled is not None and isCancelled():
+            return
+
+        dirNames.sort()
+        relDir = os.path.relpath(dirPath, path)
+
+        for fileName in sorted(fileNames):
+            if not fnmatch.fnmatch(fileName, pattern):
+                continue
+
+            try:
+                mode = os.lstat(os.path.join(dirPath, fileName)).st_mode
+            except OSError:
+                continue
+
+            if not stat.S_ISREG(mode):
+                continue
+
+            if relDir == os.curdir:
+                yield fileName
+            else:
+                yield os.path.join(relDir, fileName)
+
+
+def trigrams(data):
+    """Return the set of byte trigrams of some data, each packed into an
+    integer.
+    """
+
+    return {(a << 16) | (b << 8) | c for a, b, c in zip(data, data[1:], data[2:])}
+
+
+class ContentIndex(object):
+    # Larger files, and files that look binary because there is a NUL byte
+    # in their first block, are recorded but not indexed so they are always
+    # searched.
+    MaxIndexedSize = 16 * 1024 * 1024
+    BinaryCheckSize = 8192
+
+    # New postings are collected in memory and written as one row per trigram
+    # holding the ids of all the files that contain it.
+    MaxPendingPostings = 1 << 22
+
+    # When a trigram has this many rows they are merged into one and the ids
+    # of files no longer in the index are dropped.
+    MaxPostingRows = 32
+
+    def __init__(self, path, indexFileName=None):
+        self.path = os.path.abspath(path)
+
+        if indexFileName is None:
+            indexFileName = ContentIndex.defaultIndexFileName(self.path)
+
+        self.indexFileName = indexFileName
+        self.pendingPostings = {}
+        self.pendingCount = 0
+
+        self.connection = sqlite3.connect(indexFileName)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                path TEXT UNIQUE,
+                mtime INTEGER,
+                size INTEGER,
+                indexed INTEGER);
+            CREATE TABLE IF NOT EXISTS postings (
+                trigram INTEGER,
+                flush INTEGER,
+                fileIds BLOB,
+                PRIMARY KEY (trigram, flush)) WITHOUT ROWID;
+        """)
+
+    @staticmethod
+    def defaultIndexFileName(path):
+        """Return the name of the index file of a directory in the user's
+        cache directory.
+        """
+
+        cacheDir = QStandardPaths.writableLocation(
+                QStandardPaths.CacheLocation)
+        QDir().mkpath(cacheDir)
+        digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+
+        return os.path.join(cacheDir, 'findfiles-%s.sqlite' % digest)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(ContentIndex.defaultIndexFileName(path))
+
+    def close(self):
+        self.connection.close()
+
+    def fileStates(self):
+        """Return a dict of the id, modification time, size and whether the
+        contents are indexed of every file in the index keyed by relative
+        path.
+        """
+
+        return {path: (fileId, mtime, size, indexed)
+                for fileId, path, mtime, size, indexed in self.connection.execute(
+                        "SELECT id, path, mtime, size, indexed FROM files")}
+
+    def update(self, isCancelled=None):
+        """Bring the index up to date with the directory tree.  Return a tuple
+        of the number of files (re-)indexed and the number removed.
+        """
+
+        states = self.fileStates()
+        updated = 0
+        removed = 0
+        cancelled = False
+
+        for fileName in walkFiles(self.path, isCancelled=isCancelled):
+            if isCancelled is not None and isCancelled():
+                cancelled = True
+                break
+
+            # The walk only yields regular files but one may have been
+            # replaced since, and reading a FIFO would block.
+            try:
+                fileStat = os.lstat(os.path.join(self.path, fileName))
+            except OSError:
+                continue
+
+            if not stat.S_ISREG(fileStat.st_mode):
+                continue
+
+            state = states.pop(fileName, None)
+            if state is not None and state[1:3] == (fileStat.st_mtime_ns, fileStat.st_size):
+                continue
+
+            self.indexFile(fileName, fileStat, state)
+            updated += 1
+
+            if self.pendingCount >= ContentIndex.MaxPendingPostings:
+                self.flush()
+
+        # Forget the files that have been removed unless the walk was
+        # interrupted.
+        if not cancelled:
+            for fileId, _, _, _ in states.values():
+                self.removeFile(fileId)
+                removed += 1
+
+        self.flush()
+
+        return updated, removed
+
+    def indexFile(self, fileName, fileStat, state):
+        indexed = fileStat.st_size <= ContentIndex.MaxIndexedSize
+        fileTrigrams = ()
+
+        if indexed:
+            try:
+                with open(os.path.join(self.path, fileName), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                indexed = False
+            else:
+                if b'\0' in data[:ContentIndex.BinaryCheckSize]:
+                    indexed = False
+                else:
+                    fileTrigrams = trigrams(data)
+
+        # A changed file is given a new id so that its old postings are
+        # ignored.
+        if state is not None:
+            self.removeFile(state[0])
+
+        cursor = self.connection.execute(
+                "INSERT INTO files (path, mtime, size, indexed) VALUES (?, ?, ?, ?)",
+                (fileName, fileStat.st_mtime_ns, fileStat.st_size, int(indexed)))
+        fileId = cursor.lastrowid
+
+        for trigram in fileTrigrams:
+            fileIds = self.pendingPostings.get(trigram)
+            if fileIds is None:
+                self.pendingPostings[trigram] = fileIds = array.array('q')
+
+            fileIds.append(fileId)
+
+        self.pendingCount += len(fileTrigrams)
+
+    def removeFile(self, fileId):
+        # The file's postings are dropped when they are next merged.
+        self.connection.execute("DELETE FROM files WHERE id = ?", (fileId, ))
+
+    def flush(self):
+        """Write the collected postings and commit the changes so that
+        searches see them.
+        """
+
+        if self.pendingPostings:
+            flush, = self.connection.execute(
+                    "SELECT COALESCE(MAX(flush), 0) + 1 FROM postings").fetchone()
+
+            self.connection.executemany(
+                    "INSERT INTO postings (trigram, flush, fileIds) VALUES (?, ?, ?)",
+                    ((trigram, flush, fileIds.tobytes())
+                            for trigram, fileIds in sorted(self.pendingPostings.items())))
+
+            self.pendingPostings = {}
+            self.pendingCount = 0
+
+            if flush >= ContentIndex.MaxPostingRows:
+                self.merge()
+
+        self.connection.commit()
+
+    def merge(self):
+        """Merge the rows of each trigram into one, dropping the ids of files
+        that are no longer in the index.
+        """
+
+        liveIds = {row[0] for row in self.connection.execute(
+                "SELECT id FROM files")}
+        merged = []
+
+        for trigram, fileIds in self.postings():
+            fileIds = array.array('q', sorted(fileIds & liveIds))
+            if fileIds:
+                merged.append((trigram, 1, fileIds.tobytes()))
+
+        self.connection.execute("DELETE FROM postings")
+        self.connection.executemany(
+                "INSERT INTO postings (trigram, flush, fileIds) VALUES (?, ?, ?)",
+                merged)
+
+    def postings(self):
+        """Yield each trigram and the set of ids of the files containing it,
+        in trigram order.
+        """
+
+        trigram = None
+        fileIds = set()
+
+        for rowTrigram, data in self.connection.execute(
+                "SELECT trigram, fileIds FROM postings ORDER BY trigram"):
+            if rowTrigram != trigram:
+                if trigram is not None:
+                    yield trigram, fileIds
+
+                trigram = rowTrigram
+                fileIds = set()
+
+            fileIds.update(array.array('q', data))
+
+        if trigram is not None:
+            yield trigram, fileIds
+
+    def filesContaining(self, trigram):
+        fileIds = set()
+
+        for data, in self.connection.execute(
+                "SELECT fileIds FROM postings WHERE trigram = ?", (trigram, )):
+            fileIds.update(array.array('q', data))
+
+        return fileIds
+
+    def candidates(self, patterns):
+        """Return the set of ids of the indexed files that may contain any of
+        the patterns, or None if a pattern is too short for the index to
+        narrow the search.
+        """
+
+        fileIds = set()
+
+        for pattern in patterns:
+            if len(pattern) < 3:
+                return None
+
+            matches = None
+
+            for trigram in trigrams(pattern):
+                files = self.filesContaining(trigram)
+
+                matches = files if matches is None else matches & files
+                if not matches:
+                    break
+
+            fileIds |= matches
+
+        return fileIds
+
+
+def ruledOutByIndex(path, fileName, states, candidates):
+    """Return True if an index shows that a file cannot contain the text
+    being searched for.  states and candidates are the results of the
+    index's fileStates() and candidates().  A file that has changed since it
+    was indexed is never ruled out.
+    """
+
+    if candidates is None:
+        return False
+
+    state = states.get(fileName)
+    if state is None or not state[3] or state[0] in candidates:
+        return False
+
+    try:
+        fileStat = os.stat(os.path.join(path, fileName))
+    except OSError:
+        return False
+
+    return state[1:3] == (fileStat.st_mtime_ns, fileStat.st_size)
+
+
+def searchDirectory(path, text, index=None):
+    """Return the sorted relative paths of the files in a directory tree that
+    contain some text, using an index to narrow the files searched if one is
+    given.
+    """
+
+    patterns, utf16Patterns = searchPatterns(text)
+
+    if index is not None:
+        states = index.fileStates()
+        candidates = index.candidates(patterns + utf16Patterns)
+    else:
+        states = {}
+        candidates = None
+
+    found = []
+
+    for fileName in walkFiles(path):
+        if ruledOutByIndex(path, fileName, states, candidates):
+            continue
+
+        if fileContains(os.path.join(path, fileName), patterns,
+                utf16Patterns):
+            found.append(fileName)
+
+    return found
+
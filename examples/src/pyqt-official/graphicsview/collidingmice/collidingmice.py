@@ -44,8 +44,8 @@
 
 import math
 
-from PyQt5.QtCore import (qAbs, QLineF, QPointF, QRectF, qrand, qsrand, Qt,
-        QTime, QTimer)
+from PyQt5.QtCore import (qAbs, QCommandLineOption, QCommandLineParser,
+        QLineF, QPointF, QRectF, qrand, qsrand, Qt, QTime, QTimer)
 from PyQt5.QtGui import (QBrush, QColor, QPainter, QPainterPath, QPixmap,
         QPolygonF)
 from PyQt5.QtWidgets import (QApplication, QGraphicsItem, QGraphicsScene,
@@ -53,6 +53,11 @@ from PyQt5.QtWidgets import (QApplication, QGraphicsItem, QGraphicsScene,
 
 import mice_rc
 
+try:
+    from mousesimulation import MouseSimulation
+except ImportError:
+    MouseSimulation = None
+
 
 class Mouse(QGraphicsItem):
     Pi = math.pi
@@ -62,12 +67,16 @@ class Mouse(QGraphicsItem):
     adjust = 0.5
     BoundingRect = QRectF(-20 - adjust, -22 - adjust, 40 + adjust, 83 + adjust)
 
-    def __init__(self):
+    def __init__(self, animated=True):
         super(Mouse, self).__init__()
 
         self.angle = 0.0
         self.speed = 0.0
         self.mouseEyeDirection = 0.0
+
+        # Set by a MouseSimulation, otherwise the scene is asked.
+        self.colliding = None
+
         self.color = QColor(qrand() % 256, qrand() % 256, qrand() % 256)
 
         self.setRotation(qrand() % (360 * 16))
@@ -75,10 +84,12 @@ class Mouse(QGraphicsItem):
         # In the C++ version of this example, this class is also derived from
         # QObject in order to receive timer events.  PyQt does not support
         # deriving from more than one wrapped class so we just create an
-        # explicit timer instead.
+        # explicit timer instead.  Mice moved by a MouseSimulation don't
+        # need one.
         self.timer = QTimer()
         self.timer.timeout.connect(self.timerEvent)
-        self.timer.start(1000 / 33)
+        if animated:
+            self.timer.start(1000 // 33)
 
     @staticmethod
     def normalizeAngle(angle):
@@ -115,7 +126,11 @@ class Mouse(QGraphicsItem):
         painter.drawEllipse(QRectF(4.0 + self.mouseEyeDirection, -17, 4, 4))
 
         # Ears.
-        if self.scene().collidingItems(self):
+        colliding = self.colliding
+        if colliding is None:
+            colliding = bool(self.scene().collidingItems(self))
+
+        if colliding:
             painter.setBrush(Qt.red)
         else:
             painter.setBrush(Qt.darkYellow)
@@ -198,15 +213,45 @@ if __name__ == '__main__':
     app = QApplication(sys.argv)
     qsrand(QTime(0,0,0).secsTo(QTime.currentTime()))
 
+    parser = QCommandLineParser()
+    parser.setApplicationDescription("Colliding Mice")
+    parser.addHelpOption()
+    miceOption = QCommandLineOption(['m', 'mice'],
+            "Let <mice> mice loose.", 'mice', str(MouseCount))
+    parser.addOption(miceOption)
+    batchOption = QCommandLineOption(['b', 'batch'],
+            "Move all the mice in one step per frame (requires NumPy).")
+    parser.addOption(batchOption)
+    parser.process(app)
+
+    mouseCount = int(parser.value(miceOption))
+    batch = parser.isSet(batchOption) and MouseSimulation is not None
+
+    # Give more mice the same room each.
+    scale = max(1.0, math.sqrt(mouseCount / float(MouseCount)))
+
     scene = QGraphicsScene()
-    scene.setSceneRect(-300, -300, 600, 600)
+    scene.setSceneRect(-300 * scale, -300 * scale, 600 * scale, 600 * scale)
     scene.setItemIndexMethod(QGraphicsScene.NoIndex)
 
-    for i in range(MouseCount):
-        mouse = Mouse()
-        mouse.setPos(math.sin((i * 6.28) / MouseCount) * 200,
-                     math.cos((i * 6.28) / MouseCount) * 200)
+    mice = []
+    for i in range(mouseCount):
+        mouse = Mouse(animated=not batch)
+        mouse.setPos(math.sin((i * 6.28) / mouseCount) * 200 * scale,
+                     math.cos((i * 6.28) / mouseCount) * 200 * scale)
         scene.addItem(mouse)
+        mice.append(mouse)
+
+    if batch:
+        simulation = MouseSimulation(mice, homeRadius=150 * scale)
+
+        def advance():
+            simulation.advance()
+            simulation.updateItems()
+
+        timer = QTimer()
+        timer.timeout.connect(advance)
+        timer.start(1000 // 33)
 
     view = QGraphicsView(scene)
     view.setRenderHint(QPainter.Antialiasing)
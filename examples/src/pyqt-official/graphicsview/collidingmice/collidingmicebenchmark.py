@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+"""Measure how the colliding mice scale with the number of mice.
+
+For each number of mice the mice are moved for a number of frames, both by
+their own timer events and, if NumPy is available, by a MouseSimulation.  The
+time to work out where the mice move (simulation) is reported separately
+from the time to move the items and repaint the view (frame).  The mice are
+scattered over a disc that gives each the same room as in the example.
+"""
+
+
+import math
+import random
+import sys
+import time
+
+from PyQt5.QtCore import QCommandLineOption, QCommandLineParser
+from PyQt5.QtWidgets import QApplication, QGraphicsScene, QGraphicsView
+
+from collidingmice import Mouse, MouseSimulation
+
+
+def createScene(mouseCount, animated):
+    scale = max(1.0, math.sqrt(mouseCount / 7.0))
+
+    scene = QGraphicsScene()
+    scene.setSceneRect(-300 * scale, -300 * scale, 600 * scale, 600 * scale)
+    scene.setItemIndexMethod(QGraphicsScene.NoIndex)
+
+    rand = random.Random(0)
+    mice = []
+    for i in range(mouseCount):
+        mouse = Mouse(animated=animated)
+        radius = math.sqrt(rand.random()) * 200 * scale
+        angle = rand.uniform(0, 2 * math.pi)
+        mouse.setPos(math.sin(angle) * radius, math.cos(angle) * radius)
+        scene.addItem(mouse)
+        mice.append(mouse)
+
+    view = QGraphicsView(scene)
+    view.resize(800, 600)
+    view.show()
+
+    return view, mice, 150 * scale
+
+
+def measureTimers(app, mouseCount, frames):
+    view, mice, homeRadius = createScene(mouseCount, animated=False)
+    app.processEvents()
+
+    simulationTime = frameTime = 0.0
+    for frame in range(frames):
+        start = time.perf_counter()
+        for mouse in mice:
+            mouse.timerEvent()
+        simulated = time.perf_counter()
+        view.viewport().repaint()
+        simulationTime += simulated - start
+        frameTime += time.perf_counter() - simulated
+
+    view.close()
+
+    return simulationTime / frames, frameTime / frames
+
+
+def measureSimulation(app, mouseCount, frames):
+    view, mice, homeRadius = createScene(mouseCount, animated=False)
+    simulation = MouseSimulation(mice, homeRadius=homeRadius, seed=0)
+    app.processEvents()
+
+    simulationTime = frameTime = 0.0
+    for frame in range(frames):
+        start = time.perf_counter()
+        simulation.advance()
+        simulated = time.perf_counter()
+        simulation.updateItems()
+        view.viewport().repaint()
+        simulationTime += simulated - start
+        frameTime += time.perf_counter() - simulated
+
+    view.close()
+
+    return simulationTime / frames, frameTime / frames
+
+
+if __name__ == '__main__':
+
+    app = QApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure how the colliding mice scale with the number of mice.")
+    parser.addHelpOption()
+    miceOption = QCommandLineOption(['m', 'mice'],
+            "Use the comma separated numbers of <mice>.", 'mice',
+            '100,1000,10000')
+    parser.addOption(miceOption)
+    framesOption = QCommandLineOption(['f', 'frames'],
+            "Move the mice for <frames> frames.", 'frames', '10')
+    parser.addOption(framesOption)
+    timerOption = QCommandLineOption(['t', 'timer-mice'],
+            "Move mice with their own timers for up to <mice> mice.", 'mice',
+            '1000')
+    parser.addOption(timerOption)
+    parser.process(app)
+
+    frames = int(parser.value(framesOption))
+    timerMice = int(parser.value(timerOption))
+
+    print("%6s %-10s %16s %11s" % ("mice", "mode", "simulation (ms)",
+            "frame (ms)"))
+
+    for mouseCount in [int(m) for m in parser.value(miceOption).split(',')]:
+        modes = []
+        if mouseCount <= timerMice:
+            modes.append(("timers", measureTimers))
+        if MouseSimulation is not None:
+            modes.append(("batch", measureSimulation))
+
+        for name, measure in modes:
+            simulationTime, frameTime = measure(app, mouseCount, frames)
+            print("%6d %-10s %16.2f %11.2f" % (mouseCount, name,
+                    simulationTime * 1000, frameTime * 1000))
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+"""Move all the mice of the colliding mice example in one step per frame.
+
+The position, rotation, angle and speed of every mouse are kept in NumPy
+arrays and each frame every mouse is steered exactly as Mouse.timerEvent()
+does, but for all the mice at once.  Rather than asking the scene for the
+items under each mouse's danger cone, the mice are binned into a uniform grid
+of cells as big as the largest distance at which two mice can interact, and
+only the mice in neighbouring cells are tested against each other.  The
+items are then moved from the arrays in a single pass.
+"""
+
+
+import functools
+import math
+
+import numpy
+
+
+# The shape of a mouse, the cone in front of it that it keeps free of other
+# mice, and the distances from the origin of a mouse at which they end.
+Body = numpy.array([(-10.0, -20.0), (10.0, -20.0), (10.0, 20.0),
+        (-10.0, 20.0)])
+DangerCone = numpy.array([(0.0, 0.0), (-30.0, -50.0), (30.0, -50.0)])
+
+BodyRadius = math.hypot(10, 20)
+DangerRadius = math.hypot(30, 50)
+
+
+def gridPairs(x, y, cellSize):
+    """Return the pairs of indexes of all the points that are in the same or
+    neighbouring cells of a uniform grid.  Each pair is returned both ways
+    round, and a point is not paired with itself.
+    """
+
+    cx = numpy.floor((x - x.min()) / cellSize).astype(numpy.intp)
+    cy = numpy.floor((y - y.min()) / cellSize).astype(numpy.intp)
+
+    # A margin of empty cells avoids checking for the edges of the grid.
+    columns = cx.max() + 3
+    cellIds = (cy + 1) * columns + cx + 1
+
+    counts = numpy.bincount(cellIds, minlength=(cy.max() + 3) * columns)
+    order = numpy.argsort(cellIds, kind='stable')
+    starts = numpy.cumsum(counts) - counts
+
+    offsets = (numpy.arange(-1, 2)[:, None] * columns +
+            numpy.arange(-1, 2)[None, :]).reshape(-1, 1)
+    neighbours = (cellIds + offsets).reshape(-1)
+    points = numpy.broadcast_to(numpy.arange(len(x)),
+            (len(offsets), len(x))).reshape(-1)
+
+    sizes = counts[neighbours]
+    firsts = numpy.repeat(starts[neighbours] - (numpy.cumsum(sizes) - sizes),
+            sizes)
+    others = order[firsts + numpy.arange(sizes.sum())]
+    points = numpy.repeat(points, sizes)
+
+    different = points != others
+
+    return points[different], others[different]
+
+
+def polygonsIntersect(a, b):
+    """Return which of the pairs of convex polygons a and b intersect.  a is
+    a (pairs, vertices, 2) array and b a (pairs, vertices, 2) array.
+    """
+
+    axes = []
+    for polygon in (a, b):
+        edges = numpy.roll(polygon, -1, axis=1) - polygon
+        axes.append(numpy.stack((-edges[:, :, 1], edges[:, :, 0]), axis=2))
+    axes = numpy.concatenate(axes, axis=1)
+    axisX = axes[:, :, 0]
+    axisY = axes[:, :, 1]
+
+    # The polygons are apart if they are apart along any of the axes.  The
+    # vertices are few, so they are projected one at a time.
+    extents = []
+    for polygon in (a, b):
+        projected = [polygon[:, v, 0, None] * axisX +
+                polygon[:, v, 1, None] * axisY
+                for v in range(polygon.shape[1])]
+        extents.append((functools.reduce(numpy.minimum, projected),
+                functools.reduce(numpy.maximum, projected)))
+
+    (minA, maxA), (minB, maxB) = extents
+    overlap = (maxA >= minB) & (maxB >= minA)
+
+    return overlap.all(axis=1)
+
+
+def toScene(shape, x, y, rotation):
+    """Return the (len(x), vertices, 2) scene coordinates of a shape placed
+    at each of the positions and rotations.
+    """
+
+    cos = numpy.cos(rotation)[:, None]
+    sin = numpy.sin(rotation)[:, None]
+
+    return numpy.stack((x[:, None] + shape[:, 0] * cos - shape[:, 1] * sin,
+            y[:, None] + shape[:, 0] * sin + shape[:, 1] * cos), axis=2)
+
+
+def angleFrom(dx, dy):
+    """The angle of a vector in the coordinates of a mouse, as computed with
+    acos() by Mouse.timerEvent().
+    """
+
+    angle = numpy.arctan2(dy, dx) % (2 * math.pi)
+
+    return (math.pi * 3 / 2 - angle) % (2 * math.pi)
+
+
+class MouseSimulation(object):
+    def __init__(self, mice, homeRadius=150.0, seed=None):
+        self.mice = list(mice)
+        self.homeRadius = homeRadius
+        self.random = numpy.random.default_rng(seed)
+
+        n = len(self.mice)
+        self.x = numpy.array([mouse.x() for mouse in self.mice], dtype=float)
+        self.y = numpy.array([mouse.y() for mouse in self.mice], dtype=float)
+        self.rotation = numpy.array([mouse.rotation() for mouse in self.mice],
+                dtype=float)
+        self.angle = numpy.array([mouse.angle for mouse in self.mice],
+                dtype=float)
+        self.speed = numpy.array([mouse.speed for mouse in self.mice],
+                dtype=float)
+        self.eyeDirection = numpy.zeros(n)
+        self.colliding = numpy.zeros(n, dtype=bool)
+
+    def advance(self):
+        """Move every mouse by one frame."""
+
+        n = len(self.mice)
+        if n == 0:
+            return
+
+        pi = math.pi
+        radians = numpy.radians(self.rotation)
+        cos = numpy.cos(radians)
+        sin = numpy.sin(radians)
+        angle = self.angle
+
+        # Don't move too far away.  The centre is mapped into the
+        # coordinates of each mouse.
+        toCentreX = -self.x * cos - self.y * sin
+        toCentreY = self.x * sin - self.y * cos
+        away = numpy.hypot(toCentreX, toCentreY) > self.homeRadius
+        angleToCentre = angleFrom(toCentreX, toCentreY)
+
+        left = away & (angleToCentre < pi) & (angleToCentre > pi / 4)
+        right = (away & (angleToCentre >= pi) &
+                (angleToCentre < pi + pi / 2 + pi / 4))
+        turn = numpy.zeros(n)
+        turn[left] = numpy.where(angle[left] < -pi / 2, 0.25, -0.25)
+        turn[right] = numpy.where(angle[right] < pi / 2, 0.25, -0.25)
+
+        sinAngle = numpy.sin(angle)
+        turn[~away & (sinAngle < 0)] = 0.25
+        turn[~away & (sinAngle > 0)] = -0.25
+
+        # Try not to crash with any other mice.  A mouse is in danger from
+        # another whose body overlaps its cone, and collides with another
+        # whose body overlaps its own.
+        mice, others = gridPairs(self.x, self.y, DangerRadius + BodyRadius)
+        dx = self.x[others] - self.x[mice]
+        dy = self.y[others] - self.y[mice]
+        distance2 = dx * dx + dy * dy
+
+        near = distance2 <= (DangerRadius + BodyRadius) ** 2
+        mice, others = mice[near], others[near]
+        dx, dy, distance2 = dx[near], dy[near], distance2[near]
+
+        bodies = toScene(Body, self.x[others], self.y[others],
+                radians[others])
+        danger = polygonsIntersect(toScene(DangerCone, self.x[mice],
+                self.y[mice], radians[mice]), bodies)
+
+        touching = distance2 <= (2 * BodyRadius) ** 2
+        colliding = numpy.zeros(len(mice), dtype=bool)
+        colliding[touching] = polygonsIntersect(toScene(Body,
+                self.x[mice[touching]], self.y[mice[touching]],
+                radians[mice[touching]]), bodies[touching])
+        self.colliding = numpy.bincount(mice[colliding], minlength=n) > 0
+
+        mice, dx, dy = mice[danger], dx[danger], dy[danger]
+        angleToMouse = angleFrom(dx * cos[mice] + dy * sin[mice],
+                -dx * sin[mice] + dy * cos[mice])
+        avoid = numpy.zeros(len(mice))
+        avoid[angleToMouse < pi / 2] = 0.5
+        avoid[angleToMouse > 2 * pi - pi / 2] = -0.5
+        turn += numpy.bincount(mice, avoid, n)
+
+        # Add some random movement.  Like the mice driven by their own
+        # timers, these only ever turn one way.
+        inDanger = numpy.bincount(mice, minlength=n) > 0
+        jitter = inDanger & (self.random.integers(0, 10, n) == 0)
+        turn[jitter] -= self.random.integers(0, 100, jitter.sum()) / 500.0
+
+        self.angle = angle + turn
+        self.speed += (-50 + self.random.integers(0, 100, n)) / 100.0
+
+        dx = numpy.sin(self.angle) * 10
+        self.eyeDirection = numpy.where(numpy.abs(dx / 5) < 1, 0.0, dx / 5)
+
+        self.rotation += dx
+        radians = numpy.radians(self.rotation)
+        step = 3 + numpy.sin(self.speed) * 3
+        self.x += step * numpy.sin(radians)
+        self.y -= step * numpy.cos(radians)
+
+    def updateItems(self):
+        """Move the mouse items to where the simulation has put them."""
+
+        for mouse, x, y, rotation, eyeDirection, colliding in zip(self.mice,
+                self.x.tolist(), self.y.tolist(), self.rotation.tolist(),
+                self.eyeDirection.tolist(), self.colliding.tolist()):
+            mouse.mouseEyeDirection = eyeDirection
+            mouse.colliding = colliding
+            mouse.setRotation(rotation)
+            mouse.setPos(x, y)
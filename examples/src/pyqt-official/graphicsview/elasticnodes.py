@@ -43,14 +43,22 @@
 
 
 import math
+import random
 
-from PyQt5.QtCore import (qAbs, QLineF, QPointF, qrand, QRectF, QSizeF, qsrand,
-        Qt, QTime)
+from PyQt5.QtCore import (qAbs, QCommandLineOption, QCommandLineParser,
+        QLineF, QPointF, qrand, QRectF, QSizeF, qsrand, Qt, QThread, QTime,
+        pyqtSignal)
 from PyQt5.QtGui import (QBrush, QColor, QLinearGradient, QPainter,
         QPainterPath, QPen, QPolygonF, QRadialGradient)
 from PyQt5.QtWidgets import (QApplication, QGraphicsItem, QGraphicsScene,
         QGraphicsView, QStyle)
 
+try:
+    import numpy
+    from forcelayout import ForceLayout, LayoutWorker
+except ImportError:
+    numpy = None
+
 
 class Edge(QGraphicsItem):
     Pi = math.pi
@@ -97,17 +105,19 @@ class Edge(QGraphicsItem):
                 self.mapFromItem(self.dest, 0, 0))
         length = line.length()
 
-        self.prepareGeometryChange()
-
         if length > 20.0:
             edgeOffset = QPointF((line.dx() * 10) / length,
                     (line.dy() * 10) / length)
 
-            self.sourcePoint = line.p1() + edgeOffset
-            self.destPoint = line.p2() - edgeOffset
+            self.setPoints(line.p1() + edgeOffset, line.p2() - edgeOffset)
         else:
-            self.sourcePoint = line.p1()
-            self.destPoint = line.p1()
+            self.setPoints(line.p1(), line.p1())
+
+    def setPoints(self, sourcePoint, destPoint):
+        self.prepareGeometryChange()
+
+        self.sourcePoint = sourcePoint
+        self.destPoint = destPoint
 
     def boundingRect(self):
         if not self.source or not self.dest:
@@ -163,6 +173,9 @@ class Node(QGraphicsItem):
         self.edgeList = []
         self.newPos = QPointF()
 
+        # the index of the node in the graph's array of positions
+        self.index = -1
+
         self.setFlag(QGraphicsItem.ItemIsMovable)
         self.setFlag(QGraphicsItem.ItemSendsGeometryChanges)
         self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
@@ -252,10 +265,10 @@ class Node(QGraphicsItem):
         painter.drawEllipse(-10, -10, 20, 20)
 
     def itemChange(self, change, value):
-        if change == QGraphicsItem.ItemPositionHasChanged:
+        if change == QGraphicsItem.ItemPositionHasChanged and not self.graph.movingNodes:
             for edge in self.edgeList:
                 edge.adjust()
-            self.graph.itemMoved()
+            self.graph.nodeMoved(self)
 
         return super(Node, self).itemChange(change, value)
 
@@ -269,11 +282,26 @@ class Node(QGraphicsItem):
 
 
 class GraphWidget(QGraphicsView):
+    layoutRequested = pyqtSignal(object, object)
+
     def __init__(self):
         super(GraphWidget, self).__init__()
 
         self.timerId = 0
 
+        # The layout of the nodes when NumPy is available.  The positions of
+        # the nodes are mirrored in an array that the layout works on and
+        # the nodes are moved from the array once each step.
+        self.nodes = []
+        self.edges = []
+        self.positions = None
+        self.layout = None
+        self.movingNodes = False
+
+        self.layoutThread = None
+        self.layoutWorker = None
+        self.layoutPending = False
+
         scene = QGraphicsScene(self)
         scene.setItemIndexMethod(QGraphicsScene.NoIndex)
         scene.setSceneRect(-200, -200, 400, 400)
@@ -325,13 +353,188 @@ class GraphWidget(QGraphicsView):
         node8.setPos(0, 50)
         node9.setPos(50, 50)
 
+        self.graphChanged()
+
         self.scale(0.8, 0.8)
         self.setMinimumSize(400, 400)
         self.setWindowTitle("Elastic Nodes")
 
+    def createRandomGraph(self, nodeCount, edgesPerNode=1.5):
+        """Replace the graph with one of randomly placed and connected
+        nodes, in a scene big enough to keep them apart.
+        """
+
+        scene = self.scene()
+        scene.clear()
+
+        side = 40.0 * math.sqrt(nodeCount) + 400.0
+        scene.setSceneRect(-side / 2, -side / 2, side, side)
+
+        rand = random.Random(0)
+        nodes = []
+        for i in range(nodeCount):
+            node = Node(self)
+            node.setPos(rand.uniform(-side / 2, side / 2),
+                    rand.uniform(-side / 2, side / 2))
+            scene.addItem(node)
+            nodes.append(node)
+
+        # Connect every node to an earlier one and add random edges.
+        pairs = [(rand.randrange(i), i) for i in range(1, nodeCount)]
+        extra = int(nodeCount * (edgesPerNode - 1))
+        pairs.extend((rand.randrange(nodeCount), rand.randrange(nodeCount))
+                for i in range(extra))
+        for source, dest in pairs:
+            if source != dest:
+                scene.addItem(Edge(nodes[source], nodes[dest]))
+
+        self.centerNode = nodes[0]
+        self.graphChanged()
+        self.fitInView(scene.sceneRect(), Qt.KeepAspectRatio)
+
+    def graphChanged(self):
+        """Update the layout after nodes or edges have been added or
+        removed.
+        """
+
+        items = self.scene().items(Qt.AscendingOrder)
+        self.nodes = [item for item in items if isinstance(item, Node)]
+        self.edges = [item for item in items if isinstance(item, Edge)]
+
+        for index, node in enumerate(self.nodes):
+            node.index = index
+
+        if numpy is None:
+            return
+
+        self.positions = numpy.array([(node.x(), node.y())
+                for node in self.nodes], dtype=float).reshape(-1, 2)
+        self.edgeSources = numpy.array([edge.sourceNode().index
+                for edge in self.edges], dtype=numpy.intp)
+        self.edgeDests = numpy.array([edge.destNode().index
+                for edge in self.edges], dtype=numpy.intp)
+        self.layout = ForceLayout(len(self.nodes), self.edgeSources,
+                self.edgeDests, self.sceneRect())
+
+        if self.layoutThread is not None:
+            self.setThreaded(False)
+            self.setThreaded(True)
+
+    def setThreaded(self, threaded):
+        """Run the layout in a thread of its own so that the view stays
+        responsive while the steps of a large graph are computed.
+        """
+
+        if self.layout is None or threaded == (self.layoutThread is not None):
+            return
+
+        if threaded:
+            self.layoutThread = QThread()
+            self.layoutWorker = LayoutWorker(self.layout)
+            self.layoutWorker.moveToThread(self.layoutThread)
+            self.layoutRequested.connect(self.layoutWorker.step)
+            self.layoutWorker.stepped.connect(self.layoutStepped)
+            self.layoutThread.start()
+        else:
+            self.layoutRequested.disconnect(self.layoutWorker.step)
+            self.layoutThread.quit()
+            self.layoutThread.wait()
+            self.layoutThread = None
+            self.layoutWorker = None
+
+        self.layoutPending = False
+
+    def closeEvent(self, event):
+        self.setThreaded(False)
+        super(GraphWidget, self).closeEvent(event)
+
+    def nodeMoved(self, node):
+        if self.positions is not None and node.index >= 0:
+            self.positions[node.index] = (node.x(), node.y())
+
+        self.itemMoved()
+
     def itemMoved(self):
         if not self.timerId:
-            self.timerId = self.startTimer(1000 / 25)
+            self.timerId = self.startTimer(1000 // 25)
+
+    def grabbedNode(self):
+        item = self.scene().mouseGrabberItem()
+        if isinstance(item, Node):
+            return item.index
+
+        return None
+
+    def stepLayout(self):
+        """Run a step of the layout and move the nodes.  Return True if any
+        of them moved.
+        """
+
+        return self.moveNodes(self.layout.step(self.positions,
+                self.grabbedNode()))
+
+    def layoutStepped(self, positions, newPositions):
+        if not self.layoutPending or self.sender() is not self.layoutWorker:
+            # the graph changed while the step was running
+            return
+
+        self.layoutPending = False
+
+        # Leave any nodes that were dragged during the step where they are.
+        dragged = (self.positions != positions).any(axis=1)
+        newPositions[dragged] = self.positions[dragged]
+
+        grabbed = self.grabbedNode()
+        if grabbed is not None:
+            newPositions[grabbed] = self.positions[grabbed]
+
+        if not self.moveNodes(newPositions) and self.timerId:
+            self.killTimer(self.timerId)
+            self.timerId = 0
+
+    def moveNodes(self, newPositions):
+        """Move the nodes to new positions in one batch, and the edges
+        between them.  Return True if any of them moved.
+        """
+
+        moved = numpy.flatnonzero((newPositions != self.positions).any(
+                axis=1))
+        if len(moved) == 0:
+            return False
+
+        self.positions[moved] = newPositions[moved]
+
+        self.movingNodes = True
+        nodes = self.nodes
+        for index, x, y in zip(moved.tolist(),
+                newPositions[moved, 0].tolist(),
+                newPositions[moved, 1].tolist()):
+            nodes[index].setPos(x, y)
+        self.movingNodes = False
+
+        # Edge.adjust() for every edge with a node that moved.
+        movedNodes = numpy.zeros(len(nodes), dtype=bool)
+        movedNodes[moved] = True
+        movedEdges = numpy.flatnonzero(movedNodes[self.edgeSources] |
+                movedNodes[self.edgeDests])
+
+        p1 = self.positions[self.edgeSources[movedEdges]]
+        p2 = self.positions[self.edgeDests[movedEdges]]
+        delta = p2 - p1
+        length = numpy.hypot(delta[:, 0], delta[:, 1])
+        long = length > 20.0
+        offset = numpy.zeros_like(delta)
+        offset[long] = delta[long] * 10 / length[long, None]
+        sourcePoints = p1 + offset
+        destPoints = numpy.where(long[:, None], p2 - offset, p1)
+
+        edges = self.edges
+        for index, sx, sy, dx, dy in zip(movedEdges.tolist(),
+                sourcePoints[:, 0].tolist(), sourcePoints[:, 1].tolist(),
+                destPoints[:, 0].tolist(), destPoints[:, 1].tolist()):
+            edges[index].setPoints(QPointF(sx, sy), QPointF(dx, dy))
+
+        return True
 
     def keyPressEvent(self, event):
         key = event.key()
@@ -356,6 +559,20 @@ class GraphWidget(QGraphicsView):
             super(GraphWidget, self).keyPressEvent(event)
 
     def timerEvent(self, event):
+        if self.layoutWorker is not None:
+            # the nodes are moved when the step has been computed
+            if not self.layoutPending:
+                self.layoutPending = True
+                self.layoutRequested.emit(self.positions.copy(),
+                        self.grabbedNode())
+            return
+
+        if self.layout is not None:
+            if not self.stepLayout():
+                self.killTimer(self.timerId)
+                self.timerId = 0
+            return
+
         nodes = [item for item in self.scene().items() if isinstance(item, Node)]
 
         for node in nodes:
@@ -424,7 +641,21 @@ if __name__ == '__main__':
     app = QApplication(sys.argv)
     qsrand(QTime(0,0,0).secsTo(QTime.currentTime()))
 
+    parser = QCommandLineParser()
+    parser.setApplicationDescription("Elastic Nodes")
+    parser.addHelpOption()
+    nodesOption = QCommandLineOption(['n', 'nodes'],
+            "Lay out a random graph of <nodes> nodes.", 'nodes')
+    parser.addOption(nodesOption)
+    threadOption = QCommandLineOption(['t', 'thread'],
+            "Run the layout in a separate thread.")
+    parser.addOption(threadOption)
+    parser.process(app)
+
     widget = GraphWidget()
+    if parser.isSet(nodesOption):
+        widget.createRandomGraph(int(parser.value(nodesOption)))
+    widget.setThreaded(parser.isSet(threadOption))
     widget.show()
 
     sys.exit(app.exec_())
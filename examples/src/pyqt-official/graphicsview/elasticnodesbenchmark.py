@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+"""Measure the layout of the elastic nodes example for large graphs.
+
+For each size a random graph is laid out for a number of steps.  The time of
+computing a step with the NumPy layout and of moving the nodes and edges is
+reported, and for the smaller graphs the time of a step of the original
+layout done by Node.calculateForces().  The layout is then run by the view's
+timer, first in the GUI thread and then in a worker thread, and the number
+of steps per second and the longest time the event loop was blocked are
+reported.  The view is not shown, as painting tens of thousands of items
+would hide the cost of the layout.
+"""
+
+
+import sys
+import time
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser,
+        QElapsedTimer, QEventLoop, QTimer)
+from PyQt5.QtWidgets import QApplication
+
+from elasticnodes import GraphWidget
+
+
+def originalStep(widget):
+    for node in widget.nodes:
+        node.calculateForces()
+
+    for node in widget.nodes:
+        node.advance()
+
+
+def measureSteps(widget, steps, original):
+    layoutTime = moveTime = 0.0
+    for i in range(steps):
+        start = time.perf_counter()
+        newPositions = widget.layout.step(widget.positions)
+        computed = time.perf_counter()
+        widget.moveNodes(newPositions)
+        layoutTime += computed - start
+        moveTime += time.perf_counter() - computed
+
+    originalTime = None
+    if original:
+        start = time.perf_counter()
+        originalStep(widget)
+        originalTime = time.perf_counter() - start
+
+    return layoutTime / steps, moveTime / steps, originalTime
+
+
+def measureLive(app, widget, seconds, threaded):
+    """Let the layout run for a while and return the steps per second and
+    the longest gap between the ticks of a fast timer.
+    """
+
+    widget.setThreaded(threaded)
+
+    steps = [0]
+    if threaded:
+        widget.layoutWorker.stepped.connect(
+                lambda *args: steps.__setitem__(0, steps[0] + 1))
+    else:
+        stepLayout = widget.stepLayout
+
+        def countedStep():
+            steps[0] += 1
+            return stepLayout()
+
+        widget.stepLayout = countedStep
+
+    gaps = [0]
+    clock = QElapsedTimer()
+    clock.start()
+
+    def tick():
+        gaps[0] = max(gaps[0], clock.restart())
+
+    ticker = QTimer()
+    ticker.timeout.connect(tick)
+    ticker.start(5)
+
+    widget.itemMoved()
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
+
+    ticker.stop()
+    widget.setThreaded(False)
+    if not threaded:
+        del widget.stepLayout
+
+    return steps[0] / seconds, gaps[0]
+
+
+if __name__ == '__main__':
+
+    app = QApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure the layout of the elastic nodes example.")
+    parser.addHelpOption()
+    nodesOption = QCommandLineOption(['n', 'nodes'],
+            "Use the comma separated numbers of <nodes>.", 'nodes',
+            '1000,10000,50000')
+    parser.addOption(nodesOption)
+    stepsOption = QCommandLineOption(['s', 'steps'],
+            "Time <steps> steps of the layout.", 'steps', '5')
+    parser.addOption(stepsOption)
+    originalOption = QCommandLineOption(['o', 'original-nodes'],
+            "Time the original layout for up to <nodes> nodes.", 'nodes',
+            '1000')
+    parser.addOption(originalOption)
+    secondsOption = QCommandLineOption(['l', 'live'],
+            "Run the live layout for <seconds>.", 'seconds', '3')
+    parser.addOption(secondsOption)
+    parser.process(app)
+
+    steps = int(parser.value(stepsOption))
+    originalNodes = int(parser.value(originalOption))
+    seconds = float(parser.value(secondsOption))
+
+    print("%7s %7s %11s %11s %13s" % ("nodes", "edges", "layout (ms)",
+            "move (ms)", "original (ms)"))
+    results = []
+    for nodeCount in [int(n) for n in parser.value(nodesOption).split(',')]:
+        widget = GraphWidget()
+        widget.createRandomGraph(nodeCount)
+
+        layoutTime, moveTime, originalTime = measureSteps(widget, steps,
+                nodeCount <= originalNodes)
+        print("%7d %7d %11.1f %11.1f %13s" % (nodeCount, len(widget.edges),
+                layoutTime * 1000, moveTime * 1000,
+                "-" if originalTime is None else
+                        "%.1f" % (originalTime * 1000)))
+
+        live = [measureLive(app, widget, seconds, threaded)
+                for threaded in (False, True)]
+        results.append((nodeCount, live))
+
+    print()
+    print("%7s %-8s %12s %16s" % ("nodes", "thread", "steps per s",
+            "longest block (ms)"))
+    for nodeCount, live in results:
+        for threaded, (rate, gap) in zip(("gui", "worker"), live):
+            print("%7d %-8s %12.1f %16d" % (nodeCount, threaded, rate, gap))
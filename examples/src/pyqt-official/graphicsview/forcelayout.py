@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+"""The force directed layout of the elastic nodes example for large graphs.
+
+The positions of the nodes are kept in a (nodes, 2) NumPy array.  Every node
+is pushed away from every other node and pulled towards the nodes it shares
+an edge with, exactly as Node.calculateForces() does, but the forces are
+computed for all the nodes at once.  Beyond a few hundred nodes the push of
+distant nodes is approximated in the way of a Barnes-Hut quadtree: the nodes
+are binned into grids of increasing resolution and the nodes in a cell that
+is well separated from a node push it as a single mass from their centre.
+"""
+
+
+import numpy
+
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
+
+
+class ForceLayout(object):
+    # The repulsion between every pair of nodes is computed exactly for
+    # graphs of up to this many nodes.
+    DirectLimit = 256
+
+    # The finest grid has about this many nodes in each cell.
+    NodesPerCell = 4
+
+    MaxLevels = 10
+
+    # Node.calculateForces() uses 150 / (2 * distance ** 2).
+    Repulsion = 75.0
+
+    MinimumSpeed = 0.1
+
+    # Nodes keep this far inside the scene rectangle.
+    Margin = 10.0
+
+    def __init__(self, nodeCount, sources, dests, sceneRect):
+        self.nodeCount = nodeCount
+        self.sources = numpy.asarray(sources, dtype=numpy.intp)
+        self.dests = numpy.asarray(dests, dtype=numpy.intp)
+
+        degree = (numpy.bincount(self.sources, minlength=nodeCount) +
+                numpy.bincount(self.dests, minlength=nodeCount))
+        self.weights = (degree + 1) * 10.0
+
+        self.setSceneRect(sceneRect)
+
+        # The cells that interact with a node as a whole are the children of
+        # the neighbours of the parent of the node's cell.
+        offsets = numpy.arange(-2, 4)
+        self.farOffsets = (numpy.repeat(offsets, 6), numpy.tile(offsets, 6))
+
+        offsets = numpy.arange(-1, 2)
+        self.nearOffsets = (numpy.repeat(offsets, 3), numpy.tile(offsets, 3))
+
+    def setSceneRect(self, rect):
+        # Keep plain floats so that a layout running in another thread does
+        # not share the QRectF.
+        self.bounds = (rect.left() + self.Margin, rect.top() + self.Margin,
+                rect.right() - self.Margin, rect.bottom() - self.Margin)
+
+    def step(self, positions, fixed=None):
+        """Return the positions of the nodes after one step of the layout.
+        The node with the index fixed, if any, does not move.
+        """
+
+        velocity = self.repulsion(positions) + self.attraction(positions)
+
+        slow = ((numpy.abs(velocity[:, 0]) < self.MinimumSpeed) &
+                (numpy.abs(velocity[:, 1]) < self.MinimumSpeed))
+        velocity[slow] = 0.0
+
+        left, top, right, bottom = self.bounds
+        newPositions = positions + velocity
+        numpy.clip(newPositions[:, 0], left, right, out=newPositions[:, 0])
+        numpy.clip(newPositions[:, 1], top, bottom, out=newPositions[:, 1])
+
+        if fixed is not None:
+            newPositions[fixed] = positions[fixed]
+
+        return newPositions
+
+    def attraction(self, positions):
+        n = self.nodeCount
+        delta = positions[self.dests] - positions[self.sources]
+
+        pull = numpy.empty((n, 2))
+        for axis in (0, 1):
+            pull[:, axis] = (
+                    numpy.bincount(self.sources, delta[:, axis], n) -
+                    numpy.bincount(self.dests, delta[:, axis], n))
+
+        pull /= self.weights[:, None]
+
+        return pull
+
+    def repulsion(self, positions):
+        if self.nodeCount <= self.DirectLimit:
+            return self.directRepulsion(positions)
+
+        return self.gridRepulsion(positions)
+
+    def directRepulsion(self, positions):
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance2 = (delta * delta).sum(axis=2)
+
+        # Coincident nodes, including each node and itself, do not push.
+        distance2[distance2 == 0.0] = numpy.inf
+
+        return self.Repulsion * (delta / distance2[:, :, None]).sum(axis=1)
+
+    def gridRepulsion(self, positions):
+        # Nodes pushed into a corner of the scene end up on top of each
+        # other, so the grid is made of the distinct positions, each with
+        # the mass of the nodes at it.
+        points, inverse, weights = numpy.unique(positions, axis=0,
+                return_inverse=True, return_counts=True)
+        n = len(points)
+        x = points[:, 0]
+        y = points[:, 1]
+
+        left = x.min()
+        top = y.min()
+        size = max(x.max() - left, y.max() - top) or 1.0
+
+        minLevels = int(numpy.ceil(numpy.log(n / float(self.NodesPerCell)) /
+                numpy.log(4)))
+        minLevels = min(max(minLevels, 2), self.MaxLevels)
+
+        push = numpy.zeros((n, 2))
+
+        # Levels 0 and 1 have no cells that are well separated from a node.
+        level = 2
+        while True:
+            cells = 1 << level
+            scale = cells / size
+            cx = numpy.minimum((x - left) * scale, cells - 1).astype(
+                    numpy.intp)
+            cy = numpy.minimum((y - top) * scale, cells - 1).astype(
+                    numpy.intp)
+            cellIds = cy * cells + cx
+
+            counts = numpy.bincount(cellIds, minlength=cells * cells)
+            order = numpy.argsort(cellIds, kind='stable')
+            starts = numpy.cumsum(counts) - counts
+
+            occupied = numpy.flatnonzero(counts)
+            masses = numpy.bincount(cellIds, weights, cells * cells)
+            divisors = numpy.maximum(masses, 1)
+            centreX = numpy.bincount(cellIds, x * weights, cells * cells) / \
+                    divisors
+            centreY = numpy.bincount(cellIds, y * weights, cells * cells) / \
+                    divisors
+
+            # The cells that are well separated from each occupied cell.
+            owners, targets = self.neighbours(occupied, cells,
+                    self.farOffsets, counts, far=True)
+            nodes, targets = self.expand(order, starts, counts, owners,
+                    targets)
+            self.accumulate(push, nodes, x[nodes] - centreX[targets],
+                    y[nodes] - centreY[targets], masses[targets])
+
+            # Refine the grid until the nodes in neighbouring cells are few
+            # enough to push individually.
+            owners, targets = self.neighbours(occupied, cells,
+                    self.nearOffsets, counts, far=False)
+            pairs = (counts[owners] * counts[targets]).sum()
+            if level >= self.MaxLevels or (level >= minLevels and
+                    pairs <= 4 * 9 * self.NodesPerCell * n):
+                break
+
+            level += 1
+
+        # The nodes in the neighbouring cells of the finest grid push
+        # individually.
+        nodes, targets = self.expand(order, starts, counts, owners, targets)
+        others, nodes = self.expand(order, starts, counts, targets, nodes)
+
+        dx = x[nodes] - x[others]
+        dy = y[nodes] - y[others]
+        apart = (dx != 0.0) | (dy != 0.0)
+        self.accumulate(push, nodes[apart], dx[apart], dy[apart],
+                weights[others[apart]])
+
+        return push[inverse.reshape(-1)]
+
+    @staticmethod
+    def neighbours(occupied, cells, offsets, counts, far):
+        """Return the pairs of each occupied cell and each occupied cell at
+        the given offsets from it.  Far cells exclude the cell's neighbours.
+        """
+
+        ox = occupied % cells
+        oy = occupied // cells
+
+        if far:
+            # The children of the neighbours of the cell's parent.
+            tx = (ox & ~1) + offsets[0][:, None]
+            ty = (oy & ~1) + offsets[1][:, None]
+        else:
+            tx = ox + offsets[0][:, None]
+            ty = oy + offsets[1][:, None]
+
+        valid = (tx >= 0) & (tx < cells) & (ty >= 0) & (ty < cells)
+        if far:
+            valid &= (numpy.abs(tx - ox) > 1) | (numpy.abs(ty - oy) > 1)
+
+        owners = numpy.broadcast_to(occupied, tx.shape)[valid]
+        targets = (ty * cells + tx)[valid]
+
+        occupiedTargets = counts[targets] > 0
+
+        return owners[occupiedTargets], targets[occupiedTargets]
+
+    @staticmethod
+    def expand(order, starts, counts, cellIds, others):
+        """Return the pairs of each node in each of cellIds and the
+        corresponding item of others.
+        """
+
+        sizes = counts[cellIds]
+        total = sizes.sum()
+        firsts = numpy.repeat(starts[cellIds] - (numpy.cumsum(sizes) - sizes),
+                sizes)
+
+        return (order[firsts + numpy.arange(total)],
+                numpy.repeat(others, sizes))
+
+    def accumulate(self, push, nodes, dx, dy, mass):
+        strength = self.Repulsion * mass / (dx * dx + dy * dy)
+        push[:, 0] += numpy.bincount(nodes, dx * strength, len(push))
+        push[:, 1] += numpy.bincount(nodes, dy * strength, len(push))
+
+
+class LayoutWorker(QObject):
+    """Run the steps of a layout in the thread the worker is moved to."""
+
+    stepped = pyqtSignal(object, object)
+
+    def __init__(self, layout, parent=None):
+        super(LayoutWorker, self).__init__(parent)
+
+        self.layout = layout
+
+    @pyqtSlot(object, object)
+    def step(self, positions, fixed):
+        self.stepped.emit(positions, self.layout.step(positions, fixed))
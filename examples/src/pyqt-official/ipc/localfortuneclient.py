@@ -50,6 +50,39 @@ from PyQt5.QtWidgets import (QApplication, QDialog, QDialogButtonBox,
 from PyQt5.QtNetwork import QLocalSocket
 
 
+# Sent on an open connection to ask the server for another fortune.
+REQUEST = b'\x01'
+
+
+def readFortunes(socket, blockSize):
+    """Read every complete block that has been received by a socket.
+
+    blockSize is the size of a block whose size has already been read, or 0.
+    The fortunes that were read and the size of the block that has been
+    started but not yet completely received, or 0, are returned.
+    """
+
+    ins = QDataStream(socket)
+    ins.setVersion(QDataStream.Qt_4_0)
+
+    fortunes = []
+
+    while True:
+        if blockSize == 0:
+            if socket.bytesAvailable() < 2:
+                break
+
+            blockSize = ins.readUInt16()
+
+        if socket.bytesAvailable() < blockSize:
+            break
+
+        fortunes.append(ins.readQString())
+        blockSize = 0
+
+    return fortunes, blockSize
+
+
 class Client(QDialog):
     def __init__(self, parent=None):
         super(Client, self).__init__(parent)
@@ -94,27 +127,27 @@ class Client(QDialog):
 
     def requestNewFortune(self):
         self.getFortuneButton.setEnabled(False)
-        self.blockSize = 0
-        self.socket.abort()
-        self.socket.connectToServer(self.hostLineEdit.text())
 
-    def readFortune(self):
-        ins = QDataStream(self.socket)
-        ins.setVersion(QDataStream.Qt_4_0)
-
-        if self.blockSize == 0:
-            if self.socket.bytesAvailable() < 2:
-                return
-            self.blockSize = ins.readUInt16()
+        # Reuse the connection if the server has kept it open, otherwise
+        # connect, which asks for the first fortune.
+        if (self.socket.state() == QLocalSocket.ConnectedState and
+                self.socket.serverName() == self.hostLineEdit.text()):
+            self.socket.write(REQUEST)
+        else:
+            self.blockSize = 0
+            self.socket.abort()
+            self.socket.connectToServer(self.hostLineEdit.text())
 
-        if ins.atEnd():
+    def readFortune(self):
+        fortunes, self.blockSize = readFortunes(self.socket, self.blockSize)
+        if not fortunes:
             return
 
-        nextFortune = ins.readQString()
+        nextFortune = fortunes[-1]
         if nextFortune == self.currentFortune:
             QTimer.singleShot(0, self.requestNewFortune)
             return
- 
+
         self.currentFortune = nextFortune
         self.statusLabel.setText(self.currentFortune)
         self.getFortuneButton.setEnabled(True)
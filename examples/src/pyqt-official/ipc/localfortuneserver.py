@@ -52,6 +52,65 @@ from PyQt5.QtWidgets import (QApplication, QDialog, QLabel, QHBoxLayout,
 from PyQt5.QtNetwork import QLocalServer
 
 
+def fortuneBlock(fortune):
+    """Return a fortune encoded as the block that is sent to a client."""
+
+    block = QByteArray()
+    out = QDataStream(block, QIODevice.WriteOnly)
+    out.setVersion(QDataStream.Qt_4_0)
+    out.writeUInt16(0)
+    out.writeQString(fortune)
+    out.device().seek(0)
+    out.writeUInt16(block.size() - 2)
+
+    return block
+
+
+class FortuneServer(QLocalServer):
+    """Send a fortune to each client as soon as it connects, and another
+    for every byte the client sends after that.
+
+    A client that only wants one fortune can close the connection once it
+    has been read.  A client that wants more can keep the connection open
+    and send as many requests as it likes without waiting for the fortunes,
+    which are sent in the order they were requested.
+    """
+
+    FORTUNES = (
+        "You've been leading a dog's life. Stay off the furniture.",
+        "You've got to think about tomorrow.",
+        "You will be surprised by a loud noise.",
+        "You will feel hungry again in another hour.",
+        "You might have mail.",
+        "You cannot kill time without injuring eternity.",
+        "Computers are not intelligent. They only think they are.",
+    )
+
+    def __init__(self, parent=None):
+        super(FortuneServer, self).__init__(parent)
+
+        # The fortunes are encoded once rather than for every request.
+        self.blocks = [bytes(fortuneBlock(f)) for f in self.FORTUNES]
+
+        self.newConnection.connect(self.sendFortune)
+
+    def sendFortune(self):
+        while self.hasPendingConnections():
+            clientConnection = self.nextPendingConnection()
+            clientConnection.disconnected.connect(
+                    clientConnection.deleteLater)
+            clientConnection.readyRead.connect(self.readRequests)
+            clientConnection.write(random.choice(self.blocks))
+
+    def readRequests(self):
+        clientConnection = self.sender()
+
+        # All the requests that have arrived are answered with one write.
+        requests = len(clientConnection.readAll())
+        clientConnection.write(b''.join(
+                random.choice(self.blocks) for i in range(requests)))
+
+
 class Server(QDialog):
     def __init__(self, parent=None):
         super(Server, self).__init__(parent)
@@ -61,17 +120,7 @@ class Server(QDialog):
         quitButton = QPushButton("Quit")
         quitButton.setAutoDefault(False)
 
-        self.fortunes = (
-            "You've been leading a dog's life. Stay off the furniture.",
-            "You've got to think about tomorrow.",
-            "You will be surprised by a loud noise.",
-            "You will feel hungry again in another hour.",
-            "You might have mail.",
-            "You cannot kill time without injuring eternity.",
-            "Computers are not intelligent. They only think they are.",
-        )
-
-        self.server = QLocalServer()
+        self.server = FortuneServer()
         if not self.server.listen('fortune'):
             QMessageBox.critical(self, "Fortune Server",
                     "Unable to start the server: %s." % self.server.errorString())
@@ -82,7 +131,6 @@ class Server(QDialog):
                 "example now.")
 
         quitButton.clicked.connect(self.close)
-        self.server.newConnection.connect(self.sendFortune)
 
         buttonLayout = QHBoxLayout()
         buttonLayout.addStretch(1)
@@ -96,21 +144,6 @@ class Server(QDialog):
 
         self.setWindowTitle("Fortune Server")
 
-    def sendFortune(self):
-        block = QByteArray()
-        out = QDataStream(block, QIODevice.WriteOnly)
-        out.setVersion(QDataStream.Qt_4_0)
-        out.writeUInt16(0)
-        out.writeQString(random.choice(self.fortunes))
-        out.device().seek(0)
-        out.writeUInt16(block.size() - 2)
-
-        clientConnection = self.server.nextPendingConnection()
-        clientConnection.disconnected.connect(clientConnection.deleteLater)
-        clientConnection.write(block)
-        clientConnection.flush()
-        clientConnection.disconnectFromServer()
-
 
 if __name__ == '__main__':
 
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure how many fortunes a second a client can get from the local
+fortune server, connecting again for every fortune, and keeping one
+connection open with a number of requests outstanding.
+
+The server is run in a separate process, started by this script with the
+--serve option, so that the client doesn't compete with it for the Python
+interpreter.
+"""
+
+
+import os
+import subprocess
+import sys
+import time
+
+from PyQt5.QtCore import (pyqtSignal, QCommandLineOption, QCommandLineParser,
+        QCoreApplication, QObject, QTimer)
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+from localfortuneclient import readFortunes, REQUEST
+from localfortuneserver import FortuneServer
+
+
+def serve(app, name):
+    server = FortuneServer()
+    if not server.listen(name):
+        sys.exit("Unable to start the server: %s." % server.errorString())
+
+    # Tell the benchmark that the server is listening.
+    print(name, flush=True)
+    app.exec_()
+
+
+class FortuneRequester(QObject):
+    """Get fortunes from a server for a number of seconds.
+
+    If depth is 0 then the client connects again for every fortune, like
+    the client used to.  Otherwise one connection is kept open with depth
+    requests outstanding.
+    """
+
+    finished = pyqtSignal()
+
+    def __init__(self, name, depth, duration, parent=None):
+        super(FortuneRequester, self).__init__(parent)
+
+        self.name = name
+        self.depth = depth
+        self.duration = duration
+
+        self.fortunes = 0
+        self.errors = 0
+        self.invalid = 0
+        self.blockSize = 0
+        self.startTime = self.endTime = 0.0
+        self.running = False
+
+        self.socket = QLocalSocket(self)
+        self.socket.connected.connect(self.sendRequests)
+        self.socket.readyRead.connect(self.readFortune)
+        self.socket.error.connect(self.socketError)
+
+    def start(self):
+        self.running = True
+        self.startTime = time.perf_counter()
+        QTimer.singleShot(int(self.duration * 1000), self.stop)
+        self.connect()
+
+    def stop(self):
+        self.running = False
+        self.endTime = time.perf_counter()
+        self.socket.abort()
+        self.finished.emit()
+
+    def connect(self):
+        self.blockSize = 0
+        self.socket.abort()
+        self.socket.connectToServer(self.name)
+
+    def sendRequests(self):
+        # The server sends the first fortune without being asked.
+        if self.depth > 1:
+            self.socket.write(REQUEST * (self.depth - 1))
+
+    def readFortune(self):
+        fortunes, self.blockSize = readFortunes(self.socket, self.blockSize)
+        if not fortunes or not self.running:
+            return
+
+        self.fortunes += len(fortunes)
+        self.invalid += len(set(fortunes) - set(FortuneServer.FORTUNES))
+
+        if self.depth == 0:
+            self.connect()
+        else:
+            self.socket.write(REQUEST * len(fortunes))
+
+    def socketError(self, socketError):
+        if not self.running or socketError == QLocalSocket.PeerClosedError:
+            return
+
+        self.errors += 1
+        QTimer.singleShot(0, self.connect)
+
+    def rate(self):
+        return self.fortunes / (self.endTime - self.startTime)
+
+
+def measure(app, name, depth, duration):
+    requester = FortuneRequester(name, depth, duration)
+    requester.finished.connect(app.quit)
+    QTimer.singleShot(0, requester.start)
+    app.exec_()
+
+    return requester
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure the fortunes a second served by the local fortune "
+            "server.")
+    parser.addHelpOption()
+    depthsOption = QCommandLineOption(['p', 'pipeline'],
+            "Keep the comma separated numbers of <requests> outstanding on "
+            "a persistent connection.", 'requests', '1,16,256')
+    parser.addOption(depthsOption)
+    durationOption = QCommandLineOption(['d', 'duration'],
+            "Get fortunes for <seconds> for each measurement.", 'seconds',
+            '5')
+    parser.addOption(durationOption)
+    serveOption = QCommandLineOption('serve',
+            "Run the server with the local socket <name>.", 'name')
+    parser.addOption(serveOption)
+    parser.process(app)
+
+    if parser.isSet(serveOption):
+        serve(app, parser.value(serveOption))
+        sys.exit()
+
+    duration = float(parser.value(durationOption))
+    name = 'fortune-benchmark-%d' % os.getpid()
+
+    server = subprocess.Popen([sys.executable, __file__, '--serve', name],
+            stdout=subprocess.PIPE, universal_newlines=True)
+
+    try:
+        server.stdout.readline()
+
+        print("%-32s %12s %8s %7s" % ("client", "fortunes/s", "speedup",
+                "errors"))
+
+        baseline = None
+
+        for depth in [0] + [int(d) for d in
+                parser.value(depthsOption).split(',')]:
+            requester = measure(app, name, depth, duration)
+
+            if depth == 0:
+                client = "connection per request"
+                baseline = requester.rate()
+            else:
+                client = "persistent, %d outstanding" % depth
+
+            print("%-32s %12.0f %7.1fx %7d" % (client, requester.rate(),
+                    requester.rate() / baseline,
+                    requester.errors + requester.invalid))
+    finally:
+        server.terminate()
+        server.wait()
+
+        # The terminated server can't remove its socket itself.
+        QLocalServer.removeServer(name)
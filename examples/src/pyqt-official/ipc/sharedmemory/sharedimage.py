@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Share images between processes through QSharedMemory without
+serializing them.
+
+The segment starts with a header describing the pixels (width, height,
+format and bytes per line) followed by a table of slots and then the slots
+themselves, each holding the raw pixels of one image.  A reader constructs
+a QImage directly over a slot, so nothing is copied on the reading side.
+
+With a single slot the segment holds one image.  With two or more slots it
+is a ring that a producer can stream frames through: the producer always
+writes to a slot that no reader is using and then publishes it as the
+latest frame, while readers always take the latest frame.
+"""
+
+
+import struct
+
+from PyQt5.QtCore import QSharedMemory
+from PyQt5.QtGui import QImage
+
+
+class SharedImage(object):
+
+    Magic = b'QSIM'
+    Version = 1
+
+    # magic, version, width, height, format, bytes per line, slot count,
+    # latest slot, latest sequence number
+    HeaderFormat = struct.Struct('<4sIiiiiiiq')
+    HeaderSize = 64
+
+    # sequence number, number of readers
+    SlotFormat = struct.Struct('<qi4x')
+
+    Alignment = 64
+
+    def __init__(self, key):
+        self.sharedMemory = QSharedMemory(key)
+
+        self.width = 0
+        self.height = 0
+        self.format = QImage.Format_Invalid
+        self.bytesPerLine = 0
+        self.slotCount = 0
+
+        self._view = None
+        self._address = 0
+        self._dataOffset = 0
+        self._slotSize = 0
+        self._errorString = ''
+
+    @classmethod
+    def _align(cls, size):
+        return (size + cls.Alignment - 1) // cls.Alignment * cls.Alignment
+
+    def errorString(self):
+        return self._errorString or self.sharedMemory.errorString()
+
+    def isAttached(self):
+        return self._view is not None
+
+    def create(self, width, height, format=QImage.Format_RGB32, slotCount=1):
+        """Create the segment for images of the given size and format.
+        Returns False if the segment could not be created.
+        """
+
+        self._errorString = ''
+
+        # use the same line length that QImage itself would
+        bytesPerLine = QImage(width, 1, format).bytesPerLine()
+        dataOffset = self._align(
+                self.HeaderSize + self.SlotFormat.size * slotCount)
+        slotSize = self._align(bytesPerLine * height)
+
+        if not self.sharedMemory.create(dataOffset + slotSize * slotCount):
+            return False
+
+        self._setLayout(width, height, format, bytesPerLine, slotCount)
+
+        self.sharedMemory.lock()
+        self._writeHeader(-1, -1)
+        for slot in range(slotCount):
+            self._writeSlot(slot, -1, 0)
+        self.sharedMemory.unlock()
+
+        return True
+
+    def attach(self):
+        """Attach to a segment created by another process.  Returns False
+        if there is no segment or it does not contain shared images.
+        """
+
+        self._errorString = ''
+
+        if not self.sharedMemory.attach():
+            return False
+
+        view = memoryview(self.sharedMemory.constData())
+
+        self.sharedMemory.lock()
+        (magic, version, width, height, format, bytesPerLine, slotCount, _,
+                _) = self.HeaderFormat.unpack_from(view)
+        self.sharedMemory.unlock()
+
+        view.release()
+
+        if magic != self.Magic or version != self.Version:
+            self.sharedMemory.detach()
+            self._errorString = (
+                    "The shared memory segment does not contain an image.")
+            return False
+
+        self._setLayout(width, height, QImage.Format(format), bytesPerLine,
+                slotCount)
+
+        return True
+
+    def detach(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+
+        return self.sharedMemory.detach()
+
+    def _setLayout(self, width, height, format, bytesPerLine, slotCount):
+        self.width = width
+        self.height = height
+        self.format = format
+        self.bytesPerLine = bytesPerLine
+        self.slotCount = slotCount
+
+        self._dataOffset = self._align(
+                self.HeaderSize + self.SlotFormat.size * slotCount)
+        self._slotSize = self._align(bytesPerLine * height)
+
+        data = self.sharedMemory.data()
+        self._address = int(data)
+        self._view = memoryview(data)
+
+    def _readHeader(self):
+        header = self.HeaderFormat.unpack_from(self._view)
+        latestSlot, latestSequence = header[-2:]
+
+        return latestSlot, latestSequence
+
+    def _writeHeader(self, latestSlot, latestSequence):
+        self.HeaderFormat.pack_into(self._view, 0, self.Magic, self.Version,
+                self.width, self.height, int(self.format), self.bytesPerLine,
+                self.slotCount, latestSlot, latestSequence)
+
+    def _slotOffset(self, slot):
+        return self.HeaderSize + self.SlotFormat.size * slot
+
+    def _readSlot(self, slot):
+        return self.SlotFormat.unpack_from(self._view, self._slotOffset(slot))
+
+    def _writeSlot(self, slot, sequence, readers):
+        self.SlotFormat.pack_into(self._view, self._slotOffset(slot),
+                sequence, readers)
+
+    def sequence(self):
+        """Return the sequence number of the latest image, or -1 if there is
+        none.  The segment is not locked so this is only a hint, but it is
+        cheap enough to poll for new frames.
+        """
+
+        return self._readHeader()[1]
+
+    def image(self, slot):
+        """Return a QImage that uses the pixels of a slot.  The image is only
+        valid while the segment is attached.  Note that QPixmap.fromImage()
+        may share the pixels of an image, so copy() the image first if the
+        pixmap is to outlive the segment.
+        """
+
+        address = self._address + self._dataOffset + self._slotSize * slot
+
+        return QImage(address, self.width, self.height, self.bytesPerLine,
+                self.format)
+
+    def beginWrite(self):
+        """Return a slot that can be written to, or -1 if readers are using
+        all of them.  The slot is not visible to readers until endWrite() is
+        called.
+        """
+
+        self.sharedMemory.lock()
+
+        latestSlot, latestSequence = self._readHeader()
+
+        writeSlot = -1
+        oldest = None
+        for slot in range(self.slotCount):
+            if slot == latestSlot:
+                continue
+
+            sequence, readers = self._readSlot(slot)
+            if readers == 0 and (oldest is None or sequence < oldest):
+                writeSlot = slot
+                oldest = sequence
+
+        # With a single slot the latest image can only be replaced by
+        # withdrawing it first.
+        if (writeSlot < 0 and self.slotCount == 1 and
+                self._readSlot(0)[1] == 0):
+            writeSlot = 0
+            self._writeHeader(-1, latestSequence)
+
+        self.sharedMemory.unlock()
+
+        return writeSlot
+
+    def endWrite(self, slot):
+        """Publish a slot returned by beginWrite() as the latest image and
+        return its sequence number.
+        """
+
+        self.sharedMemory.lock()
+
+        _, latestSequence = self._readHeader()
+        sequence = latestSequence + 1
+        self._writeSlot(slot, sequence, 0)
+        self._writeHeader(slot, sequence)
+
+        self.sharedMemory.unlock()
+
+        return sequence
+
+    def write(self, image):
+        """Copy an image into a free slot and publish it.  Returns False if
+        there was no free slot.
+        """
+
+        if image.width() != self.width or image.height() != self.height:
+            raise ValueError(
+                    "the image is %dx%d but the segment holds %dx%d images" %
+                            (image.width(), image.height(), self.width,
+                                    self.height))
+
+        if image.format() != self.format:
+            image = image.convertToFormat(self.format)
+
+        slot = self.beginWrite()
+        if slot < 0:
+            return False
+
+        bits = image.constBits()
+        bits.setsize(image.bytesPerLine() * image.height())
+        source = memoryview(bits)
+
+        start = self._dataOffset + self._slotSize * slot
+
+        if image.bytesPerLine() == self.bytesPerLine:
+            size = self.bytesPerLine * self.height
+            self._view[start:start + size] = source[:size]
+        else:
+            length = min(image.bytesPerLine(), self.bytesPerLine)
+            for y in range(self.height):
+                line = y * image.bytesPerLine()
+                offset = start + y * self.bytesPerLine
+                self._view[offset:offset + length] = source[line:line + length]
+
+        self.endWrite(slot)
+
+        return True
+
+    def acquire(self, after=-1):
+        """Take the latest image if its sequence number is greater than
+        after.  Returns a (sequence, slot, image) tuple, or None if there is
+        no newer image.  The image uses the shared pixels directly, and the
+        slot will not be reused until it is passed to release().
+        """
+
+        self.sharedMemory.lock()
+
+        latestSlot, latestSequence = self._readHeader()
+
+        if latestSlot < 0 or latestSequence <= after:
+            self.sharedMemory.unlock()
+            return None
+
+        sequence, readers = self._readSlot(latestSlot)
+        self._writeSlot(latestSlot, sequence, readers + 1)
+
+        self.sharedMemory.unlock()
+
+        return latestSequence, latestSlot, self.image(latestSlot)
+
+    def release(self, slot):
+        self.sharedMemory.lock()
+
+        sequence, readers = self._readSlot(slot)
+        self._writeSlot(slot, sequence, readers - 1)
+
+        self.sharedMemory.unlock()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure how many frames per second can be streamed between processes
+through a shared memory segment.
+
+A producer in this process writes frames into a double-buffered SharedImage
+while a consumer in a second process takes the latest frame whenever a new
+one has been published.  The last pixel of every frame encodes its sequence
+number so that the consumer can check that it never sees a frame that is
+being overwritten.  For comparison the frames are also passed through a
+segment the way the example originally did, by serializing them with
+QDataStream.
+"""
+
+
+import multiprocessing
+import sys
+import time
+
+from PyQt5.QtCore import (QBuffer, QCommandLineOption, QCommandLineParser,
+        QCoreApplication, QDataStream, QSharedMemory)
+from PyQt5.QtGui import QImage, qRgb
+
+from sharedimage import SharedImage
+
+
+Key = 'SharedImageBenchmark'
+
+
+def sequenceColor(sequence):
+    return qRgb(sequence & 0xff, (sequence >> 8) & 0xff,
+            (sequence >> 16) & 0xff)
+
+
+def consume(ready, stop, results):
+    sharedImage = SharedImage(Key)
+    if not sharedImage.attach():
+        results.put((0, 0))
+        ready.set()
+        return
+
+    ready.set()
+
+    frames = 0
+    errors = 0
+    last = -1
+    x = sharedImage.width - 1
+    y = sharedImage.height - 1
+
+    while not stop.is_set():
+        if sharedImage.sequence() <= last:
+            time.sleep(0)
+            continue
+
+        frame = sharedImage.acquire(last)
+        if frame is None:
+            continue
+
+        last, slot, image = frame
+        if image.pixel(x, y) != sequenceColor(last):
+            errors += 1
+        sharedImage.release(slot)
+
+        frames += 1
+
+    sharedImage.detach()
+    results.put((frames, errors))
+
+
+def produce(width, height, duration, direct, context):
+    sharedImage = SharedImage(Key)
+    if not sharedImage.create(width, height, QImage.Format_RGB32, 2):
+        raise RuntimeError(sharedImage.errorString())
+
+    ready = context.Event()
+    stop = context.Event()
+    results = context.Queue()
+    consumer = context.Process(target=consume, args=(ready, stop, results))
+    consumer.start()
+    ready.wait()
+
+    source = QImage(width, height, QImage.Format_RGB32)
+    source.fill(0xff336699)
+
+    frames = 0
+    sequence = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        color = sequenceColor(sequence)
+
+        if direct:
+            # render straight into the shared memory
+            slot = sharedImage.beginWrite()
+            if slot < 0:
+                continue
+
+            image = sharedImage.image(slot)
+            image.fill(0xff336699)
+            image.setPixel(width - 1, height - 1, color)
+            sharedImage.endWrite(slot)
+        else:
+            source.setPixel(width - 1, height - 1, color)
+            if not sharedImage.write(source):
+                continue
+
+        frames += 1
+        sequence += 1
+
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    consumed, errors = results.get()
+    consumer.join()
+    sharedImage.detach()
+
+    if errors:
+        print("consumer saw %d damaged frames" % errors)
+
+    return frames / elapsed, consumed / elapsed
+
+
+def serialize(width, height, duration):
+    # The original protocol within a single process: the time taken by the
+    # consumer is added to that taken by the producer.
+    sharedMemory = QSharedMemory(Key + 'Stream')
+
+    source = QImage(width, height, QImage.Format_RGB32)
+    source.fill(0xff336699)
+
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        buf = QBuffer()
+        buf.open(QBuffer.ReadWrite)
+        out = QDataStream(buf)
+        out << source
+        size = buf.size()
+
+        if not sharedMemory.isAttached() and not sharedMemory.create(size):
+            raise RuntimeError(sharedMemory.errorString())
+
+        sharedMemory.lock()
+        sharedMemory.data()[:size] = buf.data()[:size]
+        sharedMemory.unlock()
+
+        buf = QBuffer()
+        ins = QDataStream(buf)
+        image = QImage()
+
+        sharedMemory.lock()
+        buf.setData(sharedMemory.constData())
+        buf.open(QBuffer.ReadOnly)
+        ins >> image
+        sharedMemory.unlock()
+
+        frames += 1
+
+    elapsed = time.perf_counter() - start
+    sharedMemory.detach()
+
+    return frames / elapsed
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure the frame rate of images streamed through shared "
+            "memory.")
+    parser.addHelpOption()
+    durationOption = QCommandLineOption(['d', 'duration'],
+            "Stream each resolution for <seconds> seconds.", 'seconds', '2')
+    parser.addOption(durationOption)
+    parser.process(app)
+
+    duration = float(parser.value(durationOption))
+    context = multiprocessing.get_context('spawn')
+
+    print("%-12s %12s %12s %12s %12s %12s" % ("resolution", "serialized",
+            "copy sent", "copy read", "direct sent", "direct read"))
+
+    for width, height in ((320, 240), (640, 480), (1280, 720), (1920, 1080),
+            (3840, 2160)):
+        serialized = serialize(width, height, duration)
+        copySent, copyRead = produce(width, height, duration, False, context)
+        directSent, directRead = produce(width, height, duration, True,
+                context)
+
+        print("%-12s %8.0f fps %8.0f fps %8.0f fps %8.0f fps %8.0f fps" % (
+                "%dx%d" % (width, height), serialized, copySent, copyRead,
+                directSent, directRead))
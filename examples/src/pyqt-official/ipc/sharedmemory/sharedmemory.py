@@ -44,11 +44,11 @@
 #############################################################################
 
 
-from PyQt5.QtCore import QBuffer, QDataStream, QSharedMemory
 from PyQt5.QtGui import QImage, QPixmap
 from PyQt5.QtWidgets import QApplication, QDialog, QFileDialog
 
 from dialog import Ui_Dialog
+from sharedimage import SharedImage
 
 
 class Dialog(QDialog):
@@ -61,17 +61,18 @@ class Dialog(QDialog):
     shared memory.  The second process displays the same image loaded from its
     new location in shared memory.
 
-    The class contains a data member sharedMemory, which is initialized with
+    The class contains a data member sharedImage, which is initialized with
     the key "QSharedMemoryExample" to force all instances of Dialog to access
-    the same shared memory segment.  The constructor also connects the
-    clicked() signal from each of the three dialog buttons to the slot function
-    appropriate for handling each button.
+    the same shared memory segment.  The segment holds the raw pixels of the
+    image, so the second process can use them without deserializing them.
+    The constructor also connects the clicked() signal from each of the three
+    dialog buttons to the slot function appropriate for handling each button.
     """
 
     def __init__(self, parent = None):
         super(Dialog, self).__init__(parent)
 
-        self.sharedMemory = QSharedMemory('QSharedMemoryExample')
+        self.sharedImage = SharedImage('QSharedMemoryExample')
 
         self.ui = Ui_Dialog()
         self.ui.setupUi(self)
@@ -89,18 +90,17 @@ class Dialog(QDialog):
         example from the beginning if we run it multiple times with the same
         two Dialog processes.  After detaching from an existing shared memory
         segment, the user is prompted to select an image file.  The selected
-        file is loaded into a QImage.  The QImage is displayed in the Dialog
-        and streamed into a QBuffer with a QDataStream.  Next, it gets a new
-        shared memory segment from the system big enough to hold the image data
-        in the QBuffer, and it locks the segment to prevent the second Dialog
-        process from accessing it.  Then it copies the image from the QBuffer
-        into the shared memory segment.  Finally, it unlocks the shared memory
-        segment so the second Dialog process can access it.  After self
-        function runs, the user is expected to press the "Load Image from
-        Shared Memory" button on the second Dialog process.
+        file is loaded into a QImage.  The QImage is displayed in the Dialog.
+        Next, it gets a new shared memory segment from the system big enough
+        to hold a header describing the image and its pixels, and it copies
+        the pixels into the segment.  The segment is locked only while the
+        header is updated, so the second Dialog process never sees a
+        partially written image.  After this function runs, the user is
+        expected to press the "Load Image from Shared Memory" button on the
+        second Dialog process.
         """
 
-        if self.sharedMemory.isAttached():
+        if self.sharedImage.isAttached():
             self.detach()
 
         self.ui.label.setText("Select an image file")
@@ -115,51 +115,45 @@ class Dialog(QDialog):
         self.ui.label.setPixmap(QPixmap.fromImage(image))
 
         # Load into shared memory.
-        buf = QBuffer()
-        buf.open(QBuffer.ReadWrite)
-        out = QDataStream(buf)
-        out << image
-        size = buf.size()
+        if image.hasAlphaChannel():
+            format = QImage.Format_ARGB32_Premultiplied
+        else:
+            format = QImage.Format_RGB32
 
-        if not self.sharedMemory.create(size):
+        if not self.sharedImage.create(image.width(), image.height(), format):
             self.ui.label.setText("Unable to create shared memory segment.")
             return
 
-        size = min(self.sharedMemory.size(), size)
-        self.sharedMemory.lock()
-
-        # Copy image data from buf into shared memory area.
-        self.sharedMemory.data()[:size] = buf.data()[:size]
-        self.sharedMemory.unlock()
+        self.sharedImage.write(image)
 
     def loadFromMemory(self):
         """ This slot function is called in the second Dialog process, when the
         user presses the "Load Image from Shared Memory" button.  First, it
         attaches the process to the shared memory segment created by the first
-        Dialog process.  Then it locks the segment for exclusive access, copies
-        the image data from the segment into a QBuffer, and streams the QBuffer
-        into a QImage.  Then it unlocks the shared memory segment, detaches
-        from it, and finally displays the QImage in the Dialog.
+        Dialog process.  Then it acquires the image, which is a QImage that
+        uses the pixels in the segment directly, and displays a copy of it
+        in the Dialog.  Finally it releases the image and detaches from the
+        segment.
         """
 
-        if not self.sharedMemory.attach():
+        if not self.sharedImage.attach():
             self.ui.label.setText(
                     "Unable to attach to shared memory segment.\nLoad an "
                     "image first.")
             return
- 
-        buf = QBuffer()
-        ins = QDataStream(buf)
-        image = QImage()
 
-        self.sharedMemory.lock()
-        buf.setData(self.sharedMemory.constData())
-        buf.open(QBuffer.ReadOnly)
-        ins >> image
-        self.sharedMemory.unlock()
-        self.sharedMemory.detach()
+        frame = self.sharedImage.acquire()
+        if frame is None:
+            self.ui.label.setText("The shared memory segment is empty.")
+        else:
+            # QPixmap.fromImage() may share the pixels rather than copy them
+            # so make the one copy that is needed to keep the image after the
+            # segment is detached.
+            sequence, slot, image = frame
+            self.ui.label.setPixmap(QPixmap.fromImage(image.copy()))
+            self.sharedImage.release(slot)
 
-        self.ui.label.setPixmap(QPixmap.fromImage(image))
+        self.sharedImage.detach()
 
     def detach(self):
         """ This private function is called by the destructor to detach the
@@ -167,7 +161,7 @@ class Dialog(QDialog):
         from a shared memory segment, the system releases the shared memory.
         """
 
-        if not self.sharedMemory.detach():
+        if not self.sharedImage.detach():
             self.ui.label.setText("Unable to detach from shared memory.")
 
 
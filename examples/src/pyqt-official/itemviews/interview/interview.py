@@ -62,9 +62,28 @@ images_dir = QFileInfo(__file__).absolutePath() + '/images'
 
 
 class Node(object):
-    def __init__(self, parent = None):
+    """A node of the tree.  Every node has the same number of children, so
+    only those that have been asked for by a view are created, and each node
+    remembers its row so that the index of its parent can be found directly.
+    """
+
+    __slots__ = ('parent', 'row', 'children')
+
+    def __init__(self, parent = None, row = -1):
         self.parent = parent
-        self.children = []
+        self.row = row
+        self.children = None
+
+    def child(self, row):
+        if self.children is None:
+            self.children = {}
+        else:
+            node = self.children.get(row)
+            if node is not None:
+                return node
+
+        node = self.children[row] = Node(self, row)
+        return node
 
 
 class Model(QAbstractItemModel):
@@ -73,12 +92,18 @@ class Model(QAbstractItemModel):
         self.services = QIcon(images_dir + '/services.png')
         self.rc = rows
         self.cc = columns
-        self.tree = [Node() for node in range(rows)]
-        self.iconProvider = QFileIconProvider()
+        self.root = Node()
+        iconProvider = QFileIconProvider()
+        self.folderIcon = iconProvider.icon(QFileIconProvider.Folder)
+        self.fileIcon = iconProvider.icon(QFileIconProvider.File)
+
+        # the view asks for these for every row it lays out
+        self.itemFlags = (Qt.ItemIsDragEnabled | Qt.ItemIsSelectable |
+                Qt.ItemIsEnabled)
 
     def index(self, row, column, parent):
         if row < self.rc and row >= 0 and column < self.cc and column >= 0:
-            parentNode = parent.internalPointer()
+            parentNode = parent.internalPointer() if parent.isValid() else None
             childNode = self.node(row, parentNode)
             if childNode is not None:
                 return self.createIndex(row, column, childNode)
@@ -91,11 +116,11 @@ class Model(QAbstractItemModel):
                 childNode = child.internalPointer()
                 parentNode = self.parent(childNode)
                 if parentNode:
-                    return self.createIndex(self.row(parentNode), 0, parentNode)
+                    return self.createIndex(parentNode.row, 0, parentNode)
             return QModelIndex()
         else:
-            # parent of Node
-            if child:
+            # parent of Node, top level nodes have none
+            if child and child.parent is not self.root:
                 return child.parent
 
     def rowCount(self, parent):
@@ -113,8 +138,8 @@ class Model(QAbstractItemModel):
             return "Item %d:%s" % (index.row(), index.column())
         elif role == Qt.DecorationRole:
             if index.column() == 0:
-                return self.iconProvider.icon(QFileIconProvider.Folder)
-            return self.iconProvider.icon(QFileIconProvider.File)
+                return self.folderIcon
+            return self.fileIcon
         return None
 
     def headerData(self, section, orientation, role):
@@ -132,21 +157,16 @@ class Model(QAbstractItemModel):
     def flags(self, index):
         if not index.isValid():
             return 0
-        return Qt.ItemIsDragEnabled | super(Model, self).flags(index)
+        return self.itemFlags
 
     def node(self, row, parent):
-        if parent and not parent.children:
-            parent.children = [Node(parent) for node in range(self.rc)]
         if parent:
-            return parent.children[row]
+            return parent.child(row)
         else:
-            return self.tree[row]
+            return self.root.child(row)
 
     def row(self, node):
-        if node.parent:
-            return node.parent.children.index(node)
-        else:
-            return self.tree.index(node)
+        return node.row
 
 
 def main(args):
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+"""Measure how the interview model scales with the number of rows.
+
+A tree view shows a model with the given number of rows at every level.  A
+chain of nodes is expanded down to the given depth, always expanding the last
+row of the previous level, and the view is then scrolled from the top to the
+bottom, repainting after every step.  For comparison the same is done with a
+model that, like the model used to, creates every child of a node at once and
+finds the row of a node by searching its parent's list of children.
+"""
+
+
+import sys
+import time
+
+from PyQt5.QtCore import QCommandLineOption, QCommandLineParser, QModelIndex
+from PyQt5.QtWidgets import QApplication, QTreeView
+
+from interview import Model
+
+
+class ListNode(object):
+    def __init__(self, parent = None):
+        self.parent = parent
+        self.children = []
+
+
+class ListModel(Model):
+    """The model as it was before nodes remembered their rows."""
+
+    def __init__(self, rows, columns, parent = None):
+        super(ListModel, self).__init__(rows, columns, parent)
+        self.tree = [ListNode() for node in range(rows)]
+
+    def parent(self, child):
+        if child.isValid():
+            parentNode = child.internalPointer().parent
+            if parentNode:
+                return self.createIndex(self.row(parentNode), 0, parentNode)
+        return QModelIndex()
+
+    def node(self, row, parent):
+        if parent and not parent.children:
+            parent.children = [ListNode(parent) for node in range(self.rc)]
+        if parent:
+            return parent.children[row]
+        else:
+            return self.tree[row]
+
+    def row(self, node):
+        if node.parent:
+            return node.parent.children.index(node)
+        else:
+            return self.tree.index(node)
+
+
+def expand(view, model, depth):
+    index = QModelIndex()
+    for level in range(depth):
+        index = model.index(model.rowCount(index) - 1, 0, index)
+        view.expand(index)
+        view.scrollTo(index)
+        view.viewport().repaint()
+
+
+def scroll(app, view, steps):
+    scrollBar = view.verticalScrollBar()
+    for step in range(steps + 1):
+        scrollBar.setValue(scrollBar.maximum() * step // steps)
+        view.viewport().repaint()
+        app.processEvents()
+
+
+def measure(app, modelType, rows, depth, steps):
+    model = modelType(rows, 10)
+
+    view = QTreeView()
+    view.setUniformRowHeights(True)
+    view.setModel(model)
+    view.resize(800, 600)
+    view.show()
+    app.processEvents()
+
+    start = time.perf_counter()
+    expand(view, model, depth)
+    expanded = time.perf_counter()
+    scroll(app, view, steps)
+    scrolled = time.perf_counter()
+
+    view.hide()
+
+    return expanded - start, (scrolled - expanded) / (steps + 1)
+
+
+if __name__ == '__main__':
+
+    app = QApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure how the interview model scales with the number of rows.")
+    parser.addHelpOption()
+    rowsOption = QCommandLineOption(['r', 'rows'],
+            "Use the comma separated numbers of <rows> at each level.",
+            'rows', '1000,10000,100000')
+    parser.addOption(rowsOption)
+    depthOption = QCommandLineOption(['d', 'depth'],
+            "Expand nodes down to <depth> levels.", 'depth', '5')
+    parser.addOption(depthOption)
+    stepsOption = QCommandLineOption(['s', 'steps'],
+            "Scroll from the top to the bottom in <steps> steps.", 'steps',
+            '100')
+    parser.addOption(stepsOption)
+    listRowsOption = QCommandLineOption(['l', 'list-rows'],
+            "Only measure the list model with up to <rows> rows.", 'rows',
+            '10000')
+    parser.addOption(listRowsOption)
+    parser.process(app)
+
+    depth = int(parser.value(depthOption))
+    steps = int(parser.value(stepsOption))
+    listRows = int(parser.value(listRowsOption))
+
+    print("%d levels expanded, %d scroll steps" % (depth, steps + 1))
+    print("%-10s %8s %12s %14s" % ("model", "rows", "expand (s)",
+            "scroll (ms)"))
+
+    for rows in [int(r) for r in parser.value(rowsOption).split(',')]:
+        for name, modelType in (("list", ListModel), ("node", Model)):
+            if modelType is ListModel and rows > listRows:
+                continue
+
+            expanding, scrolling = measure(app, modelType, rows, depth,
+                    steps)
+            print("%-10s %8d %12.3f %14.2f" % (name, rows, expanding,
+                    scrolling * 1000))
@@ -42,21 +42,60 @@
 #############################################################################
 
 
-from PyQt5.QtCore import (QAbstractTableModel, QDir, QModelIndex, QRect,
-        QRectF, QSize, Qt)
-from PyQt5.QtGui import QBrush, qGray, QImage, QPainter
+import collections
+import os.path
+import sys
+
+from PyQt5.QtCore import (QAbstractTableModel, QDir, QModelIndex, QPointF,
+        QRect, QRectF, QSize, Qt)
+from PyQt5.QtGui import (QBrush, qGray, QImage, QPainter, QPixelFormat,
+        QPixmap)
 from PyQt5.QtPrintSupport import QPrintDialog, QPrinter
-from PyQt5.QtWidgets import (QAbstractItemDelegate, QApplication, QDialog,
-        QFileDialog, QHBoxLayout, QLabel, QMainWindow, QMessageBox, QMenu,
-        QProgressDialog, QSpinBox, QStyle, QStyleOptionViewItem, QTableView,
+from PyQt5.QtWidgets import (QAbstractItemDelegate, QAbstractScrollArea,
+        QApplication, QCheckBox, QDialog, QFileDialog, QHBoxLayout, QLabel,
+        QMainWindow, QMessageBox, QMenu, QProgressDialog, QSpinBox,
+        QStackedWidget, QStyle, QStyleOptionViewItem, QTableView,
         QVBoxLayout, QWidget)
 
 import pixelator_rc
 
+# Access the shared module.
+sys.path.insert(1,
+        os.path.join(
+                os.path.dirname(os.path.dirname(os.path.dirname(
+                        os.path.abspath(__file__)))),
+                'shared'))
+
+try:
+    import numpy
+    from numpyimage import arrayToImage, grayArray, imageToArray
+except ImportError:
+    numpy = None
+    grayArray = None
+
 
 ItemSize = 256
 
 
+def grayImage(image):
+    """Return a Grayscale8 image with the qGray() value of the colour that
+    QImage.pixel() gives for each pixel of an image.
+    """
+
+    # The brightness of every pixel is computed in one go when NumPy is
+    # available.
+    if grayArray is not None and not image.isNull():
+        return arrayToImage(grayArray(image))
+
+    # Qt unpremultiplies the colours when converting to Grayscale8 but
+    # QImage.pixel() gives them premultiplied.
+    if image.pixelFormat().premultiplied() == QPixelFormat.Premultiplied:
+        image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        image.reinterpretAsFormat(QImage.Format_ARGB32)
+
+    return image.convertToFormat(QImage.Format_Grayscale8)
+
+
 class PixelDelegate(QAbstractItemDelegate):
     def __init__(self, parent=None):
         super(PixelDelegate, self).__init__(parent)
@@ -101,10 +140,21 @@ class ImageModel(QAbstractTableModel):
         super(ImageModel, self).__init__(parent)
 
         self.modelImage = QImage()
+        self.brightness = None
+        self.grayImage = QImage()
 
     def setImage(self, image):
         self.beginResetModel()
         self.modelImage = QImage(image)
+
+        # The brightness is read from the same image as the PixelView draws.
+        self.grayImage = grayImage(self.modelImage)
+
+        if numpy is not None and not self.grayImage.isNull():
+            self.brightness = imageToArray(self.grayImage, writable=False)
+        else:
+            self.brightness = None
+
         self.endResetModel()
 
     def rowCount(self, parent):
@@ -117,7 +167,10 @@ class ImageModel(QAbstractTableModel):
         if not index.isValid() or role != Qt.DisplayRole:
             return None
 
-        return qGray(self.modelImage.pixel(index.column(), index.row()))
+        if self.brightness is not None:
+            return int(self.brightness[index.row(), index.column()])
+
+        return qGray(self.grayImage.pixel(index.column(), index.row()))
 
     def headerData(self, section, orientation, role):
         if role == Qt.SizeHintRole:
@@ -126,6 +179,219 @@ class ImageModel(QAbstractTableModel):
         return None
 
 
+class PixelView(QAbstractScrollArea):
+    """A view of an ImageModel that looks the same as a QTableView using a
+    PixelDelegate, but that draws whole tiles of cells at a time and keeps
+    them for when the view is scrolled.  The brightness of the image is
+    read once, and the circle for each of the possible radii is drawn once.
+    Cells cannot be selected.
+    """
+
+    TileSize = 256
+
+    # the size of the glyph radius steps in pixels
+    RadiusStep = 0.25
+
+    MaxCacheBytes = 64 * 1024 * 1024
+
+    def __init__(self, parent=None):
+        super(PixelView, self).__init__(parent)
+
+        self.model = None
+        self.pixelSize = 12
+        self.useNumPy = numpy is not None
+
+        self.gray = None
+        self.levels = None
+        self.levelTable = None
+        self.glyphs = None
+        self.tiles = collections.OrderedDict()
+
+    def setModel(self, model):
+        self.model = model
+        model.modelReset.connect(self.reset)
+        self.reset()
+
+    def setPixelSize(self, size):
+        self.pixelSize = size
+        self.invalidate()
+
+    def reset(self):
+        image = self.model.grayImage
+        if image.isNull():
+            self.gray = None
+        elif self.useNumPy:
+            self.gray = imageToArray(image, writable=False)
+        else:
+            bits = image.constBits()
+            bits.setsize(image.bytesPerLine() * image.height())
+            self.gray = bytes(bits)
+
+        self.invalidate()
+
+    def invalidate(self):
+        """Discard everything that depends on the pixel size."""
+
+        self.levels = None
+        self.glyphs = None
+        self.tiles.clear()
+
+        self.updateScrollBars()
+        self.viewport().update()
+
+    def contentsSize(self):
+        if self.gray is None:
+            return QSize()
+
+        return QSize(self.model.grayImage.width() * self.pixelSize,
+                self.model.grayImage.height() * self.pixelSize)
+
+    def updateScrollBars(self):
+        size = self.contentsSize()
+        viewport = self.viewport().size()
+
+        self.horizontalScrollBar().setRange(0,
+                max(0, size.width() - viewport.width()))
+        self.horizontalScrollBar().setPageStep(viewport.width())
+        self.horizontalScrollBar().setSingleStep(self.pixelSize)
+        self.verticalScrollBar().setRange(0,
+                max(0, size.height() - viewport.height()))
+        self.verticalScrollBar().setPageStep(viewport.height())
+        self.verticalScrollBar().setSingleStep(self.pixelSize)
+
+    def resizeEvent(self, event):
+        self.updateScrollBars()
+
+    def prepare(self):
+        """Create the glyphs for the current pixel size and quantize the
+        brightness of the image to them.
+        """
+
+        size = self.pixelSize
+        steps = int(size / 2.0 / self.RadiusStep)
+
+        # the glyph of each brightness, as in PixelDelegate.paint()
+        levelTable = bytes(
+                int(round((size / 2.0 - b / 255.0 * size / 2.0) /
+                        self.RadiusStep))
+                for b in range(256))
+
+        glyphs = QImage(size * (steps + 1), size,
+                QImage.Format_ARGB32_Premultiplied)
+        glyphs.fill(self.palette().base().color())
+
+        painter = QPainter(glyphs)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QBrush(Qt.black))
+        for step in range(1, steps + 1):
+            radius = step * self.RadiusStep
+            painter.drawEllipse(QRectF(step * size + size / 2.0 - radius,
+                    size / 2.0 - radius, 2 * radius, 2 * radius))
+        painter.end()
+
+        if self.useNumPy:
+            table = numpy.frombuffer(levelTable, dtype=numpy.uint8)
+            self.levels = table[self.gray]
+
+            # (steps + 1, size, size) pixels, one glyph after another
+            atlas = imageToArray(glyphs, writable=False)
+            self.glyphs = numpy.ascontiguousarray(
+                    atlas.reshape(size, steps + 1, size).transpose(1, 0, 2))
+        else:
+            self.levelTable = levelTable
+            self.levels = self.gray.translate(levelTable)
+            self.glyphs = QPixmap.fromImage(glyphs)
+
+    def tileCells(self):
+        return max(1, self.TileSize // self.pixelSize)
+
+    def tile(self, column, row):
+        key = (column, row)
+        pixmap = self.tiles.get(key)
+        if pixmap is not None:
+            self.tiles.move_to_end(key)
+            return pixmap
+
+        if self.levels is None:
+            self.prepare()
+
+        pixmap = self.renderTile(column, row)
+        self.tiles[key] = pixmap
+
+        tileBytes = pixmap.width() * pixmap.height() * 4
+        while len(self.tiles) * tileBytes > self.MaxCacheBytes:
+            self.tiles.popitem(last=False)
+
+        return pixmap
+
+    def renderTile(self, column, row):
+        size = self.pixelSize
+        cells = self.tileCells()
+        image = self.model.grayImage
+
+        left = column * cells
+        top = row * cells
+        right = min(left + cells, image.width())
+        bottom = min(top + cells, image.height())
+
+        if self.useNumPy:
+            levels = self.levels[top:bottom, left:right]
+
+            # gather the glyph of every cell and interleave their rows
+            pixels = self.glyphs[levels].transpose(0, 2, 1, 3).reshape(
+                    (bottom - top) * size, (right - left) * size)
+
+            return QPixmap.fromImage(arrayToImage(
+                    numpy.ascontiguousarray(pixels),
+                    QImage.Format_ARGB32_Premultiplied).copy())
+
+        pixmap = QPixmap((right - left) * size, (bottom - top) * size)
+        pixmap.fill(self.palette().base().color())
+
+        create = QPainter.PixmapFragment.create
+        stride = image.bytesPerLine()
+        half = size / 2.0
+        fragments = []
+        for y in range(top, bottom):
+            start = y * stride
+            line = self.levels[start + left:start + right]
+            centerY = (y - top) * size + half
+            for x, level in enumerate(line):
+                if level:
+                    fragments.append(create(QPointF(x * size + half, centerY),
+                            QRectF(level * size, 0, size, size)))
+
+        painter = QPainter(pixmap)
+        painter.drawPixmapFragments(fragments, self.glyphs)
+        painter.end()
+
+        return pixmap
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), self.palette().base())
+
+        if self.gray is None:
+            return
+
+        x = self.horizontalScrollBar().value()
+        y = self.verticalScrollBar().value()
+        extent = self.tileCells() * self.pixelSize
+        contents = QRect(0, 0, self.contentsSize().width(),
+                self.contentsSize().height())
+        exposed = event.rect().translated(x, y).intersected(contents)
+        if exposed.isEmpty():
+            return
+
+        for row in range(exposed.top() // extent,
+                exposed.bottom() // extent + 1):
+            for column in range(exposed.left() // extent,
+                    exposed.right() // extent + 1):
+                painter.drawPixmap(column * extent - x, row * extent - y,
+                        self.tile(column, row))
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super(MainWindow, self).__init__()
@@ -146,6 +412,15 @@ class MainWindow(QMainWindow):
         delegate = PixelDelegate(self)
         self.view.setItemDelegate(delegate)
 
+        self.pixelView = PixelView()
+        self.pixelView.setModel(self.model)
+
+        self.views = QStackedWidget()
+        self.views.addWidget(self.view)
+        self.views.addWidget(self.pixelView)
+
+        tiledCheckBox = QCheckBox("Draw cached tiles")
+
         pixelSizeLabel = QLabel("Pixel size:")
         pixelSizeSpinBox = QSpinBox()
         pixelSizeSpinBox.setMinimum(4)
@@ -175,15 +450,18 @@ class MainWindow(QMainWindow):
         quitAction.triggered.connect(QApplication.instance().quit)
         aboutAction.triggered.connect(self.showAboutBox)
         pixelSizeSpinBox.valueChanged.connect(delegate.setPixelSize)
+        pixelSizeSpinBox.valueChanged.connect(self.pixelView.setPixelSize)
         pixelSizeSpinBox.valueChanged.connect(self.updateView)
+        tiledCheckBox.toggled.connect(self.setTiled)
 
         controlsLayout = QHBoxLayout()
         controlsLayout.addWidget(pixelSizeLabel)
         controlsLayout.addWidget(pixelSizeSpinBox)
         controlsLayout.addStretch(1)
+        controlsLayout.addWidget(tiledCheckBox)
 
         mainLayout = QVBoxLayout()
-        mainLayout.addWidget(self.view)
+        mainLayout.addWidget(self.views)
         mainLayout.addLayout(controlsLayout)
         centralWidget.setLayout(mainLayout)
 
@@ -286,6 +564,9 @@ class MainWindow(QMainWindow):
                 "delegate can be used to produce a specialized "
                 "representation\nof data in a simple custom model.")
 
+    def setTiled(self, tiled):
+        self.views.setCurrentWidget(self.pixelView if tiled else self.view)
+
     def updateView(self):
         self.view.resizeColumnsToContents()
         self.view.resizeRowsToContents()
@@ -293,8 +574,6 @@ class MainWindow(QMainWindow):
 
 if __name__ == '__main__':
 
-    import sys
-
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
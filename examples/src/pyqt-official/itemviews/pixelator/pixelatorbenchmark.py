@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+"""Measure how quickly the pixelator's views can be scrolled.
+
+A large image is generated and shown by a QTableView using the PixelDelegate
+and by a PixelView, with and without NumPy.  Each view is scrolled a step at
+a time down and across the image, repainting after every step.  The first
+pass over the image shows the cost of drawing cells that have not been seen
+before, the second pass the cost of drawing cells that have.
+"""
+
+
+import random
+import sys
+import time
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser, QPointF,
+        Qt)
+from PyQt5.QtGui import QColor, QImage, QPainter, QRadialGradient
+from PyQt5.QtWidgets import QApplication, QTableView
+
+import pixelator
+from pixelator import ImageModel, PixelDelegate, PixelView
+
+
+def createImage(size):
+    rand = random.Random(0)
+
+    image = QImage(size, size, QImage.Format_RGB32)
+    image.fill(Qt.white)
+
+    painter = QPainter(image)
+    painter.setPen(Qt.NoPen)
+    for i in range(200):
+        center = QPointF(rand.uniform(0, size), rand.uniform(0, size))
+        radius = rand.uniform(size / 40.0, size / 8.0)
+        gradient = QRadialGradient(center, radius)
+        gradient.setColorAt(0, QColor(rand.randrange(0x1000000)))
+        gradient.setColorAt(1, Qt.transparent)
+        painter.setBrush(gradient)
+        painter.drawEllipse(center, radius, radius)
+    painter.end()
+
+    return image
+
+
+def createTableView(model, pixelSize):
+    view = QTableView()
+    view.setShowGrid(False)
+    view.horizontalHeader().hide()
+    view.verticalHeader().hide()
+    view.horizontalHeader().setMinimumSectionSize(1)
+    view.verticalHeader().setMinimumSectionSize(1)
+    view.horizontalHeader().setDefaultSectionSize(pixelSize)
+    view.verticalHeader().setDefaultSectionSize(pixelSize)
+
+    delegate = PixelDelegate(view)
+    delegate.setPixelSize(pixelSize)
+    view.setItemDelegate(delegate)
+    view.setModel(model)
+
+    return view
+
+
+def createPixelView(model, pixelSize, useNumPy):
+    view = PixelView()
+    view.useNumPy = useNumPy
+    view.setModel(model)
+    view.setPixelSize(pixelSize)
+
+    return view
+
+
+def scroll(app, view, steps):
+    """Scroll diagonally across the view in the given number of steps and
+    return the number of frames per second.
+    """
+
+    horizontal = view.horizontalScrollBar()
+    vertical = view.verticalScrollBar()
+
+    start = time.perf_counter()
+    for step in range(steps + 1):
+        horizontal.setValue(horizontal.maximum() * step // steps)
+        vertical.setValue(vertical.maximum() * step // steps)
+        view.viewport().repaint()
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+
+    return (steps + 1) / elapsed
+
+
+if __name__ == '__main__':
+
+    app = QApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure how quickly the pixelator's views can be scrolled.")
+    parser.addHelpOption()
+    sizeOption = QCommandLineOption(['s', 'size'],
+            "Use an image of <size> by <size> pixels.", 'size', '2000')
+    parser.addOption(sizeOption)
+    pixelSizeOption = QCommandLineOption(['p', 'pixel-size'],
+            "Draw each pixel as a cell of <pixels> by <pixels>.", 'pixels',
+            '12')
+    parser.addOption(pixelSizeOption)
+    stepsOption = QCommandLineOption(['f', 'frames'],
+            "Scroll across the image in <frames> steps.", 'frames', '200')
+    parser.addOption(stepsOption)
+    parser.process(app)
+
+    size = int(parser.value(sizeOption))
+    pixelSize = int(parser.value(pixelSizeOption))
+    steps = int(parser.value(stepsOption))
+
+    model = ImageModel()
+    model.setImage(createImage(size))
+
+    views = [("QTableView", createTableView(model, pixelSize))]
+    views.append(("PixelView",
+            createPixelView(model, pixelSize, useNumPy=False)))
+    if pixelator.numpy is not None:
+        views.append(("PixelView (NumPy)",
+                createPixelView(model, pixelSize, useNumPy=True)))
+
+    print("%dx%d pixels, cells of %dx%d, %d frames" % (size, size, pixelSize,
+            pixelSize, steps + 1))
+    print("%-20s %12s %12s" % ("view", "first fps", "second fps"))
+
+    for name, view in views:
+        view.resize(800, 600)
+        view.show()
+        app.processEvents()
+
+        first = scroll(app, view, steps)
+        second = scroll(app, view, steps)
+        print("%-20s %12.1f %12.1f" % (name, first, second))
+
+        view.hide()
@@ -40,18 +40,18 @@
 #############################################################################
 
 
-from PyQt5.QtCore import QDate, QPoint, Qt
-from PyQt5.QtGui import QColor, QIcon, QKeySequence, QPainter, QPixmap
+from PyQt5.QtCore import QDate, QModelIndex, QPoint, Qt
+from PyQt5.QtGui import QBrush, QColor, QIcon, QKeySequence, QPainter, QPixmap
 from PyQt5.QtWidgets import (QAction, QActionGroup, QApplication, QColorDialog,
         QComboBox, QDialog, QFontDialog, QGroupBox, QHBoxLayout, QLabel,
-        QLineEdit, QMainWindow, QMessageBox, QPushButton, QTableWidget,
-        QTableWidgetItem, QToolBar, QVBoxLayout)
+        QLineEdit, QMainWindow, QMessageBox, QPushButton, QTableView, QToolBar,
+        QVBoxLayout)
 from PyQt5.QtPrintSupport import QPrinter, QPrintPreviewDialog
 
 import spreadsheet_rc
 
 from spreadsheetdelegate import SpreadSheetDelegate
-from spreadsheetitem import SpreadSheetItem
+from spreadsheetmodel import SpreadSheetModel
 from printview import PrintView
 from util import decode_pos, encode_pos
 
@@ -72,26 +72,23 @@ class SpreadSheet(QMainWindow):
         self.cellLabel.setMinimumSize(80, 0)
         self.toolBar.addWidget(self.cellLabel)
         self.toolBar.addWidget(self.formulaInput)
-        self.table = QTableWidget(rows, cols, self)
-        for c in range(cols):
-            character = chr(ord('A') + c)
-            self.table.setHorizontalHeaderItem(c, QTableWidgetItem(character))
-
-        self.table.setItemPrototype(self.table.item(rows - 1, cols - 1))
+        self.model = SpreadSheetModel(rows, cols, self)
+        self.table = QTableView(self)
+        self.table.setModel(self.model)
         self.table.setItemDelegate(SpreadSheetDelegate(self))
         self.createActions()
-        self.updateColor(0)
+        self.updateColor(QModelIndex())
         self.setupMenuBar()
         self.setupContents()
         self.setupContextMenu()
         self.setCentralWidget(self.table)
         self.statusBar()
-        self.table.currentItemChanged.connect(self.updateStatus)
-        self.table.currentItemChanged.connect(self.updateColor)
-        self.table.currentItemChanged.connect(self.updateLineEdit)
-        self.table.itemChanged.connect(self.updateStatus)
+        self.table.selectionModel().currentChanged.connect(self.updateStatus)
+        self.table.selectionModel().currentChanged.connect(self.updateColor)
+        self.table.selectionModel().currentChanged.connect(self.updateLineEdit)
+        self.model.dataChanged.connect(self.updateStatus)
         self.formulaInput.returnPressed.connect(self.returnPressed)
-        self.table.itemChanged.connect(self.updateLineEdit)
+        self.model.dataChanged.connect(self.updateLineEdit)
         self.setWindowTitle("Spreadsheet")
 
     def createActions(self):
@@ -173,22 +170,26 @@ class SpreadSheet(QMainWindow):
         action = self.sender()
         oldFormat = self.currentDateFormat
         newFormat = self.currentDateFormat = action.text()
-        for row in range(self.table.rowCount()):
-            item = self.table.item(row, 1)
-            date = QDate.fromString(item.text(), oldFormat)
-            item.setText(date.toString(newFormat))
-
-    def updateStatus(self, item):
-        if item and item == self.table.currentItem():
-            self.statusBar().showMessage(item.data(Qt.StatusTipRole), 1000)
-            self.cellLabel.setText("Cell: (%s)" % encode_pos(self.table.row(item),
-                                                                     self.table.column(item)))
-
-    def updateColor(self, item):
+        for row in range(self.model.rowCount()):
+            text = self.model.formula(row, 1)
+            date = QDate.fromString(text, oldFormat)
+            if date.isValid():
+                self.model.setText(row, 1, date.toString(newFormat))
+
+    def updateStatus(self, index):
+        if index.isValid() and index == self.table.currentIndex():
+            self.statusBar().showMessage(
+                    self.model.data(index, Qt.StatusTipRole) or "", 1000)
+            self.cellLabel.setText("Cell: (%s)" % encode_pos(index.row(),
+                                                                     index.column()))
+
+    def updateColor(self, index):
         pixmap = QPixmap(16, 16)
         color = QColor()
-        if item:
-            color = item.backgroundColor()
+        if index.isValid():
+            background = self.model.data(index, Qt.BackgroundRole)
+            if background is not None:
+                color = QBrush(background).color()
         if not color.isValid():
             color = self.palette().base().color()
         painter = QPainter(pixmap)
@@ -203,55 +204,51 @@ class SpreadSheet(QMainWindow):
         painter.end()
         self.colorAction.setIcon(QIcon(pixmap))
 
-    def updateLineEdit(self, item):
-        if item != self.table.currentItem():
+    def updateLineEdit(self, index):
+        if index != self.table.currentIndex():
             return
-        if item:
-            self.formulaInput.setText(item.data(Qt.EditRole))
+        text = self.model.data(index, Qt.EditRole)
+        if text:
+            self.formulaInput.setText(text)
         else:
             self.formulaInput.clear()
 
     def returnPressed(self):
         text = self.formulaInput.text()
-        row = self.table.currentRow()
-        col = self.table.currentColumn()
-        item = self.table.item(row, col)
-        if not item:
-            self.table.setItem(row, col, SpreadSheetItem(text))
-        else:
-            item.setData(Qt.EditRole, text)
-        self.table.viewport().update()
+        index = self.table.currentIndex()
+        if index.isValid():
+            self.model.setData(index, text)
 
     def selectColor(self):
-        item = self.table.currentItem()
-        color = item and QColor(item.background()) or self.table.palette().base().color()
+        background = self.model.data(self.table.currentIndex(), Qt.BackgroundRole)
+        color = background is not None and QBrush(background).color() or self.table.palette().base().color()
         color = QColorDialog.getColor(color, self)
         if not color.isValid():
             return
-        selected = self.table.selectedItems()
+        selected = self.table.selectedIndexes()
         if not selected:
             return
         for i in selected:
-            i and i.setBackground(color)
-        self.updateColor(self.table.currentItem())
+            self.model.setData(i, color, Qt.BackgroundRole)
+        self.updateColor(self.table.currentIndex())
 
     def selectFont(self):
-        selected = self.table.selectedItems()
+        selected = self.table.selectedIndexes()
         if not selected:
             return
         font, ok = QFontDialog.getFont(self.font(), self)
         if not ok:
             return
         for i in selected:
-            i and i.setFont(font)
+            self.model.setData(i, font, Qt.FontRole)
 
     def runInputDialog(self, title, c1Text, c2Text, opText,
                        outText, cell1, cell2, outCell):
         rows = []
         cols = []
-        for r in range(self.table.rowCount()):
+        for r in range(self.model.rowCount()):
             rows.append(str(r + 1))
-        for c in range(self.table.columnCount()):
+        for c in range(self.model.columnCount()):
             cols.append(chr(ord('A') + c))
         addDialog = QDialog(self)
         addDialog.setWindowTitle(title)
@@ -343,19 +340,19 @@ class SpreadSheet(QMainWindow):
         col_first = 0
         col_last = 0
         col_cur = 0
-        selected = self.table.selectedItems()
+        selected = self.table.selectedIndexes()
         if selected:
             first = selected[0]
             last = selected[-1]
-            row_first = self.table.row(first)
-            row_last = self.table.row(last)
-            col_first = self.table.column(first)
-            col_last = self.table.column(last)
+            row_first = first.row()
+            row_last = last.row()
+            col_first = first.column()
+            col_last = last.column()
 
-        current = self.table.currentItem()
-        if current:
-            row_cur = self.table.row(current)
-            col_cur = self.table.column(current)
+        current = self.table.currentIndex()
+        if current.isValid():
+            row_cur = current.row()
+            col_cur = current.column()
 
         cell1 = encode_pos(row_first, col_first)
         cell2 = encode_pos(row_last, col_last)
@@ -365,20 +362,20 @@ class SpreadSheet(QMainWindow):
                 cell1, cell2, out)
         if ok:
             row, col = decode_pos(out)
-            self.table.item(row, col).setText("sum %s %s" % (cell1, cell2))
+            self.model.setText(row, col, "sum %s %s" % (cell1, cell2))
 
     def actionMath_helper(self, title, op):
         cell1 = "C1"
         cell2 = "C2"
         out = "C3"
-        current = self.table.currentItem()
-        if current:
-            out = encode_pos(self.table.currentRow(), self.table.currentColumn())
+        current = self.table.currentIndex()
+        if current.isValid():
+            out = encode_pos(current.row(), current.column())
         ok, cell1, cell2, out = self.runInputDialog(title, "Cell 1", "Cell 2",
                 op, "Output to:", cell1, cell2, out)
         if ok:
             row, col = decode_pos(out)
-            self.table.item(row, col).setText("%s %s %s" % (op, cell1, cell2))
+            self.model.setText(row, col, "%s %s %s" % (op, cell1, cell2))
 
     def actionAdd(self):
         self.actionMath_helper("Addition", "+")
@@ -393,8 +390,8 @@ class SpreadSheet(QMainWindow):
         self.actionMath_helper("Division", "/")
 
     def clear(self):
-        for i in self.table.selectedItems():
-            i.setText("")
+        for i in self.table.selectedIndexes():
+            self.model.setData(i, "")
 
     def setupContextMenu(self):
         self.addAction(self.cell_addAction)
@@ -414,103 +411,99 @@ class SpreadSheet(QMainWindow):
         titleFont = self.table.font()
         titleFont.setBold(True)
         # column 0
-        self.table.setItem(0, 0, SpreadSheetItem("Item"))
-        self.table.item(0, 0).setBackground(titleBackground)
-        self.table.item(0, 0).setToolTip("This column shows the purchased item/service")
-        self.table.item(0, 0).setFont(titleFont)
-        self.table.setItem(1, 0, SpreadSheetItem("AirportBus"))
-        self.table.setItem(2, 0, SpreadSheetItem("Flight (Munich)"))
-        self.table.setItem(3, 0, SpreadSheetItem("Lunch"))
-        self.table.setItem(4, 0, SpreadSheetItem("Flight (LA)"))
-        self.table.setItem(5, 0, SpreadSheetItem("Taxi"))
-        self.table.setItem(6, 0, SpreadSheetItem("Dinner"))
-        self.table.setItem(7, 0, SpreadSheetItem("Hotel"))
-        self.table.setItem(8, 0, SpreadSheetItem("Flight (Oslo)"))
-        self.table.setItem(9, 0, SpreadSheetItem("Total:"))
-        self.table.item(9, 0).setFont(titleFont)
-        self.table.item(9, 0).setBackground(Qt.lightGray)
+        self.model.setText(0, 0, "Item")
+        self.model.setData(self.model.index(0, 0), titleBackground, Qt.BackgroundRole)
+        self.model.setData(self.model.index(0, 0), "This column shows the purchased item/service", Qt.ToolTipRole)
+        self.model.setData(self.model.index(0, 0), titleFont, Qt.FontRole)
+        self.model.setText(1, 0, "AirportBus")
+        self.model.setText(2, 0, "Flight (Munich)")
+        self.model.setText(3, 0, "Lunch")
+        self.model.setText(4, 0, "Flight (LA)")
+        self.model.setText(5, 0, "Taxi")
+        self.model.setText(6, 0, "Dinner")
+        self.model.setText(7, 0, "Hotel")
+        self.model.setText(8, 0, "Flight (Oslo)")
+        self.model.setText(9, 0, "Total:")
+        self.model.setData(self.model.index(9, 0), titleFont, Qt.FontRole)
+        self.model.setData(self.model.index(9, 0), QColor(Qt.lightGray), Qt.BackgroundRole)
         # column 1
-        self.table.setItem(0, 1, SpreadSheetItem("Date"))
-        self.table.item(0, 1).setBackground(titleBackground)
-        self.table.item(0, 1).setToolTip("This column shows the purchase date, double click to change")
-        self.table.item(0, 1).setFont(titleFont)
-        self.table.setItem(1, 1, SpreadSheetItem("15/6/2006"))
-        self.table.setItem(2, 1, SpreadSheetItem("15/6/2006"))
-        self.table.setItem(3, 1, SpreadSheetItem("15/6/2006"))
-        self.table.setItem(4, 1, SpreadSheetItem("21/5/2006"))
-        self.table.setItem(5, 1, SpreadSheetItem("16/6/2006"))
-        self.table.setItem(6, 1, SpreadSheetItem("16/6/2006"))
-        self.table.setItem(7, 1, SpreadSheetItem("16/6/2006"))
-        self.table.setItem(8, 1, SpreadSheetItem("18/6/2006"))
-        self.table.setItem(9, 1, SpreadSheetItem())
-        self.table.item(9, 1).setBackground(Qt.lightGray)
+        self.model.setText(0, 1, "Date")
+        self.model.setData(self.model.index(0, 1), titleBackground, Qt.BackgroundRole)
+        self.model.setData(self.model.index(0, 1), "This column shows the purchase date, double click to change", Qt.ToolTipRole)
+        self.model.setData(self.model.index(0, 1), titleFont, Qt.FontRole)
+        self.model.setText(1, 1, "15/6/2006")
+        self.model.setText(2, 1, "15/6/2006")
+        self.model.setText(3, 1, "15/6/2006")
+        self.model.setText(4, 1, "21/5/2006")
+        self.model.setText(5, 1, "16/6/2006")
+        self.model.setText(6, 1, "16/6/2006")
+        self.model.setText(7, 1, "16/6/2006")
+        self.model.setText(8, 1, "18/6/2006")
+        self.model.setData(self.model.index(9, 1), QColor(Qt.lightGray), Qt.BackgroundRole)
         # column 2
-        self.table.setItem(0, 2, SpreadSheetItem("Price"))
-        self.table.item(0, 2).setBackground(titleBackground)
-        self.table.item(0, 2).setToolTip("This column shows the price of the purchase")
-        self.table.item(0, 2).setFont(titleFont)
-        self.table.setItem(1, 2, SpreadSheetItem("150"))
-        self.table.setItem(2, 2, SpreadSheetItem("2350"))
-        self.table.setItem(3, 2, SpreadSheetItem("-14"))
-        self.table.setItem(4, 2, SpreadSheetItem("980"))
-        self.table.setItem(5, 2, SpreadSheetItem("5"))
-        self.table.setItem(6, 2, SpreadSheetItem("120"))
-        self.table.setItem(7, 2, SpreadSheetItem("300"))
-        self.table.setItem(8, 2, SpreadSheetItem("1240"))
-        self.table.setItem(9, 2, SpreadSheetItem())
-        self.table.item(9, 2).setBackground(Qt.lightGray)
+        self.model.setText(0, 2, "Price")
+        self.model.setData(self.model.index(0, 2), titleBackground, Qt.BackgroundRole)
+        self.model.setData(self.model.index(0, 2), "This column shows the price of the purchase", Qt.ToolTipRole)
+        self.model.setData(self.model.index(0, 2), titleFont, Qt.FontRole)
+        self.model.setText(1, 2, "150")
+        self.model.setText(2, 2, "2350")
+        self.model.setText(3, 2, "-14")
+        self.model.setText(4, 2, "980")
+        self.model.setText(5, 2, "5")
+        self.model.setText(6, 2, "120")
+        self.model.setText(7, 2, "300")
+        self.model.setText(8, 2, "1240")
+        self.model.setData(self.model.index(9, 2), QColor(Qt.lightGray), Qt.BackgroundRole)
         # column 3
-        self.table.setItem(0, 3, SpreadSheetItem("Currency"))
-        self.table.item(0, 3).setBackgroundColor(titleBackground)
-        self.table.item(0, 3).setToolTip("This column shows the currency")
-        self.table.item(0, 3).setFont(titleFont)
-        self.table.setItem(1, 3, SpreadSheetItem("NOK"))
-        self.table.setItem(2, 3, SpreadSheetItem("NOK"))
-        self.table.setItem(3, 3, SpreadSheetItem("EUR"))
-        self.table.setItem(4, 3, SpreadSheetItem("EUR"))
-        self.table.setItem(5, 3, SpreadSheetItem("USD"))
-        self.table.setItem(6, 3, SpreadSheetItem("USD"))
-        self.table.setItem(7, 3, SpreadSheetItem("USD"))
-        self.table.setItem(8, 3, SpreadSheetItem("USD"))
-        self.table.setItem(9, 3, SpreadSheetItem())
-        self.table.item(9,3).setBackground(Qt.lightGray)
+        self.model.setText(0, 3, "Currency")
+        self.model.setData(self.model.index(0, 3), titleBackground, Qt.BackgroundRole)
+        self.model.setData(self.model.index(0, 3), "This column shows the currency", Qt.ToolTipRole)
+        self.model.setData(self.model.index(0, 3), titleFont, Qt.FontRole)
+        self.model.setText(1, 3, "NOK")
+        self.model.setText(2, 3, "NOK")
+        self.model.setText(3, 3, "EUR")
+        self.model.setText(4, 3, "EUR")
+        self.model.setText(5, 3, "USD")
+        self.model.setText(6, 3, "USD")
+        self.model.setText(7, 3, "USD")
+        self.model.setText(8, 3, "USD")
+        self.model.setData(self.model.index(9, 3), QColor(Qt.lightGray), Qt.BackgroundRole)
         # column 4
-        self.table.setItem(0, 4, SpreadSheetItem("Ex. Rate"))
-        self.table.item(0, 4).setBackground(titleBackground)
-        self.table.item(0, 4).setToolTip("This column shows the exchange rate to NOK")
-        self.table.item(0, 4).setFont(titleFont)
-        self.table.setItem(1, 4, SpreadSheetItem("1"))
-        self.table.setItem(2, 4, SpreadSheetItem("1"))
-        self.table.setItem(3, 4, SpreadSheetItem("8"))
-        self.table.setItem(4, 4, SpreadSheetItem("8"))
-        self.table.setItem(5, 4, SpreadSheetItem("7"))
-        self.table.setItem(6, 4, SpreadSheetItem("7"))
-        self.table.setItem(7, 4, SpreadSheetItem("7"))
-        self.table.setItem(8, 4, SpreadSheetItem("7"))
-        self.table.setItem(9, 4, SpreadSheetItem())
-        self.table.item(9,4).setBackground(Qt.lightGray)
+        self.model.setText(0, 4, "Ex. Rate")
+        self.model.setData(self.model.index(0, 4), titleBackground, Qt.BackgroundRole)
+        self.model.setData(self.model.index(0, 4), "This column shows the exchange rate to NOK", Qt.ToolTipRole)
+        self.model.setData(self.model.index(0, 4), titleFont, Qt.FontRole)
+        self.model.setText(1, 4, "1")
+        self.model.setText(2, 4, "1")
+        self.model.setText(3, 4, "8")
+        self.model.setText(4, 4, "8")
+        self.model.setText(5, 4, "7")
+        self.model.setText(6, 4, "7")
+        self.model.setText(7, 4, "7")
+        self.model.setText(8, 4, "7")
+        self.model.setData(self.model.index(9, 4), QColor(Qt.lightGray), Qt.BackgroundRole)
         # column 5
-        self.table.setItem(0, 5, SpreadSheetItem("NOK"))
-        self.table.item(0, 5).setBackground(titleBackground)
-        self.table.item(0, 5).setToolTip("This column shows the expenses in NOK")
-        self.table.item(0, 5).setFont(titleFont)
-        self.table.setItem(1, 5, SpreadSheetItem("* C2 E2"))
-        self.table.setItem(2, 5, SpreadSheetItem("* C3 E3"))
-        self.table.setItem(3, 5, SpreadSheetItem("* C4 E4"))
-        self.table.setItem(4, 5, SpreadSheetItem("* C5 E5"))
-        self.table.setItem(5, 5, SpreadSheetItem("* C6 E6"))
-        self.table.setItem(6, 5, SpreadSheetItem("* C7 E7"))
-        self.table.setItem(7, 5, SpreadSheetItem("* C8 E8"))
-        self.table.setItem(8, 5, SpreadSheetItem("* C9 E9"))
-        self.table.setItem(9, 5, SpreadSheetItem("sum F2 F9"))
-        self.table.item(9,5).setBackground(Qt.lightGray)
+        self.model.setText(0, 5, "NOK")
+        self.model.setData(self.model.index(0, 5), titleBackground, Qt.BackgroundRole)
+        self.model.setData(self.model.index(0, 5), "This column shows the expenses in NOK", Qt.ToolTipRole)
+        self.model.setData(self.model.index(0, 5), titleFont, Qt.FontRole)
+        self.model.setText(1, 5, "* C2 E2")
+        self.model.setText(2, 5, "* C3 E3")
+        self.model.setText(3, 5, "* C4 E4")
+        self.model.setText(4, 5, "* C5 E5")
+        self.model.setText(5, 5, "* C6 E6")
+        self.model.setText(6, 5, "* C7 E7")
+        self.model.setText(7, 5, "* C8 E8")
+        self.model.setText(8, 5, "* C9 E9")
+        self.model.setText(9, 5, "sum F2 F9")
+        self.model.setData(self.model.index(9, 5), QColor(Qt.lightGray), Qt.BackgroundRole)
 
     def showAbout(self):
         QMessageBox.about(self, "About Spreadsheet", """
             <HTML>
-            <p><b>This demo shows use of <c>QTableWidget</c> with custom handling for
-             individual cells.</b></p>
-            <p>Using a customized table item we make it possible to have dynamic
+            <p><b>This demo shows use of <c>QTableView</c> with a custom model
+             for a spreadsheet.</b></p>
+            <p>Using a customized table model we make it possible to have dynamic
              output in different cells. The content that is implemented for this
              particular demo is:
             <ul>
@@ -526,7 +519,7 @@ class SpreadSheet(QMainWindow):
         printer = QPrinter(QPrinter.ScreenResolution)
         dlg = QPrintPreviewDialog(printer)
         view = PrintView()
-        view.setModel(self.table.model())
+        view.setModel(self.model)
         dlg.paintRequested.connect(view.print_)
         dlg.exec_()
 
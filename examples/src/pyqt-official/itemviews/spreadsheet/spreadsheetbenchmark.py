@@ -0,0 +1,177 @@
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited
+## Copyright (C) 2012 Hans-Peter Jansen <hpj@urpla.net>.
+## Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+## All rights reserved.
+## Contact: Nokia Corporation (qt-info@nokia.com)
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:LGPL$
+## GNU Lesser General Public License Usage
+## This file may be used under the terms of the GNU Lesser General Public
+## License version 2.1 as published by the Free Software Foundation and
+## appearing in the file LICENSE.LGPL included in the packaging of this
+## file. Please review the following information to ensure the GNU Lesser
+## General Public License version 2.1 requirements will be met:
+## http:#www.gnu.org/licenses/old-licenses/lgpl-2.1.html.
+##
+## In addition, as a special exception, Nokia gives you certain additional
+## rights. These rights are described in the Nokia Qt LGPL Exception
+## version 1.1, included in the file LGPL_EXCEPTION.txt in this package.
+##
+## GNU General Public License Usage
+## Alternatively, this file may be used under the terms of the GNU General
+## Public License version 3.0 as published by the Free Software Foundation
+## and appearing in the file LICENSE.GPL included in the packaging of this
+## file. Please review the following information to ensure the GNU General
+## Public License version 3.0 requirements will be met:
+## http:#www.gnu.org/copyleft/gpl.html.
+##
+## Other Usage
+## Alternatively, this file may be used in accordance with the terms and
+## conditions contained in a signed written agreement between you and Nokia.
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+"""Compare loading a large CSV file into the model-backed spreadsheet with
+loading it into a QTableWidget of SpreadSheetItems, as the example used to.
+
+Each sheet is loaded in a separate process, and the memory used is the
+growth in the peak resident size of that process.
+"""
+
+
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser,
+        QCoreApplication)
+from PyQt5.QtWidgets import QApplication, QTableWidget
+
+from spreadsheetitem import SpreadSheetItem
+from spreadsheetmodel import SpreadSheetModel
+from util import encode_pos
+
+
+def peakMemory():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def writeCsv(fileName, rows, columns, empty):
+    rand = random.Random(0)
+
+    with open(fileName, 'w', newline='') as f:
+        writer = csv.writer(f)
+        for row in range(rows):
+            fields = ["Item %d" % row]
+            for column in range(1, columns - 1):
+                if rand.random() < empty:
+                    fields.append('')
+                else:
+                    fields.append(str(rand.randint(-1000, 100000)))
+            fields.append("+ %s %s" % (encode_pos(row, 1), encode_pos(row, 2)))
+            writer.writerow(fields)
+
+
+def loadModel(fileName):
+    model = SpreadSheetModel(0, 0)
+    model.loadCsv(fileName)
+
+    # a formula near the end so that the engine has some work to do
+    model.data(model.index(model.rowCount() - 1, model.columnCount() - 1))
+
+    return model
+
+
+def loadItems(fileName):
+    with open(fileName, newline='') as f:
+        lines = list(csv.reader(f))
+
+    table = QTableWidget(len(lines), max(len(fields) for fields in lines))
+    for row, fields in enumerate(lines):
+        for column, text in enumerate(fields):
+            if text:
+                table.setItem(row, column, SpreadSheetItem(text))
+
+    table.item(len(lines) - 1, len(lines[-1]) - 1).text()
+
+    return table
+
+
+def measure(load, fileName, results):
+    app = QApplication(sys.argv)
+
+    before = peakMemory()
+    start = time.perf_counter()
+    sheet = load(fileName)
+    elapsed = time.perf_counter() - start
+
+    results.put((elapsed, peakMemory() - before))
+
+
+def run(context, load, fileName):
+    results = context.Queue()
+    process = context.Process(target=measure, args=(load, fileName, results))
+    process.start()
+    result = results.get()
+    process.join()
+
+    return result
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Compare the load time and memory use of the spreadsheet "
+            "storage.")
+    parser.addHelpOption()
+    sizesOption = QCommandLineOption(['s', 'sizes'],
+            "Load sheets of the comma separated <sizes>, each given as "
+            "rows x columns.", 'sizes', '1000x26,10000x26,40000x26')
+    parser.addOption(sizesOption)
+    emptyOption = QCommandLineOption(['e', 'empty'],
+            "Leave <fraction> of the numeric cells empty.", 'fraction', '0.5')
+    parser.addOption(emptyOption)
+    parser.process(app)
+
+    empty = float(parser.value(emptyOption))
+    context = multiprocessing.get_context('spawn')
+
+    print("%-14s %10s %12s %12s %12s %12s" % ("sheet", "cells",
+            "model load", "model mem", "items load", "items mem"))
+
+    for size in parser.value(sizesOption).split(','):
+        rows, columns = (int(v) for v in size.split('x'))
+
+        fd, fileName = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+
+        try:
+            writeCsv(fileName, rows, columns, empty)
+
+            modelTime, modelMemory = run(context, loadModel, fileName)
+            itemsTime, itemsMemory = run(context, loadItems, fileName)
+        finally:
+            os.remove(fileName)
+
+        cells = rows * 2 + int(rows * (columns - 2) * (1.0 - empty))
+
+        print("%-14s %10d %10.2fs %10.1fMB %10.2fs %10.1fMB" % (size, cells,
+                modelTime, modelMemory / 1048576.0, itemsTime,
+                itemsMemory / 1048576.0))
@@ -55,11 +55,16 @@ class SpreadSheetDelegate(QItemDelegate):
 
         editor = QLineEdit(parent)
         # create a completer with the strings in the column as model
-        allStrings = []
-        for i in range(1, index.model().rowCount()):
-            strItem = index.model().data(index.sibling(i, index.column()), Qt.EditRole)
-            if strItem not in allStrings:
-                allStrings.append(strItem)
+        model = index.model()
+        if hasattr(model, 'columnTexts'):
+            # the model knows which cells are populated
+            allStrings = model.columnTexts(index.column())
+        else:
+            allStrings = []
+            for i in range(1, model.rowCount()):
+                strItem = model.data(index.sibling(i, index.column()), Qt.EditRole)
+                if strItem not in allStrings:
+                    allStrings.append(strItem)
 
         autoComplete = QCompleter(allStrings)
         editor.setCompleter(autoComplete)
@@ -0,0 +1,549 @@
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited
+## Copyright (C) 2012 Hans-Peter Jansen <hpj@urpla.net>.
+## Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+## All rights reserved.
+## Contact: Nokia Corporation (qt-info@nokia.com)
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:LGPL$
+## GNU Lesser General Public License Usage
+## This file may be used under the terms of the GNU Lesser General Public
+## License version 2.1 as published by the Free Software Foundation and
+## appearing in the file LICENSE.LGPL included in the packaging of this
+## file. Please review the following information to ensure the GNU Lesser
+## General Public License version 2.1 requirements will be met:
+## http:#www.gnu.org/licenses/old-licenses/lgpl-2.1.html.
+##
+## In addition, as a special exception, Nokia gives you certain additional
+## rights. These rights are described in the Nokia Qt LGPL Exception
+## version 1.1, included in the file LGPL_EXCEPTION.txt in this package.
+##
+## GNU General Public License Usage
+## Alternatively, this file may be used under the terms of the GNU General
+## Public License version 3.0 as published by the Free Software Foundation
+## and appearing in the file LICENSE.GPL included in the packaging of this
+## file. Please review the following information to ensure the GNU General
+## Public License version 3.0 requirements will be met:
+## http:#www.gnu.org/copyleft/gpl.html.
+##
+## Other Usage
+## Alternatively, this file may be used in accordance with the terms and
+## conditions contained in a signed written agreement between you and Nokia.
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+from PyQt5.QtCore import Qt
+
+from util import decode_pos
+
+
+# the value of a cell that refers to itself, directly or indirectly
+CYCLE = "cycle"
+
+
+def combine(statistics, number):
+    """Add a number to a (sum, count, minimum, maximum) tuple."""
+
+    total, count, low, high = statistics
+    if count == 0:
+        return number, 1, number, number
+
+    return total + number, count + 1, min(low, number), max(high, number)
+
+
+def merge(first, second):
+    """Return the combination of two (sum, count, minimum, maximum) tuples."""
+
+    if first[1] == 0:
+        return second
+    if second[1] == 0:
+        return first
+
+    return (first[0] + second[0], first[1] + second[1],
+            min(first[2], second[2]), max(first[3], second[3]))
+
+
+def toInt(value):
+    """Return a cell value as an integer, or None if it is not one."""
+
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def rowBlocks(top, bottom):
+    """Yield the (level, block) of each of the aligned blocks of
+    2 ** level rows that together cover the rows from top to bottom
+    inclusive.  There are at most two blocks at each level.
+    """
+
+    level = 0
+    first = top
+    last = bottom + 1
+    while first < last:
+        if first & 1:
+            yield level, first
+            first += 1
+        if last & 1:
+            last -= 1
+            yield level, last
+        first >>= 1
+        last >>= 1
+        level += 1
+
+
+class Formula(object):
+    """The compiled form of the contents of a cell.  Anything that is not
+    one of the supported operators followed by its cell references is a
+    constant.
+    """
+
+    # the operators that take a range of cells
+    RangeOperators = ("sum", "count", "min", "max", "average")
+
+    Operators = RangeOperators + ("+", "-", "*", "/", "=")
+
+    def __init__(self, cell, text):
+        self.text = text
+        self.op = None
+        self.first = None
+        self.second = None
+        self.range = None
+
+        if text is None:
+            return
+
+        if not self.isFormula(text):
+            return
+
+        slist = text.split(' ')
+        op = slist[0].lower()
+
+        self.op = op
+        self.first = decode_pos(slist[1]) if len(slist) > 1 else (-1, -1)
+        self.second = decode_pos(slist[2]) if len(slist) > 2 else (-1, -1)
+
+        if op in self.RangeOperators:
+            # (top, left, bottom, right)
+            self.range = (self.first[0], self.first[1], self.second[0],
+                    self.second[1])
+
+    @classmethod
+    def isFormula(cls, text):
+        return text.split(' ', 1)[0].lower() in cls.Operators
+
+    def cellPrecedents(self):
+        """Return the individual cells the formula refers to."""
+
+        if self.op is None or self.range is not None:
+            return ()
+        if self.op == "=":
+            return (self.first, )
+
+        return (self.first, self.second)
+
+    def precedents(self, cell):
+        """Return every cell the value of the formula depends on."""
+
+        if self.range is None:
+            return self.cellPrecedents()
+
+        top, left, bottom, right = self.range
+
+        return [(r, c) for r in range(top, bottom + 1)
+                for c in range(left, right + 1) if (r, c) != cell]
+
+    def statistics(self, cell, valueOf):
+        """Return the (sum, count, minimum, maximum) of the integers in the
+        range by looking at every cell in it.
+        """
+
+        statistics = (0, 0, None, None)
+        for precedent in self.precedents(cell):
+            number = toInt(valueOf(precedent))
+            if number is not None:
+                statistics = combine(statistics, number)
+
+        return statistics
+
+    def evaluate(self, cell, valueOf, statistics=None):
+        """Return the value of the formula.  valueOf(cell) returns the value
+        of a cell.  If statistics is given then statistics(formula, cell)
+        returns the (sum, count, minimum, maximum) of the range.
+        """
+
+        if self.op is None:
+            return self.text
+
+        if self.range is not None:
+            if statistics is None:
+                total, count, low, high = self.statistics(cell, valueOf)
+            else:
+                total, count, low, high = statistics(self, cell)
+
+            if self.op == "sum":
+                return total
+            if self.op == "count":
+                return count
+            if self.op == "average":
+                if count == 0:
+                    return "nan"
+                return total / count
+            if count == 0:
+                return 0
+            return low if self.op == "min" else high
+
+        if self.op == "=":
+            return valueOf(self.first)
+
+        firstVal = toInt(valueOf(self.first)) or 0
+        secondVal = toInt(valueOf(self.second)) or 0
+
+        if self.op == "+":
+            return firstVal + secondVal
+        if self.op == "-":
+            return firstVal - secondVal
+        if self.op == "*":
+            return firstVal * secondVal
+        if secondVal == 0:
+            return "nan"
+        return firstVal / secondVal
+
+
+class FormulaEngine(object):
+    """Computes the values of the cells of a table model.
+
+    The engine reads the contents of the cells from the model's EditRole,
+    or from the model's formula(row, column) method if it has one.  If the
+    model also has aggregate(top, left, bottom, right), returning the
+    (sum, count, minimum, maximum) of the integer constants in a range, and
+    formulaCells(top, left, bottom, right), returning the formula cells in
+    a range, then ranges are never looked at cell by cell.  The
+    formula of each cell is compiled once and its value is cached.  The
+    engine keeps track of which cells refer to which, so when a cell is
+    changed only the cells that depend on it are recomputed, and each of
+    those only after the cells it depends on.  A set of cells that refer to
+    each other has the value CYCLE.  Cells that have never been asked for
+    are computed on demand.  The values of constant cells are not cached.
+    """
+
+    def __init__(self, model):
+        self._model = model
+        self._source = getattr(model, 'formula', None)
+        self._aggregate = getattr(model, 'aggregate', None)
+        self._formulaCells = getattr(model, 'formulaCells', None)
+        if self._aggregate is None or self._formulaCells is None:
+            self._aggregate = self._formulaCells = None
+        self._notifying = False
+        self._formulas = {}
+        self._values = {}
+        # the cells that refer to a cell, and to a range of cells
+        self._dependents = {}
+        self._rangeDependents = {}
+        # the ranges in each column, by the blocks of rows covering them
+        self._rangeBlocks = {}
+        self._rangeLevels = 0
+
+        model.dataChanged.connect(self._dataChanged)
+        model.modelReset.connect(self.clear)
+        model.layoutChanged.connect(self.clear)
+        model.rowsInserted.connect(self.clear)
+        model.rowsRemoved.connect(self.clear)
+        model.columnsInserted.connect(self.clear)
+        model.columnsRemoved.connect(self.clear)
+
+    @classmethod
+    def forWidget(cls, widget):
+        engine = getattr(widget, 'formulaEngine', None)
+        if engine is None:
+            engine = widget.formulaEngine = cls(widget.model())
+
+        return engine
+
+    def clear(self):
+        self._formulas = {}
+        self._values = {}
+        self._dependents = {}
+        self._rangeDependents = {}
+        self._rangeBlocks = {}
+        self._rangeLevels = 0
+
+    def value(self, row, column):
+        cell = (row, column)
+
+        try:
+            return self._values[cell]
+        except KeyError:
+            pass
+
+        if self._formula(cell) is None:
+            return self._text(cell)
+
+        self._evaluate([cell])
+
+        return self._values[cell]
+
+    def _precedents(self, formula, cell):
+        if formula.range is not None and self._formulaCells is not None:
+            # constants are not cached so only formulas need to be ordered
+            return [precedent
+                    for precedent in self._formulaCells(*formula.range)
+                    if precedent != cell]
+
+        return formula.precedents(cell)
+
+    def _statistics(self, formula, cell):
+        statistics = self._aggregate(*formula.range)
+
+        for precedent in self._precedents(formula, cell):
+            number = toInt(self._valueOf(precedent))
+            if number is not None:
+                statistics = combine(statistics, number)
+
+        return statistics
+
+    def _valueOf(self, cell):
+        try:
+            return self._values[cell]
+        except KeyError:
+            return self._text(cell)
+
+    def _formula(self, cell):
+        """Return the compiled formula of a cell, or None if the cell is a
+        constant.
+        """
+
+        formula = self._formulas.get(cell)
+        if formula is None:
+            formula = Formula(cell, self._text(cell))
+            if formula.op is None:
+                return None
+
+            self._formulas[cell] = formula
+
+            for precedent in formula.cellPrecedents():
+                self._dependents.setdefault(precedent, set()).add(cell)
+            if formula.range is not None:
+                dependents = self._rangeDependents.get(formula.range)
+                if dependents is None:
+                    dependents = self._rangeDependents[formula.range] = set()
+                    self._indexRange(formula.range, True)
+                dependents.add(cell)
+
+        return formula
+
+    def _forget(self, cell):
+        formula = self._formulas.pop(cell, None)
+        if formula is None:
+            return
+
+        for precedent in formula.cellPrecedents():
+            dependents = self._dependents.get(precedent)
+            if dependents is not None:
+                dependents.discard(cell)
+                if not dependents:
+                    del self._dependents[precedent]
+
+        if formula.range is not None:
+            dependents = self._rangeDependents[formula.range]
+            dependents.discard(cell)
+            if not dependents:
+                del self._rangeDependents[formula.range]
+                self._indexRange(formula.range, False)
+
+    def _indexRange(self, area, add):
+        """Add a range to, or remove it from, the blocks of rows of each of
+        its columns, so that the ranges containing a cell can be found
+        without looking at every range.
+        """
+
+        top, left, bottom, right = area
+        top = max(top, 0)
+        self._rangeLevels = max(self._rangeLevels, (bottom + 1).bit_length())
+
+        for column in range(max(left, 0), right + 1):
+            blocks = self._rangeBlocks.setdefault(column, {})
+            for block in rowBlocks(top, bottom):
+                if add:
+                    blocks.setdefault(block, set()).add(area)
+                else:
+                    areas = blocks[block]
+                    areas.discard(area)
+                    if not areas:
+                        del blocks[block]
+
+    def _rangesContaining(self, cell):
+        row, column = cell
+        blocks = self._rangeBlocks.get(column)
+        if not blocks:
+            return
+
+        for level in range(self._rangeLevels + 1):
+            areas = blocks.get((level, row >> level))
+            if areas:
+                yield from areas
+
+    def _text(self, cell):
+        row, column = cell
+        if row < 0 or column < 0:
+            return None
+
+        if self._source is not None:
+            return self._source(row, column)
+
+        return self._model.data(self._model.index(row, column), Qt.EditRole)
+
+    def _evaluate(self, cells):
+        """Compute the values of the given cells and of any uncached cells
+        they depend on.  This is Tarjan's algorithm for strongly connected
+        components, which finds each component only after all of the
+        components it depends on, so the cells can be computed as they are
+        found.
+        """
+
+        values = self._values
+        index = {}
+        lowLink = {}
+        stack = []
+        onStack = set()
+
+        for root in cells:
+            if root in index or root in values:
+                continue
+
+            formula = self._formula(root)
+            if formula is None:
+                continue
+
+            index[root] = lowLink[root] = len(index)
+            stack.append(root)
+            onStack.add(root)
+            work = [(root, iter(self._precedents(formula, root)))]
+
+            while work:
+                cell, precedents = work[-1]
+
+                for precedent in precedents:
+                    if precedent in values:
+                        continue
+
+                    if precedent not in index:
+                        formula = self._formula(precedent)
+                        if formula is None:
+                            continue
+
+                        index[precedent] = lowLink[precedent] = len(index)
+                        stack.append(precedent)
+                        onStack.add(precedent)
+                        work.append((precedent,
+                                iter(self._precedents(formula, precedent))))
+                        break
+
+                    if precedent in onStack:
+                        lowLink[cell] = min(lowLink[cell], index[precedent])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowLink[parent] = min(lowLink[parent], lowLink[cell])
+
+                    if lowLink[cell] == index[cell]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            onStack.discard(member)
+                            component.append(member)
+                            if member == cell:
+                                break
+
+                        self._resolve(component)
+
+    def _resolve(self, component):
+        if len(component) > 1:
+            for cell in component:
+                self._values[cell] = CYCLE
+            return
+
+        cell = component[0]
+        formula = self._formulas[cell]
+        if cell in formula.cellPrecedents():
+            self._values[cell] = CYCLE
+        else:
+            self._values[cell] = formula.evaluate(cell, self._valueOf,
+                    self._statistics if self._aggregate is not None else None)
+
+    def _downstream(self, cells):
+        """Return the given cells and every computed cell that depends on
+        them.
+        """
+
+        found = set(cells)
+        queue = list(cells)
+
+        while queue:
+            cell = queue.pop()
+
+            dependents = list(self._dependents.get(cell, ()))
+            for area in self._rangesContaining(cell):
+                dependents.extend(self._rangeDependents[area])
+
+            for dependent in dependents:
+                if dependent not in found:
+                    found.add(dependent)
+                    queue.append(dependent)
+
+        return found
+
+    def _dataChanged(self, topLeft, bottomRight, roles=()):
+        if self._notifying:
+            return
+
+        if roles and Qt.EditRole not in roles and Qt.DisplayRole not in roles:
+            return
+
+        # a formula may have been edited or a constant, which isn't cached,
+        # may have changed
+        changed = []
+        for row in range(topLeft.row(), bottomRight.row() + 1):
+            for column in range(topLeft.column(), bottomRight.column() + 1):
+                cell = (row, column)
+                formula = self._formulas.get(cell)
+                if formula is None or formula.text != self._text(cell):
+                    changed.append(cell)
+
+        if not changed:
+            return
+
+        dirty = self._downstream(changed)
+        for cell in changed:
+            self._forget(cell)
+        for cell in dirty:
+            self._values.pop(cell, None)
+
+        self._evaluate(dirty)
+
+        # tell the views about the cells that changed as a consequence
+        changed = set(changed)
+        dependents = [cell for cell in dirty
+                if cell not in changed and cell in self._values]
+        if dependents:
+            rows = [row for row, _ in dependents]
+            columns = [column for _, column in dependents]
+
+            self._notifying = True
+            try:
+                self._model.dataChanged.emit(
+                        self._model.index(min(rows), min(columns)),
+                        self._model.index(max(rows), max(columns)))
+            finally:
+                self._notifying = False
@@ -0,0 +1,545 @@
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited
+## Copyright (C) 2012 Hans-Peter Jansen <hpj@urpla.net>.
+## Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+## All rights reserved.
+## Contact: Nokia Corporation (qt-info@nokia.com)
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:LGPL$
+## GNU Lesser General Public License Usage
+## This file may be used under the terms of the GNU Lesser General Public
+## License version 2.1 as published by the Free Software Foundation and
+## appearing in the file LICENSE.LGPL included in the packaging of this
+## file. Please review the following information to ensure the GNU Lesser
+## General Public License version 2.1 requirements will be met:
+## http:#www.gnu.org/licenses/old-licenses/lgpl-2.1.html.
+##
+## In addition, as a special exception, Nokia gives you certain additional
+## rights. These rights are described in the Nokia Qt LGPL Exception
+## version 1.1, included in the file LGPL_EXCEPTION.txt in this package.
+##
+## GNU General Public License Usage
+## Alternatively, this file may be used under the terms of the GNU General
+## Public License version 3.0 as published by the Free Software Foundation
+## and appearing in the file LICENSE.GPL included in the packaging of this
+## file. Please review the following information to ensure the GNU General
+## Public License version 3.0 requirements will be met:
+## http:#www.gnu.org/copyleft/gpl.html.
+##
+## Other Usage
+## Alternatively, this file may be used in accordance with the terms and
+## conditions contained in a signed written agreement between you and Nokia.
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+import bisect
+import csv
+import itertools
+from array import array
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor
+
+from spreadsheetformula import Formula, FormulaEngine, merge, toInt
+
+
+class ColumnIndex(object):
+    """Range statistics of the integers in a typed array, or of arbitrary
+    integers in a list.  Sums and counts are held in Fenwick trees and
+    minimums and maximums in segment trees, so that both queries and updates
+    take logarithmic time.  There is room for at least one more row than
+    there were numbers when it was built.
+    """
+
+    Largest = (1 << 63) - 1
+    Smallest = -(1 << 63)
+
+    def __init__(self, numbers, missing=None):
+        # a power of two so that each level of the segment trees can be
+        # built at once
+        size = 16
+        while size <= len(numbers):
+            size *= 2
+        self.size = size
+
+        if isinstance(numbers, array):
+            self.largest = self.Largest
+            self.smallest = self.Smallest
+            sequence = lambda values: array('q', values)
+        else:
+            # integers of any size can't be bounded by those of a typed array
+            self.largest = float('inf')
+            self.smallest = float('-inf')
+            sequence = list
+
+        values = [0 if number == missing else number for number in numbers]
+        present = [int(number != missing) for number in numbers]
+        padding = [0] * (size - len(numbers))
+
+        # each node of a Fenwick tree is the difference of two prefix sums
+        self.sums = self._fenwick(values + padding)
+        self.counts = array('l', self._fenwick(present + padding))
+
+        mins = sequence([self.largest]) * size + numbers
+        maxs = sequence([self.smallest]) * size + numbers
+        mins.extend(sequence([self.largest]) * (size - len(numbers)))
+        maxs.extend(sequence([self.smallest]) * (size - len(numbers)))
+
+        # missing is the same as Smallest so only the minimums need fixing
+        if missing is not None and missing in numbers:
+            for row, number in enumerate(numbers):
+                if number == missing:
+                    mins[size + row] = self.largest
+
+        first = size // 2
+        while first:
+            last = 2 * first
+            mins[first:last] = sequence(map(min, mins[2 * first:2 * last:2],
+                    mins[2 * first + 1:2 * last:2]))
+            maxs[first:last] = sequence(map(max, maxs[2 * first:2 * last:2],
+                    maxs[2 * first + 1:2 * last:2]))
+            first //= 2
+
+        self.mins = mins
+        self.maxs = maxs
+
+    @staticmethod
+    def _fenwick(values):
+        prefix = [0]
+        prefix.extend(itertools.accumulate(values))
+
+        return [prefix[i] - prefix[i - (i & -i)] for i in range(len(prefix))]
+
+    def update(self, row, old, new):
+        """Replace the number at a row.  Either may be None."""
+
+        delta = (new or 0) - (old or 0)
+        countDelta = (new is not None) - (old is not None)
+
+        i = row + 1
+        while i <= self.size:
+            self.sums[i] += delta
+            self.counts[i] += countDelta
+            i += i & -i
+
+        i = self.size + row
+        self.mins[i] = self.largest if new is None else new
+        self.maxs[i] = self.smallest if new is None else new
+        i //= 2
+        while i:
+            self.mins[i] = min(self.mins[2 * i], self.mins[2 * i + 1])
+            self.maxs[i] = max(self.maxs[2 * i], self.maxs[2 * i + 1])
+            i //= 2
+
+    def _prefix(self, end):
+        total = 0
+        count = 0
+        while end > 0:
+            total += self.sums[end]
+            count += self.counts[end]
+            end -= end & -end
+
+        return total, count
+
+    def query(self, top, bottom):
+        """Return the (sum, count, minimum, maximum) of the numbers in the
+        rows from top to bottom inclusive.
+        """
+
+        top = max(top, 0)
+        bottom = min(bottom, self.size - 1)
+        if top > bottom:
+            return 0, 0, None, None
+
+        total, count = self._prefix(bottom + 1)
+        above, aboveCount = self._prefix(top)
+        count -= aboveCount
+        if count == 0:
+            return 0, 0, None, None
+
+        low = self.largest
+        high = self.smallest
+        first = top + self.size
+        last = bottom + self.size + 1
+        while first < last:
+            if first & 1:
+                low = min(low, self.mins[first])
+                high = max(high, self.maxs[first])
+                first += 1
+            if last & 1:
+                last -= 1
+                low = min(low, self.mins[last])
+                high = max(high, self.maxs[last])
+            first //= 2
+            last //= 2
+
+        return total - above, count, low, high
+
+
+class Column(object):
+    """The constant cells of a column.  Integers in the populated part of
+    the column are held in a typed array.  Anything else, including
+    integers well beyond the populated part, is held in a dictionary keyed
+    by row.  The statistics of ranges of the column are answered by an
+    index that is built when first needed and then kept up to date.  The
+    integers in the dictionary, and texts that are also integers, have an
+    index of their own over their sorted rows, which is rebuilt when those
+    rows change.
+    """
+
+    Missing = -(1 << 63)
+
+    # the array is not grown beyond this many rows for each integer in the
+    # column, and a further fixed number, so that its size follows the
+    # number of populated cells rather than their rows
+    RowsPerInteger = 4
+    MaxGap = 1024
+
+    def __init__(self):
+        self.numbers = array('q')
+        # the number of integers in the array
+        self.count = 0
+        self.texts = {}
+        # the integer values of the rows in texts that are also integers
+        self.strays = {}
+        self.index = None
+        self.strayRows = []
+        self.strayIndex = None
+
+    def get(self, row):
+        if row < len(self.numbers):
+            number = self.numbers[row]
+            if number != self.Missing:
+                return number
+
+        return self.texts.get(row)
+
+    def _number(self, row):
+        if row < len(self.numbers):
+            number = self.numbers[row]
+            if number != self.Missing:
+                return number
+
+        return None
+
+    def set(self, row, value):
+        old = self._number(row)
+        oldStray = self.strays.get(row)
+
+        self._set(row, value)
+
+        if self.strayIndex is not None:
+            newStray = self.strays.get(row)
+            if oldStray is not None and newStray is not None:
+                position = bisect.bisect_left(self.strayRows, row)
+                self.strayIndex.update(position, oldStray, newStray)
+            elif oldStray is not None or newStray is not None:
+                # the index will be rebuilt with the new rows
+                self.strayIndex = None
+
+        if self.index is not None:
+            if row >= self.index.size:
+                # the index will be rebuilt with more room
+                self.index = None
+            else:
+                new = self._number(row)
+                if new != old:
+                    self.index.update(row, old, new)
+
+    def _set(self, row, value):
+        if row < len(self.numbers) and self.numbers[row] != self.Missing:
+            self.numbers[row] = self.Missing
+            self.count -= 1
+        self.texts.pop(row, None)
+        self.strays.pop(row, None)
+
+        if value is None:
+            return
+
+        if isinstance(value, int) and self.Missing < value < (1 << 63):
+            gap = row - len(self.numbers)
+            if gap < 0:
+                self.numbers[row] = value
+                self.count += 1
+                return
+
+            integers = self.count + len(self.strays)
+            if row < self.MaxGap + self.RowsPerInteger * integers:
+                if gap:
+                    self.numbers.extend(array('q', [self.Missing]) * gap)
+                self.numbers.append(value)
+                self.count += 1
+                return
+
+        self.texts[row] = value
+        number = toInt(value)
+        if number is not None:
+            self.strays[row] = number
+
+    def aggregate(self, top, bottom):
+        """Return the (sum, count, minimum, maximum) of the integers in the
+        rows from top to bottom inclusive.
+        """
+
+        if self.index is None:
+            self.index = ColumnIndex(self.numbers, self.Missing)
+
+        statistics = self.index.query(top, bottom)
+
+        if self.strays:
+            if self.strayIndex is None:
+                self.strayRows = sorted(self.strays)
+                self.strayIndex = ColumnIndex(
+                        [self.strays[row] for row in self.strayRows])
+
+            first = bisect.bisect_left(self.strayRows, top)
+            last = bisect.bisect_right(self.strayRows, bottom) - 1
+            statistics = merge(statistics,
+                    self.strayIndex.query(first, last))
+
+        return statistics
+
+
+class SpreadSheetModel(QAbstractTableModel):
+    """A sparse table of cells.  Constants are stored by column, formulas
+    in a separate table, and any other data, such as the background of a
+    cell, in a third table.  Only populated cells use any memory.
+    """
+
+    def __init__(self, rows, columns, parent=None):
+        super(SpreadSheetModel, self).__init__(parent)
+
+        self._rowCount = rows
+        self._columns = [Column() for _ in range(columns)]
+        self._formulas = {}
+        # the sorted rows of the formulas in each column
+        self._formulaRows = {}
+        self._roles = {}
+
+        self.engine = FormulaEngine(self)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return self._rowCount
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self._columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+
+        if orientation == Qt.Horizontal:
+            return chr(ord('A') + section)
+
+        return str(section + 1)
+
+    def flags(self, index):
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsEditable
+
+    def formula(self, row, column):
+        """Return the contents of a cell as it would be edited."""
+
+        formula = self._formulas.get((row, column))
+        if formula is not None:
+            return formula
+
+        if column >= len(self._columns):
+            return None
+
+        value = self._columns[column].get(row)
+        if value is None:
+            return None
+
+        return str(value)
+
+    def value(self, row, column):
+        """Return the value of a cell, computing it if it is a formula."""
+
+        if (row, column) in self._formulas:
+            return self.engine.value(row, column)
+
+        if column >= len(self._columns):
+            return None
+
+        return self._columns[column].get(row)
+
+    def aggregate(self, top, left, bottom, right):
+        """Return the (sum, count, minimum, maximum) of the integer constants
+        in a range of cells.
+        """
+
+        statistics = (0, 0, None, None)
+        for column in range(max(left, 0), min(right + 1, len(self._columns))):
+            statistics = merge(statistics,
+                    self._columns[column].aggregate(top, bottom))
+
+        return statistics
+
+    def formulaCells(self, top, left, bottom, right):
+        """Return the cells in a range that contain formulas."""
+
+        cells = []
+        for column in range(max(left, 0), min(right + 1, len(self._columns))):
+            rows = self._formulaRows.get(column)
+            if rows:
+                first = bisect.bisect_left(rows, top)
+                last = bisect.bisect_right(rows, bottom)
+                cells.extend((row, column) for row in rows[first:last])
+
+        return cells
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        column = index.column()
+
+        if role in (Qt.EditRole, Qt.StatusTipRole):
+            return self.formula(row, column)
+
+        if role == Qt.DisplayRole:
+            return self.value(row, column)
+
+        if role == Qt.TextColorRole:
+            value = self.value(row, column)
+            if value is None:
+                return None
+            try:
+                number = int(str(value))
+            except ValueError:
+                return QColor(Qt.black)
+            if number < 0:
+                return QColor(Qt.red)
+            return QColor(Qt.blue)
+
+        if role == Qt.TextAlignmentRole:
+            t = str(self.value(row, column))
+            if t and (t[0].isdigit() or t[0] == '-'):
+                return Qt.AlignRight | Qt.AlignVCenter
+
+        roles = self._roles.get((row, column))
+        if roles is None:
+            return None
+
+        return roles.get(role)
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid():
+            return False
+
+        row = index.row()
+        column = index.column()
+
+        if role in (Qt.EditRole, Qt.DisplayRole):
+            self._setText(row, column, value)
+            roles = [Qt.DisplayRole, Qt.EditRole]
+        else:
+            roles = self._roles.setdefault((row, column), {})
+            if value is None:
+                roles.pop(role, None)
+                if not roles:
+                    del self._roles[(row, column)]
+            else:
+                roles[role] = value
+            roles = [role]
+
+        self.dataChanged.emit(index, index, roles)
+
+        return True
+
+    def setText(self, row, column, text):
+        return self.setData(self.index(row, column), text)
+
+    def _setText(self, row, column, text):
+        if self._formulas.pop((row, column), None) is not None:
+            rows = self._formulaRows[column]
+            del rows[bisect.bisect_left(rows, row)]
+
+        if text is None or text == '':
+            self._columns[column].set(row, None)
+            return
+
+        text = str(text)
+        if Formula.isFormula(text):
+            self._columns[column].set(row, None)
+            self._formulas[(row, column)] = text
+            bisect.insort(self._formulaRows.setdefault(column, []), row)
+            return
+
+        self._columns[column].set(row, self._constant(text))
+
+    @staticmethod
+    def _constant(text):
+        # only store integers that give back the same text
+        try:
+            number = int(text)
+        except ValueError:
+            return text
+
+        return number if str(number) == text else text
+
+    def columnTexts(self, column):
+        """Return the distinct contents of a column."""
+
+        texts = set(str(value)
+                for value in self._columns[column].texts.values())
+        texts.update(str(number) for number in self._columns[column].numbers
+                if number != Column.Missing)
+        texts.update(text for (_, c), text in self._formulas.items()
+                if c == column)
+
+        return sorted(texts)
+
+    def loadCsv(self, fileName, delimiter=','):
+        """Replace the contents of the sheet with those of a CSV file.  The
+        sheet is made large enough to hold the file.
+        """
+
+        self.beginResetModel()
+
+        columns = []
+        formulas = {}
+        formulaRows = {}
+        rowCount = 0
+        constant = self._constant
+        isFormula = Formula.isFormula
+
+        with open(fileName, newline='') as f:
+            for row, fields in enumerate(csv.reader(f, delimiter=delimiter)):
+                while len(columns) < len(fields):
+                    columns.append(Column())
+
+                for column, text in enumerate(fields):
+                    if not text:
+                        continue
+
+                    if isFormula(text):
+                        formulas[(row, column)] = text
+                        formulaRows.setdefault(column, []).append(row)
+                    else:
+                        columns[column].set(row, constant(text))
+
+                rowCount = row + 1
+
+        while len(columns) < len(self._columns):
+            columns.append(Column())
+
+        self._rowCount = max(self._rowCount, rowCount)
+        self._columns = columns
+        self._formulas = formulas
+        self._formulaRows = formulaRows
+        self._roles = {}
+
+        self.endResetModel()
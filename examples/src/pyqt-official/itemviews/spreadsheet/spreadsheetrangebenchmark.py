@@ -0,0 +1,210 @@
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited
+## Copyright (C) 2012 Hans-Peter Jansen <hpj@urpla.net>.
+## Copyright (C) 2011 Nokia Corporation and/or its subsidiary(-ies).
+## All rights reserved.
+## Contact: Nokia Corporation (qt-info@nokia.com)
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:LGPL$
+## GNU Lesser General Public License Usage
+## This file may be used under the terms of the GNU Lesser General Public
+## License version 2.1 as published by the Free Software Foundation and
+## appearing in the file LICENSE.LGPL included in the packaging of this
+## file. Please review the following information to ensure the GNU Lesser
+## General Public License version 2.1 requirements will be met:
+## http:#www.gnu.org/licenses/old-licenses/lgpl-2.1.html.
+##
+## In addition, as a special exception, Nokia gives you certain additional
+## rights. These rights are described in the Nokia Qt LGPL Exception
+## version 1.1, included in the file LGPL_EXCEPTION.txt in this package.
+##
+## GNU General Public License Usage
+## Alternatively, this file may be used under the terms of the GNU General
+## Public License version 3.0 as published by the Free Software Foundation
+## and appearing in the file LICENSE.GPL included in the packaging of this
+## file. Please review the following information to ensure the GNU General
+## Public License version 3.0 requirements will be met:
+## http:#www.gnu.org/copyleft/gpl.html.
+##
+## Other Usage
+## Alternatively, this file may be used in accordance with the terms and
+## conditions contained in a signed written agreement between you and Nokia.
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+"""Measure range formulas over a column of a million integers.
+
+The column is loaded from a CSV file.  Each of the range operators is
+evaluated over random ranges of the column using the model's index, and for
+comparison a few sums are computed by looking at every cell in the range.
+Finally a cell in the column is changed repeatedly, which updates the index
+and recomputes a formula that depends on it.
+
+The queries are then repeated over a column that starts below its first
+thousands of rows, and in which some of the integers are written as texts,
+and their results are checked against the cells themselves.  Last, a few
+integers are put at the bottom of an empty million row sheet, and the memory
+used and the time taken by a sum over the whole column are reported.
+"""
+
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser,
+        QCoreApplication)
+
+from spreadsheetformula import Formula, toInt
+from spreadsheetmodel import SpreadSheetModel
+from util import encode_pos
+
+
+def writeCsv(fileName, rows, offset=0, texts=False):
+    """Write a column of rows random integers after offset empty rows.  If
+    texts is set then some of the integers are written with a plus sign, so
+    that they are kept as texts.
+    """
+
+    rand = random.Random(0)
+
+    with open(fileName, 'w') as f:
+        f.write("\n" * offset)
+        for row in range(rows):
+            if texts and row % 1000 == 0:
+                f.write("+%d\n" % rand.randint(-1000, 100000))
+            else:
+                f.write("%d\n" % rand.randint(-1000, 100000))
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure range formulas over a column of integers.")
+    parser.addHelpOption()
+    rowsOption = QCommandLineOption(['r', 'rows'],
+            "Use a column of <rows> integers.", 'rows', '1000000')
+    parser.addOption(rowsOption)
+    queriesOption = QCommandLineOption(['q', 'queries'],
+            "Evaluate each operator over <queries> ranges.", 'queries',
+            '1000')
+    parser.addOption(queriesOption)
+    parser.process(app)
+
+    rows = int(parser.value(rowsOption))
+    queries = int(parser.value(queriesOption))
+    rand = random.Random(1)
+
+    fd, fileName = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        writeCsv(fileName, rows)
+
+        model = SpreadSheetModel(0, 2)
+        start = time.perf_counter()
+        model.loadCsv(fileName)
+        print("load %d rows: %.2fs" % (rows, time.perf_counter() - start))
+    finally:
+        os.remove(fileName)
+
+    start = time.perf_counter()
+    model.aggregate(0, 0, 0, 0)
+    print("build index: %.2fs" % (time.perf_counter() - start))
+
+    def randomRange():
+        top = rand.randrange(rows)
+        bottom = rand.randrange(top, rows)
+        return "A%d A%d" % (top + 1, bottom + 1)
+
+    # each formula is put in the same cell, next to the column
+    index = model.index(0, 1)
+    for op in Formula.RangeOperators:
+        start = time.perf_counter()
+        for i in range(queries):
+            model.setText(0, 1, "%s %s" % (op, randomRange()))
+            model.data(index)
+        elapsed = time.perf_counter() - start
+
+        print("%-8s %8.1fus per range" % (op, elapsed / queries * 1e6))
+
+    # the same sums by looking at each cell, as formulas used to
+    scans = 3
+    start = time.perf_counter()
+    for i in range(scans):
+        model.setText(0, 1, "sum %s" % randomRange())
+        formula = Formula((0, 1), model.formula(0, 1))
+        formula.statistics((0, 1), lambda cell: model.formula(*cell))
+    elapsed = time.perf_counter() - start
+    print("%-8s %8.1fus per range" % ("scan", elapsed / scans * 1e6))
+
+    # change cells in the range of a sum
+    model.setText(0, 1, "sum A1 %s" % encode_pos(rows - 1, 0))
+    model.data(index)
+    start = time.perf_counter()
+    for i in range(queries):
+        model.setText(rand.randrange(rows), 0, str(rand.randint(-1000, 1000)))
+    elapsed = time.perf_counter() - start
+    print("%-8s %8.1fus per change" % ("update", elapsed / queries * 1e6))
+
+    total = sum(toInt(model.formula(row, 0)) for row in range(rows))
+    assert model.data(index) == total
+
+    # a column starting below its first rows, with some integers as texts
+    offset = 2000
+    fd, fileName = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        writeCsv(fileName, rows, offset, texts=True)
+        model = SpreadSheetModel(0, 1)
+        model.loadCsv(fileName)
+    finally:
+        os.remove(fileName)
+
+    def randomRows():
+        top = rand.randrange(offset + rows)
+        return top, rand.randrange(top, offset + rows)
+
+    model.aggregate(0, 0, 0, 0)
+    start = time.perf_counter()
+    for i in range(queries):
+        top, bottom = randomRows()
+        model.aggregate(top, 0, bottom, 0)
+    elapsed = time.perf_counter() - start
+    print("%-8s %8.1fus per range" % ("offset", elapsed / queries * 1e6))
+
+    numbers = [toInt(model.formula(row, 0)) for row in range(offset + rows)]
+    for i in range(10):
+        top, bottom = randomRows()
+        expected = [n for n in numbers[top:bottom + 1] if n is not None]
+        statistics = model.aggregate(top, 0, bottom, 0)
+        assert statistics[:2] == (sum(expected), len(expected))
+        if expected:
+            assert statistics[2:] == (min(expected), max(expected))
+
+    # a few integers at the bottom of a large, otherwise empty, sheet
+    sheetRows = 1000000
+    tracemalloc.start()
+    model = SpreadSheetModel(sheetRows, 2)
+    for row in range(sheetRows - 3, sheetRows):
+        model.setText(row, 1, str(row))
+    start = time.perf_counter()
+    model.setText(0, 0, "sum B1 B%d" % sheetRows)
+    total = model.data(model.index(0, 0))
+    elapsed = time.perf_counter() - start
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("%-8s %8.1fus per range, %dkB, peak %dkB" % ("sparse",
+            elapsed * 1e6, size // 1024, peak // 1024))
+
+    assert total == sum(range(sheetRows - 3, sheetRows))
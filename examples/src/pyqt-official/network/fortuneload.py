@@ -0,0 +1,447 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""A load generator for the fortune servers.
+
+It speaks the protocol of the fortune examples, in which the server sends a
+16 bit block size followed by a QString written with QDataStream and closes
+the connection.  TCP servers, such as fortuneserver.py and
+threadedfortuneserver.py, are reached with --port and local socket servers,
+such as ipc/localfortuneserver.py, with --local.
+
+Each request is a new connection that reads a fortune, checks that the block
+is well formed and holds one of the server's fortunes, and closes.  In a
+closed loop a number of connections are kept open, each replaced by a new
+one as soon as its fortune has been read.  With a target rate, requests are
+started on a fixed schedule however quickly the server answers them, using
+up to the given number of connections.  A request that has to wait for a
+free connection is timed from when it was due, so that a slow server can't
+hide its delays by holding back the requests.
+
+Latencies are recorded in a histogram with a bucket for each power of two,
+split into linear sub-buckets, which keeps the error of every percentile
+below 1% whatever the range of the latencies.  The results can be written as
+JSON to compare server implementations.
+"""
+
+
+import collections
+import json
+import math
+import sys
+import time
+
+from PyQt5.QtCore import (pyqtSignal, QCommandLineOption, QCommandLineParser,
+        QCoreApplication, QDataStream, QObject, Qt, QTimer)
+from PyQt5.QtNetwork import QLocalSocket, QTcpSocket
+
+
+# The fortunes sent by the fortune servers.
+FORTUNES = frozenset((
+    "You've been leading a dog's life. Stay off the furniture.",
+    "You've got to think about tomorrow.",
+    "You will be surprised by a loud noise.",
+    "You will feel hungry again in another hour.",
+    "You might have mail.",
+    "You cannot kill time without injuring eternity.",
+    "Computers are not intelligent. They only think they are."))
+
+# The percentiles that are reported.
+PERCENTILES = (50.0, 75.0, 90.0, 99.0, 99.9, 99.99, 100.0)
+
+
+class LatencyHistogram(object):
+    """A histogram of latencies in whole microseconds.
+
+    Values below 2 ** SubBucketBits are counted exactly.  Larger values are
+    counted in a bucket for each power of two, split into
+    2 ** (SubBucketBits - 1) sub-buckets of equal width.
+    """
+
+    SubBucketBits = 8
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.count = 0
+        self.total = 0
+        self.minimum = 0
+        self.maximum = 0
+
+    def record(self, value):
+        value = max(0, int(value))
+
+        shift = value.bit_length() - self.SubBucketBits
+        if shift <= 0:
+            index = value
+        else:
+            index = (shift << (self.SubBucketBits - 1)) + (value >> shift)
+
+        self.counts[index] += 1
+
+        if self.count == 0 or value < self.minimum:
+            self.minimum = value
+
+        self.maximum = max(self.maximum, value)
+        self.count += 1
+        self.total += value
+
+    def bucketRange(self, index):
+        """Return the lowest and highest values counted by a sub-bucket."""
+
+        shift = (index >> (self.SubBucketBits - 1)) - 1
+        if shift <= 0:
+            return index, index
+
+        lowest = (index - (shift << (self.SubBucketBits - 1))) << shift
+
+        return lowest, lowest + (1 << shift) - 1
+
+    def mean(self):
+        if self.count == 0:
+            return 0.0
+
+        return self.total / self.count
+
+    def valueAtPercentile(self, percentile):
+        """Return the highest value counted by the sub-bucket holding the
+        given percentile, which is never more than the largest value
+        recorded.
+        """
+
+        if self.count == 0:
+            return 0
+
+        target = max(1, math.ceil(percentile / 100.0 * self.count))
+        seen = 0
+
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self.bucketRange(index)[1], self.maximum)
+
+        return self.maximum
+
+    def buckets(self):
+        """Return the lowest and highest values and the count of each
+        sub-bucket that has been used, in order.
+        """
+
+        return [self.bucketRange(index) + (self.counts[index], )
+                for index in sorted(self.counts)]
+
+
+class FortuneLoad(QObject):
+    """Make requests to a fortune server for a number of seconds.
+
+    If port is None then host is the name of a local socket server.  If rate
+    is 0 then the given number of connections are kept open, otherwise
+    requests are started at rate a second using at most that many
+    connections.
+    """
+
+    finished = pyqtSignal()
+
+    def __init__(self, host, port, connections, duration, rate=0.0,
+            parent=None):
+        super(FortuneLoad, self).__init__(parent)
+
+        self.host = host
+        self.port = port
+        self.connections = connections
+        self.duration = duration
+        self.rate = rate
+
+        self.histogram = LatencyHistogram()
+        self.errors = 0
+        self.invalid = 0
+        self.missed = 0
+        self.open = 0
+        self.startTime = self.endTime = 0.0
+        self.running = False
+
+        # The times at which requests waiting for a connection were due.
+        self.pending = collections.deque()
+        self.scheduled = 0
+
+        self.scheduleTimer = QTimer(self)
+        self.scheduleTimer.setTimerType(Qt.PreciseTimer)
+        self.scheduleTimer.timeout.connect(self.schedule)
+
+    def start(self):
+        self.running = True
+        self.startTime = time.perf_counter()
+        QTimer.singleShot(int(self.duration * 1000), Qt.PreciseTimer,
+                self.stop)
+
+        if self.rate > 0:
+            self.scheduleTimer.start(max(1, min(10, int(1000 / self.rate))))
+            self.schedule()
+        else:
+            for i in range(self.connections):
+                self.connect(self.startTime)
+
+    def stop(self):
+        self.running = False
+        self.endTime = time.perf_counter()
+        self.scheduleTimer.stop()
+
+        # Requests that never got a connection have no latency to record.
+        self.missed += len(self.pending)
+        self.pending.clear()
+
+        if self.open == 0:
+            self.finished.emit()
+
+    def schedule(self):
+        due = int((time.perf_counter() - self.startTime) * self.rate) + 1
+
+        while self.scheduled < due:
+            self.pending.append(self.startTime + self.scheduled / self.rate)
+            self.scheduled += 1
+
+        self.startPending()
+
+    def startPending(self):
+        while self.pending and self.open < self.connections:
+            self.connect(self.pending.popleft())
+
+    def connect(self, startTime):
+        if self.port is None:
+            socket = QLocalSocket(self)
+        else:
+            socket = QTcpSocket(self)
+
+        socket.blockSize = 0
+        socket.startTime = startTime
+        socket.readyRead.connect(self.readFortune)
+        socket.error.connect(self.socketError)
+        self.open += 1
+
+        if self.port is None:
+            socket.connectToServer(self.host)
+        else:
+            socket.connectToHost(self.host, self.port)
+
+    def readFortune(self):
+        socket = self.sender()
+
+        instr = QDataStream(socket)
+        instr.setVersion(QDataStream.Qt_4_0)
+
+        if socket.blockSize == 0:
+            if socket.bytesAvailable() < 2:
+                return
+
+            socket.blockSize = instr.readUInt16()
+
+        available = socket.bytesAvailable()
+        if available < socket.blockSize:
+            return
+
+        fortune = instr.readQString()
+        self.histogram.record(
+                (time.perf_counter() - socket.startTime) * 1000000)
+
+        # The block must hold exactly one fortune that the server knows.
+        if (instr.status() != QDataStream.Ok or
+                available - socket.bytesAvailable() != socket.blockSize or
+                socket.bytesAvailable() != 0 or fortune not in FORTUNES):
+            self.invalid += 1
+
+        self.closeSocket(socket)
+
+    def socketError(self, socketError):
+        socket = self.sender()
+
+        # The server closing the connection isn't an error once the fortune
+        # has been read, by which time the socket has been closed.
+        if socket.blockSize >= 0:
+            self.errors += 1
+
+            # A local socket can report an error from within connect(), so
+            # the connection is replaced from the event loop to avoid
+            # recursing while the server is unavailable.
+            self.closeSocket(socket, deferred=True)
+
+    def closeSocket(self, socket, deferred=False):
+        # Mark the socket as closed so that any later error is ignored.
+        socket.blockSize = -1
+        socket.abort()
+        socket.deleteLater()
+        self.open -= 1
+
+        if self.running:
+            if deferred:
+                QTimer.singleShot(0, self.replaceConnection)
+            else:
+                self.replaceConnection()
+        elif self.open == 0:
+            self.finished.emit()
+
+    def replaceConnection(self):
+        if not self.running:
+            return
+
+        if self.rate > 0:
+            self.startPending()
+        else:
+            self.connect(time.perf_counter())
+
+    def elapsed(self):
+        return (self.endTime or time.perf_counter()) - self.startTime
+
+    def report(self):
+        """Return the number of requests per second, the median and 99th
+        percentile latencies in seconds, and the numbers of errors and of
+        invalid fortunes.
+        """
+
+        return (self.histogram.count / self.elapsed(),
+                self.histogram.valueAtPercentile(50) / 1000000.0,
+                self.histogram.valueAtPercentile(99) / 1000000.0,
+                self.errors, self.invalid)
+
+    def results(self):
+        """Return the configuration and results as a dictionary that can be
+        written as JSON.  Latencies are in microseconds.
+        """
+
+        histogram = self.histogram
+
+        if self.port is None:
+            server = {'transport': 'local', 'name': self.host}
+        else:
+            server = {'transport': 'tcp', 'host': self.host,
+                    'port': self.port}
+
+        return {
+            'server': server,
+            'connections': self.connections,
+            'duration': self.duration,
+            'targetRate': self.rate,
+            'elapsed': self.elapsed(),
+            'requests': histogram.count,
+            'throughput': histogram.count / self.elapsed(),
+            'errors': self.errors,
+            'invalid': self.invalid,
+            'missed': self.missed,
+            'latency': {
+                'unit': 'us',
+                'minimum': histogram.minimum,
+                'maximum': histogram.maximum,
+                'mean': histogram.mean(),
+                'percentiles': [[p, histogram.valueAtPercentile(p)]
+                        for p in PERCENTILES],
+                'buckets': histogram.buckets(),
+            },
+        }
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Generate load for a fortune server.")
+    parser.addHelpOption()
+    hostOption = QCommandLineOption(['H', 'host'],
+            "Connect to the server on <host>.", 'host', '127.0.0.1')
+    parser.addOption(hostOption)
+    portOption = QCommandLineOption(['p', 'port'],
+            "Connect to the server on <port>.", 'port')
+    parser.addOption(portOption)
+    localOption = QCommandLineOption(['l', 'local'],
+            "Connect to the local socket server called <name>.", 'name')
+    parser.addOption(localOption)
+    connectionsOption = QCommandLineOption(['c', 'connections'],
+            "Use at most <count> connections at a time.", 'count', '50')
+    parser.addOption(connectionsOption)
+    rateOption = QCommandLineOption(['r', 'rate'],
+            "Start <requests> a second rather than replacing each "
+            "connection as soon as it has closed.", 'requests', '0')
+    parser.addOption(rateOption)
+    durationOption = QCommandLineOption(['d', 'duration'],
+            "Generate load for <seconds>.", 'seconds', '5')
+    parser.addOption(durationOption)
+    jsonOption = QCommandLineOption(['j', 'json'],
+            "Write the results as JSON to <file>, or to stdout if it is -.",
+            'file')
+    parser.addOption(jsonOption)
+    parser.process(app)
+
+    if parser.isSet(localOption):
+        host = parser.value(localOption)
+        port = None
+    elif parser.isSet(portOption):
+        host = parser.value(hostOption)
+        port = int(parser.value(portOption))
+    else:
+        parser.showHelp(1)
+
+    load = FortuneLoad(host, port, int(parser.value(connectionsOption)),
+            float(parser.value(durationOption)),
+            float(parser.value(rateOption)))
+    load.finished.connect(app.quit)
+    QTimer.singleShot(0, load.start)
+    app.exec_()
+
+    results = load.results()
+
+    if parser.isSet(jsonOption):
+        fileName = parser.value(jsonOption)
+        if fileName == '-':
+            json.dump(results, sys.stdout, indent=2)
+            print()
+            sys.exit()
+
+        with open(fileName, 'w') as jsonFile:
+            json.dump(results, jsonFile, indent=2)
+
+    print("%d requests, %.0f requests/s, %d errors, %d invalid fortunes, "
+            "%d missed" % (results['requests'], results['throughput'],
+            results['errors'], results['invalid'], results['missed']))
+    print("%10s %14s" % ("percentile", "latency (ms)"))
+    for percentile, latency in results['latency']['percentiles']:
+        print("%10s %14.3f" % ("%g" % percentile, latency / 1000.0))
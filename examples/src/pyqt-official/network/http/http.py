@@ -42,28 +42,36 @@
 #############################################################################
 
 
-from PyQt5.QtCore import QDir, QFile, QFileInfo, QIODevice, QUrl
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser, QDir,
+        QFile, QFileInfo, QUrl)
 from PyQt5.QtWidgets import (QApplication, QDialog, QDialogButtonBox,
         QHBoxLayout, QLabel, QLineEdit, QMessageBox, QProgressDialog,
-        QPushButton, QVBoxLayout)
-from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest
+        QPushButton, QSpinBox, QVBoxLayout)
+from PyQt5.QtNetwork import QNetworkAccessManager
+
+from segmenteddownload import SegmentedDownload
 
 
 class HttpWindow(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, segments=4, parent=None):
         super(HttpWindow, self).__init__(parent)
 
         self.url = QUrl()
         self.qnam = QNetworkAccessManager()
-        self.reply = None
-        self.outFile = None
-        self.httpGetId = 0
-        self.httpRequestAborted = False
+        self.download = None
 
         self.urlLineEdit = QLineEdit('https://www.qt.io')
 
         urlLabel = QLabel("&URL:")
         urlLabel.setBuddy(self.urlLineEdit)
+
+        self.segmentsSpinBox = QSpinBox()
+        self.segmentsSpinBox.setRange(1, SegmentedDownload.MaximumSegments)
+        self.segmentsSpinBox.setValue(segments)
+
+        segmentsLabel = QLabel("&Segments:")
+        segmentsLabel.setBuddy(self.segmentsSpinBox)
+
         self.statusLabel = QLabel(
                 "Please enter the URL of a file you want to download.")
         self.statusLabel.setWordWrap(True)
@@ -90,6 +98,8 @@ class HttpWindow(QDialog):
         topLayout = QHBoxLayout()
         topLayout.addWidget(urlLabel)
         topLayout.addWidget(self.urlLineEdit)
+        topLayout.addWidget(segmentsLabel)
+        topLayout.addWidget(self.segmentsSpinBox)
 
         mainLayout = QVBoxLayout()
         mainLayout.addLayout(topLayout)
@@ -100,12 +110,6 @@ class HttpWindow(QDialog):
         self.setWindowTitle("HTTP")
         self.urlLineEdit.setFocus()
 
-    def startRequest(self, url):
-        self.reply = self.qnam.get(QNetworkRequest(url))
-        self.reply.finished.connect(self.httpFinished)
-        self.reply.readyRead.connect(self.httpReadyRead)
-        self.reply.downloadProgress.connect(self.updateDataReadProgress)
-
     def downloadFile(self):
         self.url = QUrl(self.urlLineEdit.text())
         fileInfo = QFileInfo(self.url.path())
@@ -114,7 +118,9 @@ class HttpWindow(QDialog):
         if not fileName:
             fileName = 'index.html'
 
-        if QFile.exists(fileName):
+        if SegmentedDownload.canResume(fileName, self.url):
+            self.statusLabel.setText("Resuming the download of %s." % fileName)
+        elif QFile.exists(fileName):
             ret = QMessageBox.question(self, "HTTP",
                     "There already exists a file called %s in the current "
                     "directory. Overwrite?" % fileName,
@@ -125,85 +131,59 @@ class HttpWindow(QDialog):
 
             QFile.remove(fileName)
 
-        self.outFile = QFile(fileName)
-        if not self.outFile.open(QIODevice.WriteOnly):
-            QMessageBox.information(self, "HTTP",
-                    "Unable to save the file %s: %s." % (fileName, self.outFile.errorString()))
-            self.outFile = None
-            return
-
         self.progressDialog.setWindowTitle("HTTP")
         self.progressDialog.setLabelText("Downloading %s." % fileName)
         self.downloadButton.setEnabled(False)
 
-        self.httpRequestAborted = False
-        self.startRequest(self.url)
+        self.download = SegmentedDownload(self.qnam, self.url, fileName,
+                self.segmentsSpinBox.value(), self)
+        self.download.progress.connect(self.updateDataReadProgress)
+        self.download.finished.connect(self.httpFinished)
+        self.download.error.connect(self.httpFailed)
+        self.download.start()
 
     def cancelDownload(self):
-        self.statusLabel.setText("Download canceled.")
-        self.httpRequestAborted = True
-        if self.reply is not None:
-            self.reply.abort()
-        self.downloadButton.setEnabled(True)
-
-    def httpFinished(self):
-        if self.httpRequestAborted:
-            if self.outFile is not None:
-                self.outFile.close()
-                self.outFile.remove()
-                self.outFile = None
-
-            self.reply.deleteLater()
-            self.reply = None
-            self.progressDialog.hide()
-            return
-
-        self.progressDialog.hide()
-        self.outFile.flush()
-        self.outFile.close()
+        if self.download is not None:
+            self.download.cancel()
 
-        redirectionTarget = self.reply.attribute(QNetworkRequest.RedirectionTargetAttribute)
+            if self.download.canBeResumed():
+                self.statusLabel.setText("Download canceled. Downloading "
+                        "the same URL again will resume it.")
+            else:
+                self.statusLabel.setText("Download canceled.")
 
-        if self.reply.error():
-            self.outFile.remove()
-            QMessageBox.information(self, "HTTP",
-                    "Download failed: %s." % self.reply.errorString())
-            self.downloadButton.setEnabled(True)
-        elif redirectionTarget is not None:
-            newUrl = self.url.resolved(redirectionTarget)
-
-            ret = QMessageBox.question(self, "HTTP",
-                    "Redirect to %s?" % newUrl.toString(),
-                    QMessageBox.Yes | QMessageBox.No)
-
-            if ret == QMessageBox.Yes:
-                self.url = newUrl
-                self.reply.deleteLater()
-                self.reply = None
-                self.outFile.open(QIODevice.WriteOnly)
-                self.outFile.resize(0)
-                self.startRequest(self.url)
-                return
+            self.finishDownload()
         else:
-            fileName = QFileInfo(QUrl(self.urlLineEdit.text()).path()).fileName()
-            self.statusLabel.setText("Downloaded %s to %s." % (fileName, QDir.currentPath()))
+            self.statusLabel.setText("Download canceled.")
 
-            self.downloadButton.setEnabled(True)
+        self.downloadButton.setEnabled(True)
 
-        self.reply.deleteLater()
-        self.reply = None
-        self.outFile = None
+    def httpFinished(self):
+        self.statusLabel.setText("Downloaded %s to %s." % (
+                self.download.fileName, QDir.currentPath()))
+        self.finishDownload()
 
-    def httpReadyRead(self):
-        if self.outFile is not None:
-            self.outFile.write(self.reply.readAll())
+    def httpFailed(self, message):
+        self.finishDownload()
+        QMessageBox.information(self, "HTTP",
+                "Download failed: %s." % message)
+
+    def finishDownload(self):
+        self.progressDialog.hide()
+        self.download.deleteLater()
+        self.download = None
+        self.downloadButton.setEnabled(True)
 
     def updateDataReadProgress(self, bytesRead, totalBytes):
-        if self.httpRequestAborted:
-            return
+        # Progress dialogs hold ints, so they count in KB.  The maximum is
+        # never reached, so that the dialog is only hidden when the download
+        # has finished.
+        if totalBytes < 0:
+            self.progressDialog.setMaximum(0)
+        else:
+            self.progressDialog.setMaximum(totalBytes // 1024 + 1)
 
-        self.progressDialog.setMaximum(totalBytes)
-        self.progressDialog.setValue(bytesRead)
+        self.progressDialog.setValue(bytesRead // 1024)
 
     def enableDownloadButton(self):
         self.downloadButton.setEnabled(self.urlLineEdit.text() != '')
@@ -232,7 +212,7 @@ class HttpWindow(QDialog):
                 QMessageBox.Ignore | QMessageBox.Abort)
 
         if ret == QMessageBox.Ignore:
-            self.reply.ignoreSslErrors()
+            reply.ignoreSslErrors()
 
 
 if __name__ == '__main__':
@@ -240,6 +220,16 @@ if __name__ == '__main__':
     import sys
 
     app = QApplication(sys.argv)
-    httpWin = HttpWindow()
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription("Download a URL.")
+    parser.addHelpOption()
+    segmentsOption = QCommandLineOption(['s', 'segments'],
+            "Download in <count> segments at once if the server allows it.",
+            'count', '4')
+    parser.addOption(segmentsOption)
+    parser.process(app)
+
+    httpWin = HttpWindow(int(parser.value(segmentsOption)))
     httpWin.show()
     sys.exit(httpWin.exec_())
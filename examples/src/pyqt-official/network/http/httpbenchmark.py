@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure the throughput of segmented downloads against a local stand-in
+for an HTTP server, for a number of segment counts.
+
+The stand-in is run in a separate process, started by this script with the
+--serve option.  It can limit the rate at which each connection is sent
+data, like many mirrors do, and can ignore range requests, so that the
+fallback to a single stream is measured.  The contents of every download
+are checked, and a download that is interrupted half way is resumed.
+Last, an empty file is downloaded.
+"""
+
+
+import hashlib
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser,
+        QCoreApplication, QTimer, QUrl)
+from PyQt5.QtNetwork import QHostAddress, QNetworkAccessManager, QTcpServer
+
+from segmenteddownload import SegmentedDownload
+
+
+def payload(size):
+    """Return the contents of the file served by the stand-in.  The pattern
+    repeats every 251 bytes so that a segment written at the wrong offset is
+    noticed.
+    """
+
+    pattern = bytes(range(251))
+
+    return (pattern * (size // len(pattern) + 1))[:size]
+
+
+class StandInServer(QTcpServer):
+    """Answer every GET request with the same contents, or the range of
+    them that was asked for, sending at most limit bytes a second on each
+    connection if it isn't 0.
+    """
+
+    ChunkSize = 65536
+    BufferSize = 4 * ChunkSize
+
+    def __init__(self, contents, limit, ranges, parent=None):
+        super(StandInServer, self).__init__(parent)
+
+        self.contents = contents
+        self.limit = limit
+        self.ranges = ranges
+        self.connections = []
+
+        self.newConnection.connect(self.acceptConnections)
+
+        # Limited connections are topped up as their allowance grows.
+        self.sendTimer = QTimer(self)
+        self.sendTimer.setInterval(10)
+        self.sendTimer.timeout.connect(self.sendAll)
+
+        if self.limit:
+            self.sendTimer.start()
+
+    def acceptConnections(self):
+        while self.hasPendingConnections():
+            connection = self.nextPendingConnection()
+            connection.request = b''
+            connection.offset = connection.end = 0
+            connection.readyRead.connect(self.readRequests)
+            connection.bytesWritten.connect(self.sendMore)
+            connection.disconnected.connect(self.closeConnection)
+            self.connections.append(connection)
+
+    def closeConnection(self):
+        connection = self.sender()
+        self.connections.remove(connection)
+        connection.deleteLater()
+
+    def readRequests(self):
+        connection = self.sender()
+        connection.request += bytes(connection.readAll())
+        self.nextRequest(connection)
+
+    def nextRequest(self, connection):
+        # Requests are answered one at a time on each connection.
+        if connection.offset < connection.end or \
+                b'\r\n\r\n' not in connection.request:
+            return
+
+        head, connection.request = connection.request.split(b'\r\n\r\n', 1)
+
+        size = len(self.contents)
+        first, last = 0, size - 1
+        match = re.search(br'^range:\s*bytes=(\d+)-(\d*)\s*$', head,
+                re.IGNORECASE | re.MULTILINE)
+
+        if self.ranges and match:
+            first = int(match.group(1))
+            if match.group(2):
+                last = min(int(match.group(2)), last)
+
+            if first >= size:
+                connection.write(b'HTTP/1.1 416 Range Not Satisfiable\r\n'
+                        b'Content-Range: bytes */%d\r\n'
+                        b'Content-Length: 0\r\n\r\n' % size)
+                self.nextRequest(connection)
+                return
+
+            connection.write(b'HTTP/1.1 206 Partial Content\r\n'
+                    b'Content-Range: bytes %d-%d/%d\r\n' % (first, last,
+                    size))
+        else:
+            connection.write(b'HTTP/1.1 200 OK\r\n')
+
+        connection.write(b'Content-Length: %d\r\nETag: "stand-in"\r\n\r\n'
+                % (last + 1 - first))
+
+        connection.offset = connection.first = first
+        connection.end = last + 1
+        connection.startTime = time.perf_counter()
+        self.send(connection)
+
+    def sendMore(self):
+        self.send(self.sender())
+
+    def sendAll(self):
+        for connection in self.connections:
+            self.send(connection)
+
+    def send(self, connection):
+        while connection.offset < connection.end and \
+                connection.bytesToWrite() < self.BufferSize:
+            count = min(self.ChunkSize, connection.end - connection.offset)
+
+            if self.limit:
+                allowed = (int(self.limit * (time.perf_counter() -
+                        connection.startTime)) -
+                        (connection.offset - connection.first))
+                count = min(count, allowed)
+                if count <= 0:
+                    break
+
+            connection.write(
+                    self.contents[connection.offset:connection.offset + count])
+            connection.offset += count
+
+        if connection.offset == connection.end:
+            self.nextRequest(connection)
+
+
+def serve(app, size, limit, ranges):
+    server = StandInServer(payload(size), limit, ranges)
+    if not server.listen(QHostAddress.LocalHost, 0):
+        sys.exit("Unable to start the server: %s." % server.errorString())
+
+    # Tell the benchmark which port to connect to.
+    print(server.serverPort(), flush=True)
+    app.exec_()
+
+
+class StandIn(object):
+    """Run the stand-in server in a separate process, serving size MB at up
+    to limit MB a second on each connection.
+    """
+
+    def __init__(self, size, limit, ranges):
+        arguments = [sys.executable, __file__, '--serve', '--size',
+                str(size), '--limits', str(limit)]
+        if not ranges:
+            arguments.append('--no-ranges')
+
+        self.process = subprocess.Popen(arguments, stdout=subprocess.PIPE,
+                universal_newlines=True)
+        self.url = QUrl('http://127.0.0.1:%d/file.bin' %
+                int(self.process.stdout.readline()))
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+class InterruptedDownload(SegmentedDownload):
+    """A download that is canceled as soon as stopAt bytes have been
+    received.
+    """
+
+    def __init__(self, stopAt, *args):
+        super(InterruptedDownload, self).__init__(*args)
+
+        self.stopAt = stopAt
+
+    def readSegment(self):
+        super(InterruptedDownload, self).readSegment()
+
+        if self.running and self.bytesReceived >= self.stopAt:
+            self.cancel()
+            QCoreApplication.quit()
+
+
+def download(app, manager, url, fileName, segments, stopAt=None):
+    """Download url to fileName, interrupting the download once stopAt
+    bytes have been received if it is given.
+    """
+
+    if stopAt is None:
+        transfer = SegmentedDownload(manager, url, fileName, segments)
+    else:
+        transfer = InterruptedDownload(stopAt, manager, url, fileName,
+                segments)
+
+    errors = []
+    transfer.error.connect(errors.append)
+    transfer.error.connect(app.quit)
+    transfer.finished.connect(app.quit)
+    transfer.start()
+    app.exec_()
+
+    if errors:
+        sys.exit("The download failed: %s." % errors[0])
+
+    return transfer
+
+
+def checkContents(fileName, expected):
+    with open(fileName, 'rb') as downloaded:
+        return hashlib.sha1(downloaded.read()).digest() == expected
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure the throughput of segmented HTTP downloads.")
+    parser.addHelpOption()
+    sizeOption = QCommandLineOption(['S', 'size'],
+            "Download a file of <MB>.", 'MB', '64')
+    parser.addOption(sizeOption)
+    segmentsOption = QCommandLineOption(['s', 'segments'],
+            "Use the comma separated numbers of <segments>.", 'segments',
+            '1,2,4,6')
+    parser.addOption(segmentsOption)
+    limitsOption = QCommandLineOption(['l', 'limits'],
+            "Limit each connection to the comma separated numbers of <MB> "
+            "a second, where 0 is no limit.", 'MB', '0,8')
+    parser.addOption(limitsOption)
+    serveOption = QCommandLineOption('serve',
+            "Run the stand-in server, printing the port it is listening on. "
+            "It uses the first of the limits.")
+    parser.addOption(serveOption)
+    noRangesOption = QCommandLineOption('no-ranges',
+            "Make the stand-in server ignore range requests.")
+    parser.addOption(noRangesOption)
+    parser.process(app)
+
+    size = int(float(parser.value(sizeOption)) * 1024 * 1024)
+    limits = [float(l) for l in parser.value(limitsOption).split(',')]
+
+    if parser.isSet(serveOption):
+        serve(app, size, int(limits[0] * 1024 * 1024),
+                not parser.isSet(noRangesOption))
+        sys.exit()
+
+    segmentCounts = [int(s) for s in parser.value(segmentsOption).split(',')]
+    expected = hashlib.sha1(payload(size)).digest()
+    manager = QNetworkAccessManager()
+
+    print("%-32s %10s %8s %9s %9s" % ("server", "segments", "MB/s",
+            "fetched", "contents"))
+
+    def report(server, segments, transfer, fileName, contents=expected):
+        fetched, rate = transfer.report()
+        print("%-32s %10s %8.1f %8.0fM %9s" % (server, segments, rate,
+                fetched / (1024 * 1024),
+                "ok" if checkContents(fileName, contents) else "corrupt"))
+
+    with tempfile.TemporaryDirectory() as directory:
+        fileName = os.path.join(directory, 'file.bin')
+
+        for limit in limits:
+            if limit:
+                server = "ranges, %g MB/s per connection" % limit
+            else:
+                server = "ranges, unlimited"
+
+            standIn = StandIn(parser.value(sizeOption), limit, True)
+
+            try:
+                for segments in segmentCounts:
+                    transfer = download(app, manager, standIn.url, fileName,
+                            segments)
+                    report(server, segments, transfer, fileName)
+                    os.remove(fileName)
+
+                # Interrupt a download half way and resume it.
+                segments = max(segmentCounts)
+                download(app, manager, standIn.url, fileName, segments,
+                        size // 2)
+                transfer = download(app, manager, standIn.url, fileName,
+                        segments)
+                report(server, "%d, resumed" % segments, transfer, fileName)
+                os.remove(fileName)
+            finally:
+                standIn.close()
+
+        standIn = StandIn(parser.value(sizeOption), 0, False)
+
+        try:
+            transfer = download(app, manager, standIn.url, fileName,
+                    max(segmentCounts))
+            report("no ranges, unlimited", max(segmentCounts), transfer,
+                    fileName)
+            os.remove(fileName)
+        finally:
+            standIn.close()
+
+        # An empty file has no byte range that can be asked for.
+        standIn = StandIn(0, 0, True)
+
+        try:
+            transfer = download(app, manager, standIn.url, fileName,
+                    max(segmentCounts))
+            report("ranges, empty file", max(segmentCounts), transfer,
+                    fileName, hashlib.sha1(b'').digest())
+        finally:
+            standIn.close()
@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Download a URL in a number of segments that are fetched at the same time.
+
+A download starts by asking for the first byte of the URL.  If the server
+answers with that byte and the size of the file, the file is preallocated and
+split into segments.  Each segment is fetched with a range request, and
+written at its own offset in the file as it arrives.  The progress of every
+segment is saved next to the file each second, and when the download fails
+or is canceled, so that starting it again only fetches what is missing.  If
+the server sends the whole file instead, it is saved as a single stream,
+which can't be resumed.
+"""
+
+
+import json
+import re
+import time
+
+from PyQt5.QtCore import (pyqtSignal, QFile, QIODevice, QObject, QSaveFile,
+        QTimer)
+from PyQt5.QtNetwork import QNetworkRequest
+
+
+class Segment(object):
+    """The range of bytes from start to end, inclusive, of which the first
+    received have been written.
+    """
+
+    def __init__(self, start, end, received=0):
+        self.start = start
+        self.end = end
+        self.received = received
+        self.reply = None
+
+    def offset(self):
+        return self.start + self.received
+
+    def remaining(self):
+        return self.end + 1 - self.offset()
+
+
+class SegmentedDownload(QObject):
+    """Download a URL to a file using a network access manager.
+
+    QNetworkAccessManager makes at most six connections to a server at a
+    time, so more segments than that are queued rather than fetched at the
+    same time.
+    """
+
+    MaximumSegments = 6
+    MinimumSegmentSize = 1024 * 1024
+    SaveInterval = 1000
+    UpdateInterval = 100
+
+    progress = pyqtSignal('qint64', 'qint64')
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, manager, url, fileName, segments=4, parent=None):
+        super(SegmentedDownload, self).__init__(parent)
+
+        self.manager = manager
+        self.url = url
+        self.downloadUrl = url
+        self.fileName = fileName
+        self.segmentCount = segments
+
+        self.file = QFile(fileName)
+        self.segments = []
+        self.probe = None
+        self.stream = None
+        self.validator = ''
+        self.totalBytes = -1
+        self.bytesReceived = 0
+        self.bytesResumed = 0
+        self.startTime = self.endTime = 0.0
+        self.running = False
+
+        self.progressTimer = QTimer(self)
+        self.progressTimer.setInterval(self.UpdateInterval)
+        self.progressTimer.timeout.connect(self.reportProgress)
+
+        self.saveTimer = QTimer(self)
+        self.saveTimer.setInterval(self.SaveInterval)
+        self.saveTimer.timeout.connect(self.saveState)
+
+    @staticmethod
+    def stateFileName(fileName):
+        return fileName + '.segments'
+
+    @classmethod
+    def loadState(cls, fileName):
+        try:
+            with open(cls.stateFileName(fileName)) as stateFile:
+                return json.load(stateFile)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def canResume(cls, fileName, url):
+        """Return True if an earlier download of url to fileName can be
+        resumed.
+        """
+
+        state = cls.loadState(fileName)
+
+        return (state is not None and state.get('url') == url.toString() and
+                QFile(fileName).size() == state.get('size'))
+
+    def request(self, url, firstByte=None, lastByte=None):
+        # Without a first byte the whole file is asked for.
+        request = QNetworkRequest(url)
+        request.setAttribute(QNetworkRequest.RedirectPolicyAttribute,
+                QNetworkRequest.NoLessSafeRedirectPolicy)
+
+        if firstByte is None:
+            pass
+        elif lastByte is None:
+            request.setRawHeader(b'Range', b'bytes=%d-' % firstByte)
+        else:
+            request.setRawHeader(b'Range',
+                    b'bytes=%d-%d' % (firstByte, lastByte))
+
+        return self.manager.get(request)
+
+    def start(self):
+        self.running = True
+        self.startTime = time.perf_counter()
+        self.progressTimer.start()
+
+        self.probe = self.request(self.url, 0, 0)
+        self.probe.metaDataChanged.connect(self.probeAnswered)
+        self.probe.finished.connect(self.probeFinished)
+
+    def probeAnswered(self):
+        status = self.probe.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+        if status is None or 300 <= status < 400 or self.stream or \
+                self.segments:
+            return
+
+        self.downloadUrl = self.probe.url()
+
+        # The size is the part of the Content-Range after the slash.
+        contentRange = bytes(self.probe.rawHeader(b'Content-Range')).decode(
+                'latin-1')
+        match = re.match(r'bytes 0-0/(\d+)$', contentRange.strip())
+
+        if status == 206 and match:
+            self.validator = bytes(self.probe.rawHeader(b'ETag') or
+                    self.probe.rawHeader(b'Last-Modified')).decode('latin-1')
+            self.startSegments(int(match.group(1)))
+        elif status == 200:
+            # The server ignored the range and is sending the whole file.
+            self.startStream(self.probe)
+            self.probe = None
+
+    def probeFinished(self):
+        probe = self.sender()
+        probe.deleteLater()
+
+        if probe is not self.probe or not self.running:
+            return
+
+        self.probe = None
+
+        if self.segments:
+            return
+
+        status = probe.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+
+        if status == 416:
+            # An empty file has no first byte to ask for, so it is asked for
+            # without a range.
+            self.startStream(self.request(self.downloadUrl))
+        elif probe.error():
+            self.fail(probe.errorString())
+        else:
+            self.fail("The server's answer to a range request couldn't be "
+                    "understood")
+
+    def openFile(self, mode):
+        if not self.file.open(mode):
+            self.fail("Unable to save the file %s: %s" % (self.fileName,
+                    self.file.errorString()))
+            return False
+
+        return True
+
+    def startSegments(self, totalBytes):
+        self.totalBytes = totalBytes
+
+        state = self.loadState(self.fileName)
+        if (state is not None and state.get('url') == self.url.toString() and
+                state.get('size') == totalBytes and
+                state.get('validator') == self.validator and
+                self.file.size() == totalBytes):
+            self.segments = [Segment(*s) for s in state['segments']]
+        else:
+            count = max(1, min(self.segmentCount,
+                    totalBytes // self.MinimumSegmentSize))
+            self.segments = [Segment(totalBytes * i // count,
+                    totalBytes * (i + 1) // count - 1)
+                    for i in range(count)]
+
+        # Opening for reading as well keeps the contents of a file being
+        # resumed.
+        if not self.openFile(QIODevice.ReadWrite):
+            return
+
+        if self.file.size() != totalBytes and not self.file.resize(totalBytes):
+            self.fail("Unable to allocate the file %s: %s" % (self.fileName,
+                    self.file.errorString()))
+            return
+
+        self.bytesReceived = self.bytesResumed = sum(
+                s.received for s in self.segments)
+        self.saveState()
+        self.saveTimer.start()
+
+        for segment in self.segments:
+            if segment.remaining() > 0:
+                self.requestSegment(segment)
+
+        self.finishIfComplete()
+
+    def requestSegment(self, segment):
+        reply = self.request(self.downloadUrl, segment.offset(), segment.end)
+        reply.segment = segment
+        reply.receivedBefore = segment.received
+        reply.readyRead.connect(self.readSegment)
+        reply.finished.connect(self.segmentFinished)
+        segment.reply = reply
+
+    def readSegment(self):
+        reply = self.sender()
+        segment = reply.segment
+
+        if reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) != 206:
+            self.fail("The server stopped sending ranges of the file")
+            return
+
+        data = reply.read(segment.remaining())
+        self.file.seek(segment.offset())
+        self.file.write(data)
+
+        segment.received += len(data)
+        self.bytesReceived += len(data)
+
+    def segmentFinished(self):
+        reply = self.sender()
+        reply.deleteLater()
+
+        segment = reply.segment
+        segment.reply = None
+
+        if not self.running:
+            return
+
+        if reply.error():
+            self.fail(reply.errorString())
+        elif segment.remaining() > 0:
+            # Ask for the rest of a segment that was cut short, as long as
+            # some of it arrived.
+            if segment.received > reply.receivedBefore:
+                self.requestSegment(segment)
+            else:
+                self.fail("The server sent less than was asked for")
+        else:
+            self.finishIfComplete()
+
+    def startStream(self, reply):
+        # A single stream can't be resumed, so any earlier state is stale.
+        QFile.remove(self.stateFileName(self.fileName))
+
+        if not self.openFile(QIODevice.WriteOnly | QIODevice.Truncate):
+            reply.abort()
+            return
+
+        self.stream = reply
+        self.totalBytes = reply.header(QNetworkRequest.ContentLengthHeader)
+        if self.totalBytes is None:
+            self.totalBytes = -1
+
+        self.stream.readyRead.connect(self.readStream)
+        self.stream.finished.connect(self.streamFinished)
+        self.readStream()
+
+    def readStream(self):
+        data = self.stream.readAll()
+        self.file.write(data)
+        self.bytesReceived += len(data)
+
+    def streamFinished(self):
+        reply = self.sender()
+        reply.deleteLater()
+
+        if not self.running:
+            return
+
+        if reply.error():
+            self.fail(reply.errorString())
+        else:
+            self.readStream()
+            self.stream = None
+            self.finish()
+
+    def finishIfComplete(self):
+        if self.running and all(s.remaining() == 0 for s in self.segments):
+            self.finish()
+
+    def finish(self):
+        self.endTime = time.perf_counter()
+        self.stop()
+        QFile.remove(self.stateFileName(self.fileName))
+        self.reportProgress()
+        self.finished.emit()
+
+    def fail(self, message):
+        self.cancel()
+        self.error.emit(message)
+
+    def cancel(self):
+        """Stop the download, keeping what has been fetched if it can be
+        resumed.
+        """
+
+        if not self.running:
+            return
+
+        streaming = self.stream is not None
+
+        self.endTime = time.perf_counter()
+        self.stop()
+
+        if self.segments:
+            self.saveState()
+        elif streaming:
+            self.file.remove()
+
+    def canBeResumed(self):
+        return bool(self.segments)
+
+    def stop(self):
+        self.running = False
+        self.progressTimer.stop()
+        self.saveTimer.stop()
+
+        replies = [self.probe, self.stream] + [s.reply for s in self.segments]
+        for reply in replies:
+            if reply is not None:
+                reply.abort()
+
+        self.probe = self.stream = None
+
+        if self.file.isOpen():
+            self.file.close()
+
+    def saveState(self):
+        if self.file.isOpen():
+            self.file.flush()
+
+        stateFile = QSaveFile(self.stateFileName(self.fileName))
+        if stateFile.open(QIODevice.WriteOnly):
+            stateFile.write(json.dumps({'url': self.url.toString(),
+                    'size': self.totalBytes, 'validator': self.validator,
+                    'segments': [[s.start, s.end, s.received]
+                            for s in self.segments]}).encode())
+            stateFile.commit()
+
+    def reportProgress(self):
+        self.progress.emit(self.bytesReceived, self.totalBytes)
+
+    def report(self):
+        """Return the number of bytes fetched, not counting those that were
+        resumed, and the rate at which they were fetched in MB a second.
+        """
+
+        fetched = self.bytesReceived - self.bytesResumed
+
+        return fetched, fetched / (1024 * 1024) / (self.endTime -
+                self.startTime)
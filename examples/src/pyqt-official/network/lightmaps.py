@@ -44,7 +44,10 @@
 #############################################################################
 
 
+import collections
+import concurrent.futures
 import math
+import time
 
 from PyQt5.QtCore import (pyqtSignal, QBasicTimer, QObject, QPoint, QPointF,
         QRect, QSize, QStandardPaths, Qt, QUrl)
@@ -69,21 +72,6 @@ MAX_MAGNIFIER = 229
 TDIM = 256
 
 
-class Point(QPoint):
-    """QPoint, that is fully qualified as a dict key"""
-    def __init__(self, *par):
-        if par:
-            super(Point, self).__init__(*par)
-        else:
-            super(Point, self).__init__()
-
-    def __hash__(self):
-        return self.x() * 17 ^ self.y()
-
-    def __repr__(self):
-        return "Point(%s, %s)" % (self.x(), self.y())
-
-
 def tileForCoordinate(lat, lng, zoom):
     zn = float(1 << zoom)
     tx = float(lng + 180.0) / 360.0
@@ -108,24 +96,139 @@ def latitudeFromTile(ty, zoom):
     return lng
 
 
+class TileCache(object):
+    """A least recently used cache of tile pixmaps that is bounded by the
+    number of bytes the pixmaps use.
+    """
+
+    def __init__(self, maxBytes=64 * 1024 * 1024):
+        self.maxBytes = maxBytes
+        self.bytes = 0
+        self._pixmaps = collections.OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._pixmaps
+
+    def __len__(self):
+        return len(self._pixmaps)
+
+    @staticmethod
+    def cost(pixmap):
+        return pixmap.width() * pixmap.height() * pixmap.depth() // 8
+
+    def get(self, key):
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+
+        return pixmap
+
+    def insert(self, key, pixmap):
+        old = self._pixmaps.pop(key, None)
+        if old is not None:
+            self.bytes -= self.cost(old)
+
+        self._pixmaps[key] = pixmap
+        self.bytes += self.cost(pixmap)
+
+        while self.bytes > self.maxBytes and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self.bytes -= self.cost(evicted)
+
+
+class TileDecoder(QObject):
+    """Decodes tile images in a pool of worker threads.  The images are
+    converted to the format used by QPixmap so that only the upload to the
+    pixmap remains to be done in the GUI thread.  If the number of threads
+    is 0 then the tiles are decoded in the calling thread.
+    """
+
+    # key, image, time the data arrived, decode time
+    decoded = pyqtSignal(object, QImage, float, float)
+
+    def __init__(self, threads=2, parent=None):
+        super(TileDecoder, self).__init__(parent)
+
+        self.threads = threads
+        self._busy = 0
+
+        if threads > 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(threads)
+        else:
+            self._executor = None
+
+        # this is connected first so that the count is correct by the time
+        # any other slot is invoked
+        self.decoded.connect(self._finished)
+
+    def isFull(self):
+        return self._busy >= max(self.threads, 1)
+
+    def decode(self, key, data, arrived):
+        self._busy += 1
+
+        if self._executor is None:
+            self._decode(key, data, arrived)
+        else:
+            self._executor.submit(self._decode, key, data, arrived)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _decode(self, key, data, arrived):
+        start = time.perf_counter()
+
+        image = QImage.fromData(data)
+        if not image.isNull():
+            if image.hasAlphaChannel():
+                image = image.convertToFormat(
+                        QImage.Format_ARGB32_Premultiplied)
+            else:
+                image = image.convertToFormat(QImage.Format_RGB32)
+
+        self.decoded.emit(key, image, arrived, time.perf_counter() - start)
+
+    def _finished(self):
+        self._busy -= 1
+
+
 class SlippyMap(QObject):
 
     updated = pyqtSignal(QRect)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, cache=None, decodeThreads=2):
         super(SlippyMap, self).__init__(parent)
 
         self._offset = QPoint()
         self._tilesRect = QRect()
-        self._tilePixmaps = {} # Point(x, y) to QPixmap mapping
+        self._cache = cache if cache is not None else TileCache()
+        self._pending = {} # (zoom, x, y) to QNetworkReply mapping
+        self._ready = collections.deque() # downloaded tiles waiting to be decoded
+        self._failed = set()
+        self._panDirection = QPoint()
         self._manager = QNetworkAccessManager()
-        self._url = QUrl()
         # public vars
         self.width = 400
         self.height = 300
         self.zoom = 15
         self.latitude = 59.9138204
         self.longitude = 10.7387413
+        self.maxRequests = 6
+        self.prefetch = True
+        self.tileUrl = 'http://tile.openstreetmap.org/%d/%d/%d.png'
+
+        # instrumentation: the seconds between each of the most recent tiles
+        # arriving and being decoded, and the seconds spent handling tiles
+        # in the GUI thread since takeGuiTime() was last called
+        self.decodeLatencies = collections.deque(maxlen=256)
+        self.guiTime = 0.0
+        self._guiDepth = 0
+        self._guiStart = 0.0
+
+        self._decoder = TileDecoder(decodeThreads, self)
+        self._decoder.decoded.connect(self.handleTileDecoded)
 
         self._emptyTile = QPixmap(TDIM, TDIM)
         self._emptyTile.fill(Qt.lightGray)
@@ -136,6 +239,13 @@ class SlippyMap(QObject):
         self._manager.setCache(cache)
         self._manager.finished.connect(self.handleNetworkData)
 
+    def shutdown(self):
+        """Stop the threads decoding tiles.  Any tiles that arrive afterwards
+        are decoded in the calling thread.
+        """
+
+        self._decoder.shutdown()
+
     def invalidate(self):
         if self.width <= 0 or self.height <= 0:
             return
@@ -149,8 +259,8 @@ class SlippyMap(QObject):
         yp = int(self.height / 2 - (ty - math.floor(ty)) * TDIM)
 
         # first tile vertical and horizontal
-        xa = (xp + TDIM - 1) / TDIM
-        ya = (yp + TDIM - 1) / TDIM
+        xa = int((xp + TDIM - 1) / TDIM)
+        ya = int((yp + TDIM - 1) / TDIM)
         xs = int(tx) - xa
         ys = int(ty) - ya
 
@@ -158,70 +268,180 @@ class SlippyMap(QObject):
         self._offset = QPoint(xp - xa * TDIM, yp - ya * TDIM)
 
         # last tile vertical and horizontal
-        xe = int(tx) + (self.width - xp - 1) / TDIM
-        ye = int(ty) + (self.height - yp - 1) / TDIM
+        xe = int(tx) + int((self.width - xp - 1) / TDIM)
+        ye = int(ty) + int((self.height - yp - 1) / TDIM)
 
         # build a rect
         self._tilesRect = QRect(xs, ys, xe - xs + 1, ye - ys + 1)
 
-        if self._url.isEmpty():
-            self.download()
+        # give tiles that failed another chance now that the view has changed
+        self._failed.clear()
+        self.download()
 
         self.updated.emit(QRect(0, 0, self.width, self.height))
 
     def render(self, p, rect):
         for x in range(self._tilesRect.width()):
             for y in range(self._tilesRect.height()):
-                tp = Point(x + self._tilesRect.left(), y + self._tilesRect.top())
+                tp = QPoint(x + self._tilesRect.left(), y + self._tilesRect.top())
                 box = self.tileRect(tp)
                 if rect.intersects(box):
-                    p.drawPixmap(box, self._tilePixmaps.get(tp, self._emptyTile))
+                    pixmap = self._cache.get((self.zoom, tp.x(), tp.y()))
+                    p.drawPixmap(box, pixmap if pixmap is not None else self._emptyTile)
    
     def pan(self, delta):
         dx = QPointF(delta) / float(TDIM)
         center = tileForCoordinate(self.latitude, self.longitude, self.zoom) - dx
         self.latitude = latitudeFromTile(center.y(), self.zoom)
         self.longitude = longitudeFromTile(center.x(), self.zoom)
+
+        # the tiles about to be exposed are on the opposite side to the drag
+        self._panDirection = QPoint((delta.x() < 0) - (delta.x() > 0),
+                (delta.y() < 0) - (delta.y() > 0))
         self.invalidate()
 
+    def isViewportComplete(self):
+        """Return True if every visible tile has been loaded."""
+        for x in range(self._tilesRect.width()):
+            for y in range(self._tilesRect.height()):
+                key = (self.zoom, x + self._tilesRect.left(), y + self._tilesRect.top())
+                if key not in self._cache and self.isValidTile(key):
+                    return False
+
+        return True
+
+    def isIdle(self):
+        return not self._pending
+
+    def takeGuiTime(self):
+        """Return the time spent handling tiles in the GUI thread since the
+        last call and reset it.
+        """
+        guiTime = self.guiTime
+        self.guiTime = 0.0
+
+        return guiTime
+
+    def _beginGuiWork(self):
+        # the handlers can be nested when decoding in the GUI thread so only
+        # the outermost one is timed
+        self._guiDepth += 1
+        if self._guiDepth == 1:
+            self._guiStart = time.perf_counter()
+
+    def _endGuiWork(self):
+        self._guiDepth -= 1
+        if self._guiDepth == 0:
+            self.guiTime += time.perf_counter() - self._guiStart
+
     # slots
     def handleNetworkData(self, reply):
-        img = QImage()
-        tp = Point(reply.request().attribute(QNetworkRequest.User))
-        url = reply.url()
-        if not reply.error():
-            if img.load(reply, None):
-                self._tilePixmaps[tp] = QPixmap.fromImage(img)
-        reply.deleteLater()
-        self.updated.emit(self.tileRect(tp))
-
-        # purge unused tiles
-        bound = self._tilesRect.adjusted(-2, -2, 2, 2)
-        for tp in list(self._tilePixmaps.keys()):
-            if not bound.contains(tp):
-                del self._tilePixmaps[tp]
-        self.download()
+        self._beginGuiWork()
+        try:
+            key = reply.request().attribute(QNetworkRequest.User)
+
+            if reply.error():
+                self._pending.pop(key, None)
+                self._failed.add(key)
+                self.download()
+            else:
+                # the tile stays pending until it has been decoded so that
+                # new requests are held back while the decoder is busy
+                self._pending[key] = None
+                self._ready.append((key, bytes(reply.readAll()),
+                        time.perf_counter()))
+                self.decodeNext()
+
+            reply.deleteLater()
+        finally:
+            self._endGuiWork()
+
+    def handleTileDecoded(self, key, image, arrived, decodeTime):
+        self._beginGuiWork()
+        try:
+            self.decodeLatencies.append(time.perf_counter() - arrived)
+            self._pending.pop(key, None)
+
+            if image.isNull():
+                self._failed.add(key)
+            else:
+                self._cache.insert(key, QPixmap.fromImage(image))
 
-    def download(self):
-        grab = None
-        for x in range(self._tilesRect.width()):
-            for y in range(self._tilesRect.height()):
-                tp = Point(self._tilesRect.topLeft() + QPoint(x, y))
-                if tp not in self._tilePixmaps:
-                    grab = QPoint(tp)
-                    break
+                zoom, x, y = key
+                if zoom == self.zoom:
+                    self.updated.emit(self.tileRect(QPoint(x, y)))
 
-        if grab is None:
-            self._url = QUrl()
-            return
+            self.decodeNext()
+            self.download()
+        finally:
+            self._endGuiWork()
+
+    def decodeNext(self):
+        while self._ready and not self._decoder.isFull():
+            self._decoder.decode(*self._ready.popleft())
 
-        path = 'http://tile.openstreetmap.org/%d/%d/%d.png' % (self.zoom, grab.x(), grab.y())
-        self._url = QUrl(path)
-        request = QNetworkRequest()
-        request.setUrl(self._url)
-        request.setRawHeader(b'User-Agent', b'Nokia (PyQt) Graphics Dojo 1.0')
-        request.setAttribute(QNetworkRequest.User, grab)
-        self._manager.get(request)
+    def download(self):
+        for key in self.wantedTiles():
+            if len(self._pending) >= self.maxRequests:
+                break
+
+            zoom, x, y = key
+            request = QNetworkRequest()
+            request.setUrl(QUrl(self.tileUrl % (zoom, x, y)))
+            request.setRawHeader(b'User-Agent', b'Nokia (PyQt) Graphics Dojo 1.0')
+            request.setAttribute(QNetworkRequest.User, key)
+            self._pending[key] = self._manager.get(request)
+
+    def wantedTiles(self):
+        """Return the tiles that still need to be fetched in the order they
+        should be requested.  The visible tiles come first, nearest the
+        center of the view first.  When prefetching they are followed by the
+        tiles about to be exposed in the direction of panning and by the
+        tiles of the next zoom level that would be visible after zooming in.
+        """
+        center = tileForCoordinate(self.latitude, self.longitude, self.zoom)
+        cx = center.x()
+        cy = center.y()
+        left = self._tilesRect.left()
+        top = self._tilesRect.top()
+        right = left + self._tilesRect.width() - 1
+        bottom = top + self._tilesRect.height() - 1
+
+        def nearest(tiles, cx, cy):
+            return sorted(tiles, key=lambda t: (t[0] + 0.5 - cx) ** 2 + (t[1] + 0.5 - cy) ** 2)
+
+        visible = [(x, y) for x in range(left, right + 1)
+                for y in range(top, bottom + 1)]
+        wanted = [(self.zoom, x, y) for x, y in nearest(visible, cx, cy)]
+
+        if self.prefetch:
+            ring = []
+            if self._panDirection.x():
+                x = left - 1 if self._panDirection.x() < 0 else right + 1
+                ring.extend((x, y) for y in range(top - 1, bottom + 2))
+            if self._panDirection.y():
+                y = top - 1 if self._panDirection.y() < 0 else bottom + 1
+                ring.extend((x, y) for x in range(left - 1, right + 2))
+            wanted.extend((self.zoom, x, y) for x, y in nearest(ring, cx, cy))
+
+            # zooming in shows the center half of the view at twice the scale
+            halfWidth = self.width / 2.0 / TDIM
+            halfHeight = self.height / 2.0 / TDIM
+            nx = 2 * cx
+            ny = 2 * cy
+            nextZoom = [(x, y)
+                    for x in range(int(math.floor(nx - halfWidth)), int(math.floor(nx + halfWidth)) + 1)
+                    for y in range(int(math.floor(ny - halfHeight)), int(math.floor(ny + halfHeight)) + 1)]
+            wanted.extend((self.zoom + 1, x, y) for x, y in nearest(nextZoom, nx, ny))
+
+        return [key for key in wanted if key not in self._cache and
+                key not in self._pending and key not in self._failed and
+                self.isValidTile(key)]
+
+    @staticmethod
+    def isValidTile(key):
+        zoom, x, y = key
+        return 0 <= x < (1 << zoom) and 0 <= y < (1 << zoom)
 
     def tileRect(self, tp):
         t = tp - self._tilesRect.topLeft()
@@ -239,16 +459,30 @@ class LightMaps(QWidget):
         self.snapped = False
         self.zoomed = False
         self.invert = False
-        self._normalMap = SlippyMap(self)
-        self._largeMap = SlippyMap(self)
+        # both maps share the tiles so that prefetched tiles of the next zoom
+        # level are available to the magnifier
+        self._tileCache = TileCache()
+        self._normalMap = SlippyMap(self, self._tileCache)
+        self._largeMap = SlippyMap(self, self._tileCache)
         self.pressPos = QPoint()
         self.dragPos = QPoint()
         self.tapTimer = QBasicTimer()
         self.zoomPixmap = QPixmap()
         self.maskPixmap = QPixmap()
+        # the GUI thread time spent on each of the most recent frames,
+        # including the time spent handling the tiles shown in the frame
+        self.frameTimes = collections.deque(maxlen=100)
         self._normalMap.updated.connect(self.updateMap)
         self._largeMap.updated.connect(self.update)
  
+    def shutdown(self):
+        self._normalMap.shutdown()
+        self._largeMap.shutdown()
+
+    def closeEvent(self, event):
+        self.shutdown()
+        super(LightMaps, self).closeEvent(event)
+
     def setCenter(self, lat, lng):
         self._normalMap.latitude = lat
         self._normalMap.longitude = lng
@@ -283,6 +517,8 @@ class LightMaps(QWidget):
         self._largeMap.invalidate()
 
     def paintEvent(self, event):
+        start = time.perf_counter()
+
         p = QPainter()
         p.begin(self)
         self._normalMap.render(p, event.rect())
@@ -350,6 +586,9 @@ class LightMaps(QWidget):
             p.fillRect(event.rect(), Qt.white)
             p.end()
 
+        self.frameTimes.append(time.perf_counter() - start +
+                self._normalMap.takeGuiTime() + self._largeMap.takeGuiTime())
+
     def timerEvent(self, event):
         if not self.zoomed:
             self.activateZoom()
@@ -455,6 +694,11 @@ class MapZoom(QMainWindow):
         menu.addAction(self.nightModeAction)
         menu.addAction(self.osmAction)
 
+    def closeEvent(self, event):
+        # the map is not sent a close event of its own
+        self.map_.shutdown()
+        super(MapZoom, self).closeEvent(event)
+
     # slots
     def chooseOslo(self):
         self.map_.setCenter(59.9138204, 10.7387413)
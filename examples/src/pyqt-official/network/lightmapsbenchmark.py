@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure how long the LightMaps example takes to fill its view.
+
+The tiles are served by a local stand-in for the OpenStreetMap tile server
+that adds a fixed latency to every request to simulate network round trips.
+"""
+
+
+import http.server
+import random
+import statistics
+import sys
+import threading
+import time
+
+from PyQt5.QtCore import (QBuffer, QByteArray, QCommandLineOption,
+        QCommandLineParser, QElapsedTimer, QEventLoop, QIODevice, QLineF,
+        QPoint, QStandardPaths, Qt)
+from PyQt5.QtGui import QImage, QPainter, QPen
+from PyQt5.QtWidgets import QApplication
+
+from lightmaps import SlippyMap, TDIM
+
+
+class TileRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+
+        self.server.requestCount += 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(self.server.tileData)))
+        self.end_headers()
+        self.wfile.write(self.server.tileData)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TileServer(http.server.ThreadingHTTPServer):
+    """A tile server on a free local port that serves the same tile for
+    every request after a delay.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, tileData, latency):
+        super(TileServer, self).__init__(('127.0.0.1', 0), TileRequestHandler)
+
+        self.tileData = tileData
+        self.latency = latency
+        self.requestCount = 0
+
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tileUrl(self):
+        return 'http://127.0.0.1:%d/%%d/%%d/%%d.png' % self.server_address[1]
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def createTileData():
+    # something resembling a street map so that the tile takes a realistic
+    # time to decode
+    image = QImage(TDIM, TDIM, QImage.Format_RGB32)
+    image.fill(Qt.lightGray)
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    rand = random.Random(0)
+    for i in range(200):
+        painter.setPen(QPen(Qt.white if i % 4 else Qt.darkYellow,
+                rand.uniform(1, 6)))
+        painter.drawLine(QLineF(rand.uniform(0, TDIM), rand.uniform(0, TDIM),
+                rand.uniform(0, TDIM), rand.uniform(0, TDIM)))
+    painter.end()
+
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+
+    return bytes(data)
+
+
+def waitFor(app, condition, timeout=60000, guiTimes=None, slippyMap=None):
+    elapsed = QElapsedTimer()
+    elapsed.start()
+
+    while not condition():
+        if elapsed.elapsed() > timeout:
+            raise RuntimeError("timed out waiting for tiles")
+
+        app.processEvents(QEventLoop.AllEvents, 10)
+
+        # each pass of the event loop stands in for a frame
+        if guiTimes is not None:
+            guiTimes.append(slippyMap.takeGuiTime())
+
+    return elapsed.elapsed()
+
+
+def createMap(server, width, height, maxRequests, prefetch, decodeThreads=2):
+    # Each map gets its own server so that the URLs, and so the tiles in the
+    # disk cache, are never shared between runs.
+    slippyMap = SlippyMap(decodeThreads=decodeThreads)
+    slippyMap.tileUrl = server.tileUrl()
+    slippyMap.width = width
+    slippyMap.height = height
+    slippyMap.maxRequests = maxRequests
+    slippyMap.prefetch = prefetch
+
+    return slippyMap
+
+
+if __name__ == '__main__':
+
+    app = QApplication(sys.argv)
+    QStandardPaths.setTestModeEnabled(True)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure the time taken by LightMaps to fill its view.")
+    parser.addHelpOption()
+    latencyOption = QCommandLineOption(['l', 'latency'],
+            "Delay each tile by <ms> milliseconds.", 'ms', '50')
+    parser.addOption(latencyOption)
+    sizeOption = QCommandLineOption(['s', 'size'],
+            "Use a view of <width>x<height> pixels.", 'size', '1920x1080')
+    parser.addOption(sizeOption)
+    parser.process(app)
+
+    latency = int(parser.value(latencyOption)) / 1000.0
+    width, height = (int(v) for v in parser.value(sizeOption).split('x'))
+    tileData = createTileData()
+
+    print("%dx%d view, %dms per tile" % (width, height, latency * 1000))
+    print("%-12s %8s %14s %14s %14s" % ("requests", "tiles", "full view",
+            "pan", "pan+prefetch"))
+
+    for maxRequests in (1, 2, 4, 6, 12):
+        server = TileServer(tileData, latency)
+        slippyMap = createMap(server, width, height, maxRequests, False)
+        slippyMap.invalidate()
+        fullTime = waitFor(app, slippyMap.isViewportComplete)
+        tiles = server.requestCount
+        slippyMap.shutdown()
+
+        # Time to fill the view after panning one tile width, first without
+        # and then with prefetching.  The map is given time to go idle after
+        # a small pan in the same direction so that prefetching can finish.
+        panTimes = []
+        for prefetch in (False, True):
+            slippyMap = createMap(server, width, height, maxRequests,
+                    prefetch)
+            slippyMap.invalidate()
+            waitFor(app, slippyMap.isViewportComplete)
+            slippyMap.pan(QPoint(-1, 0))
+            waitFor(app, slippyMap.isIdle)
+
+            slippyMap.pan(QPoint(-TDIM, 0))
+            panTimes.append(waitFor(app, slippyMap.isViewportComplete))
+
+            waitFor(app, slippyMap.isIdle)
+            slippyMap.shutdown()
+
+        server.stop()
+
+        print("%-12d %8d %12dms %12dms %12dms" % (maxRequests, tiles,
+                fullTime, panTimes[0], panTimes[1]))
+
+    # Decode the tiles of a view at the highest request limit so that many
+    # tiles arrive at once.
+    print()
+    print("%-12s %14s %14s %14s %14s" % ("decoders", "latency",
+            "95% latency", "gui/frame", "max gui/frame"))
+
+    for decodeThreads in (0, 1, 2, 4):
+        server = TileServer(tileData, 0)
+        slippyMap = createMap(server, width, height, 12, False, decodeThreads)
+        guiTimes = []
+        slippyMap.invalidate()
+        waitFor(app, slippyMap.isViewportComplete, guiTimes=guiTimes,
+                slippyMap=slippyMap)
+        waitFor(app, slippyMap.isIdle)
+        slippyMap.shutdown()
+        server.stop()
+
+        latencies = sorted(slippyMap.decodeLatencies)
+        guiTimes = [t for t in guiTimes if t] or [0.0]
+
+        print("%-12d %12.2fms %12.2fms %12.2fms %12.2fms" % (decodeThreads,
+                statistics.mean(latencies) * 1000,
+                latencies[int(len(latencies) * 0.95)] * 1000,
+                statistics.mean(guiTimes) * 1000, max(guiTimes) * 1000))
@@ -42,24 +42,198 @@
 #############################################################################
 
 
-from PyQt5.QtCore import QByteArray, Qt
+import time
+
+from PyQt5.QtCore import (pyqtSignal, QByteArray, QCommandLineOption,
+        QCommandLineParser, QObject, Qt, QTimer)
 from PyQt5.QtWidgets import (QApplication, QDialog, QDialogButtonBox, QLabel,
         QMessageBox, QProgressBar, QPushButton, QVBoxLayout)
-from PyQt5.QtNetwork import QHostAddress, QTcpServer, QTcpSocket
+from PyQt5.QtNetwork import (QAbstractSocket, QHostAddress, QTcpServer,
+        QTcpSocket)
+
+
+class LoopbackTransfer(QObject):
+    """Send a number of bytes over one or more loopback connections as fast
+    as the sockets will take them.
+
+    Every write is of the same preallocated payload and received data is
+    skipped rather than read, so that the time is spent in the sockets
+    rather than allocating buffers.  Progress is reported updateRate times
+    a second rather than for every write and read.  Buffer sizes of 0 leave
+    the system's defaults.
+    """
+
+    progress = pyqtSignal('qint64', 'qint64')
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, totalBytes, payloadSize, streams=1,
+            sendBufferSize=0, receiveBufferSize=0, updateRate=10,
+            parent=None):
+        super(LoopbackTransfer, self).__init__(parent)
+
+        self.totalBytes = totalBytes
+        self.payloadSize = payloadSize
+        self.streams = streams
+        self.sendBufferSize = sendBufferSize
+        self.receiveBufferSize = receiveBufferSize
+
+        self.payload = QByteArray(payloadSize, '@')
+        self.bytesWritten = 0
+        self.bytesReceived = 0
+        self.clients = []
+        self.serverConnections = []
+        self.startTime = self.endTime = 0.0
+        self.startCpuTime = self.endCpuTime = 0.0
+
+        self.tcpServer = QTcpServer(self)
+        self.tcpServer.newConnection.connect(self.acceptConnections)
+
+        self.progressTimer = QTimer(self)
+        self.progressTimer.setInterval(int(1000 / updateRate))
+        self.progressTimer.timeout.connect(self.reportProgress)
+
+    def start(self):
+        """Start the transfer, returning False if the server couldn't
+        listen.
+        """
+
+        if not self.tcpServer.listen(QHostAddress.LocalHost):
+            return False
+
+        self.bytesWritten = 0
+        self.bytesReceived = 0
+        self.startTime = time.perf_counter()
+        self.startCpuTime = time.process_time()
+        self.progressTimer.start()
+
+        # The bytes are shared between the streams as evenly as possible.
+        for stream in range(self.streams):
+            tcpClient = QTcpSocket(self)
+            tcpClient.bytesToSend = (self.totalBytes // self.streams +
+                    (stream < self.totalBytes % self.streams))
+            tcpClient.connected.connect(self.startTransfer)
+            tcpClient.bytesWritten.connect(self.updateClientProgress)
+            tcpClient.error.connect(self.socketError)
+            self.clients.append(tcpClient)
+            tcpClient.connectToHost(QHostAddress(QHostAddress.LocalHost),
+                    self.tcpServer.serverPort())
+
+        return True
+
+    def errorString(self):
+        return self.tcpServer.errorString()
+
+    def setBufferSize(self, socket, option, size):
+        if size > 0:
+            socket.setSocketOption(option, size)
+
+    def acceptConnections(self):
+        while self.tcpServer.hasPendingConnections():
+            connection = self.tcpServer.nextPendingConnection()
+            connection.readyRead.connect(self.updateServerProgress)
+            connection.error.connect(self.socketError)
+            self.setBufferSize(connection,
+                    QAbstractSocket.ReceiveBufferSizeSocketOption,
+                    self.receiveBufferSize)
+            self.serverConnections.append(connection)
+
+        if len(self.serverConnections) == self.streams:
+            self.tcpServer.close()
+
+    def startTransfer(self):
+        tcpClient = self.sender()
+
+        # The option is set once connected, as not every platform keeps
+        # options set before connecting.
+        self.setBufferSize(tcpClient,
+                QAbstractSocket.SendBufferSizeSocketOption,
+                self.sendBufferSize)
+        self.writePayloads(tcpClient)
+
+    def writePayloads(self, tcpClient):
+        # Keep a payload buffered so that the socket never waits for Python.
+        while tcpClient.bytesToSend > 0 and \
+                tcpClient.bytesToWrite() < self.payloadSize:
+            if tcpClient.bytesToSend >= self.payloadSize:
+                written = tcpClient.write(self.payload)
+            else:
+                written = tcpClient.write(
+                        self.payload.left(tcpClient.bytesToSend))
+
+            if written <= 0:
+                break
+
+            tcpClient.bytesToSend -= written
+
+    def updateClientProgress(self, numBytes):
+        self.bytesWritten += numBytes
+        self.writePayloads(self.sender())
+
+    def updateServerProgress(self):
+        connection = self.sender()
+        self.bytesReceived += connection.skip(connection.bytesAvailable())
+
+        if self.bytesReceived == self.totalBytes:
+            self.finish()
+
+    def finish(self):
+        self.endTime = time.perf_counter()
+        self.endCpuTime = time.process_time()
+        self.stop()
+        self.reportProgress()
+        self.finished.emit()
+
+    def reportProgress(self):
+        self.progress.emit(self.bytesWritten, self.bytesReceived)
+
+    def socketError(self, socketError):
+        if socketError == QTcpSocket.RemoteHostClosedError:
+            return
+
+        errorString = self.sender().errorString()
+        self.stop()
+        self.error.emit(errorString)
+
+    def stop(self):
+        self.progressTimer.stop()
+        self.tcpServer.close()
+
+        for socket in self.clients + self.serverConnections:
+            socket.blockSignals(True)
+            socket.abort()
+            socket.deleteLater()
+
+        self.clients = []
+        self.serverConnections = []
+
+    def report(self):
+        """Return the throughput in MB a second and the CPU time used by
+        the process in seconds for each MB.
+        """
+
+        megabytes = self.totalBytes / (1024 * 1024)
+
+        return (megabytes / (self.endTime - self.startTime),
+                (self.endCpuTime - self.startCpuTime) / megabytes)
 
 
 class Dialog(QDialog):
     TotalBytes = 50 * 1024 * 1024
     PayloadSize = 65536
 
-    def __init__(self, parent=None):
+    def __init__(self, totalBytes=TotalBytes, payloadSize=PayloadSize,
+            streams=1, sendBufferSize=0, receiveBufferSize=0, updateRate=10,
+            parent=None):
         super(Dialog, self).__init__(parent)
 
-        self.tcpServer = QTcpServer()
-        self.tcpClient = QTcpSocket()
-        self.bytesToWrite = 0
-        self.bytesWritten = 0
-        self.bytesReceived = 0
+        self.totalBytes = totalBytes
+        self.payloadSize = payloadSize
+        self.streams = streams
+        self.sendBufferSize = sendBufferSize
+        self.receiveBufferSize = receiveBufferSize
+        self.updateRate = updateRate
+        self.transfer = None
 
         self.clientProgressBar = QProgressBar()
         self.clientStatusLabel = QLabel("Client ready")
@@ -75,10 +249,6 @@ class Dialog(QDialog):
 
         self.startButton.clicked.connect(self.start)
         self.quitButton.clicked.connect(self.close)
-        self.tcpServer.newConnection.connect(self.acceptConnection)
-        self.tcpClient.connected.connect(self.startTransfer)
-        self.tcpClient.bytesWritten.connect(self.updateClientProgress)
-        self.tcpClient.error.connect(self.displayError)
 
         mainLayout = QVBoxLayout()
         mainLayout.addWidget(self.clientProgressBar)
@@ -97,71 +267,82 @@ class Dialog(QDialog):
 
         QApplication.setOverrideCursor(Qt.WaitCursor)
 
-        self.bytesWritten = 0
-        self.bytesReceived = 0
+        self.transfer = LoopbackTransfer(self.totalBytes, self.payloadSize,
+                self.streams, self.sendBufferSize, self.receiveBufferSize,
+                self.updateRate, self)
+        self.transfer.progress.connect(self.updateProgress)
+        self.transfer.finished.connect(self.transferFinished)
+        self.transfer.error.connect(self.displayError)
 
-        while not self.tcpServer.isListening() and not self.tcpServer.listen():
+        while not self.transfer.start():
             ret = QMessageBox.critical(self, "Loopback",
-                    "Unable to start the test: %s." % self.tcpServer.errorString(),
+                    "Unable to start the test: %s." % self.transfer.errorString(),
                     QMessageBox.Retry | QMessageBox.Cancel)
             if ret == QMessageBox.Cancel:
+                self.reset()
                 return
 
+        # Progress bars hold ints, so they count in KB.
+        self.clientProgressBar.setMaximum(self.totalBytes // 1024)
+        self.serverProgressBar.setMaximum(self.totalBytes // 1024)
         self.serverStatusLabel.setText("Listening")
         self.clientStatusLabel.setText("Connecting")
 
-        self.tcpClient.connectToHost(QHostAddress(QHostAddress.LocalHost), self.tcpServer.serverPort())
-
-    def acceptConnection(self):
-        self.tcpServerConnection = self.tcpServer.nextPendingConnection()
-        self.tcpServerConnection.readyRead.connect(self.updateServerProgress)
-        self.tcpServerConnection.error.connect(self.displayError)
-
-        self.serverStatusLabel.setText("Accepted connection")
-        self.tcpServer.close()
-
-    def startTransfer(self):
-        self.bytesToWrite = Dialog.TotalBytes - self.tcpClient.write(QByteArray(Dialog.PayloadSize, '@'))
-        self.clientStatusLabel.setText("Connected")
-
-    def updateServerProgress(self):
-        self.bytesReceived += self.tcpServerConnection.bytesAvailable()
-        self.tcpServerConnection.readAll()
-
-        self.serverProgressBar.setMaximum(Dialog.TotalBytes)
-        self.serverProgressBar.setValue(self.bytesReceived)
-        self.serverStatusLabel.setText("Received %dMB" % (self.bytesReceived / (1024 * 1024)))
-
-        if self.bytesReceived == Dialog.TotalBytes:
-            self.tcpServerConnection.close()
-            self.startButton.setEnabled(True)
-            QApplication.restoreOverrideCursor()
+    def updateProgress(self, bytesWritten, bytesReceived):
+        self.clientProgressBar.setValue(bytesWritten // 1024)
+        self.clientStatusLabel.setText("Sent %dMB" % (bytesWritten / (1024 * 1024)))
 
-    def updateClientProgress(self, numBytes):
-        self.bytesWritten += numBytes
-        if self.bytesToWrite > 0:
-            self.bytesToWrite -= self.tcpClient.write(QByteArray(
-                                        min(self.bytesToWrite, Dialog.PayloadSize), '@'))
+        self.serverProgressBar.setValue(bytesReceived // 1024)
+        self.serverStatusLabel.setText("Received %dMB" % (bytesReceived / (1024 * 1024)))
 
-        self.clientProgressBar.setMaximum(Dialog.TotalBytes)
-        self.clientProgressBar.setValue(self.bytesWritten)
-        self.clientStatusLabel.setText("Sent %dMB" % (self.bytesWritten / (1024 * 1024)))
+    def transferFinished(self):
+        throughput, cpuTime = self.transfer.report()
+        self.serverStatusLabel.setText("Received %dMB at %.0fMB/s, using "
+                "%.2fms of CPU time for each MB" % (
+                self.totalBytes / (1024 * 1024), throughput, cpuTime * 1000))
+        self.reset()
 
-    def displayError(self, socketError):
-        if socketError == QTcpSocket.RemoteHostClosedError:
-            return
+    def reset(self):
+        self.transfer.deleteLater()
+        self.transfer = None
+        self.startButton.setEnabled(True)
+        QApplication.restoreOverrideCursor()
 
+    def displayError(self, errorString):
         QMessageBox.information(self, "Network error",
-                "The following error occured: %s." % self.tcpClient.errorString())
+                "The following error occured: %s." % errorString)
 
-        self.tcpClient.close()
-        self.tcpServer.close()
         self.clientProgressBar.reset()
         self.serverProgressBar.reset()
         self.clientStatusLabel.setText("Client ready")
         self.serverStatusLabel.setText("Server ready")
-        self.startButton.setEnabled(True)
-        QApplication.restoreOverrideCursor()
+        self.reset()
+
+
+def addTransferOptions(parser):
+    """Add the options that tune a transfer to a command line parser and
+    return them.
+    """
+
+    options = (
+        QCommandLineOption(['t', 'total'],
+                "Send <MB> in total.", 'MB', '50'),
+        QCommandLineOption(['p', 'payload'],
+                "Write <bytes> at a time.", 'bytes', str(Dialog.PayloadSize)),
+        QCommandLineOption(['s', 'streams'],
+                "Send over <count> connections at once.", 'count', '1'),
+        QCommandLineOption('send-buffer',
+                "Use a socket send buffer of <bytes>.", 'bytes', '0'),
+        QCommandLineOption('receive-buffer',
+                "Use a socket receive buffer of <bytes>.", 'bytes', '0'),
+        QCommandLineOption(['u', 'update-rate'],
+                "Report progress <count> times a second.", 'count', '10'),
+    )
+
+    for option in options:
+        parser.addOption(option)
+
+    return options
 
 
 if __name__ == '__main__':
@@ -169,6 +350,18 @@ if __name__ == '__main__':
     import sys
 
     app = QApplication(sys.argv)
-    dialog = Dialog()
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription("Send data over loopback connections.")
+    parser.addHelpOption()
+    options = addTransferOptions(parser)
+    parser.process(app)
+
+    total, payload, streams, sendBuffer, receiveBuffer, updateRate = [
+            parser.value(option) for option in options]
+
+    dialog = Dialog(int(float(total) * 1024 * 1024), int(payload),
+            int(streams), int(sendBuffer), int(receiveBuffer),
+            float(updateRate))
     dialog.show()
     sys.exit(dialog.exec_())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure the throughput of the loopback example, and the CPU time it
+uses, for combinations of payload sizes, numbers of streams and socket
+buffer sizes.
+
+The transfer is also measured as it used to be done, with a new payload
+allocated for every write, received data read into a new buffer, and
+progress reported for every write and read.  No widgets are shown, so the
+cost of updating them isn't included.
+"""
+
+
+import itertools
+import sys
+
+from PyQt5.QtCore import QByteArray, QCommandLineParser, QCoreApplication
+
+from loopback import addTransferOptions, LoopbackTransfer
+
+
+class AllocatingTransfer(LoopbackTransfer):
+    """The transfer as it was done before the payload was preallocated and
+    progress updates were throttled.
+    """
+
+    def writePayloads(self, tcpClient):
+        if tcpClient.bytesToSend > 0:
+            tcpClient.bytesToSend -= tcpClient.write(QByteArray(
+                    min(tcpClient.bytesToSend, self.payloadSize), '@'))
+
+    def updateClientProgress(self, numBytes):
+        super(AllocatingTransfer, self).updateClientProgress(numBytes)
+        self.reportProgress()
+
+    def updateServerProgress(self):
+        connection = self.sender()
+        self.bytesReceived += connection.bytesAvailable()
+        connection.readAll()
+        self.reportProgress()
+
+        if self.bytesReceived == self.totalBytes:
+            self.finish()
+
+
+def measure(app, transferClass, *args):
+    transfer = transferClass(*args)
+    transfer.updates = 0
+    transfer.progress.connect(lambda bytesWritten, bytesReceived:
+            setattr(transfer, 'updates', transfer.updates + 1))
+    transfer.finished.connect(app.quit)
+    errors = []
+    transfer.error.connect(errors.append)
+    transfer.error.connect(app.quit)
+
+    if not transfer.start():
+        sys.exit("Unable to start the test: %s." % transfer.errorString())
+
+    app.exec_()
+
+    if errors:
+        sys.exit("The following error occured: %s." % errors[0])
+
+    return transfer.report() + (transfer.updates, )
+
+
+def integers(value):
+    return [int(v) for v in value.split(',')]
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure the throughput of loopback connections. The payload, "
+            "streams and buffer options take comma separated lists of "
+            "values, every combination of which is measured.")
+    parser.addHelpOption()
+    options = addTransferOptions(parser)
+    parser.process(app)
+
+    total, payloads, streams, sendBuffers, receiveBuffers, updateRate = [
+            parser.value(option) for option in options]
+    totalBytes = int(float(total) * 1024 * 1024)
+    updateRate = float(updateRate)
+
+    print("%-12s %9s %7s %11s %11s %8s %12s %8s" % ("transfer", "payload",
+            "streams", "send buf", "recv buf", "MB/s", "CPU ms/MB",
+            "updates"))
+
+    for payload in integers(payloads):
+        rate, cpuTime, updates = measure(app, AllocatingTransfer,
+                totalBytes, payload)
+        print("%-12s %9d %7d %11s %11s %8.0f %12.3f %8d" % ("allocating",
+                payload, 1, "default", "default", rate, cpuTime * 1000,
+                updates))
+
+    for payload, count, sendBuffer, receiveBuffer in itertools.product(
+            integers(payloads), integers(streams), integers(sendBuffers),
+            integers(receiveBuffers)):
+        rate, cpuTime, updates = measure(app, LoopbackTransfer, totalBytes,
+                payload, count, sendBuffer, receiveBuffer, updateRate)
+        print("%-12s %9d %7d %11s %11s %8.0f %12.3f %8d" % ("preallocated",
+                payload, count, sendBuffer or "default",
+                receiveBuffer or "default", rate, cpuTime * 1000, updates))
@@ -44,14 +44,29 @@
 
 import random
 
-from PyQt5.QtCore import (pyqtSignal, QByteArray, QDataStream, QIODevice,
-        QThread)
+from PyQt5.QtCore import (pyqtSignal, pyqtSlot, QByteArray,
+        QCommandLineOption, QCommandLineParser, QDataStream, QIODevice,
+        QObject, QThread)
 from PyQt5.QtWidgets import (QApplication, QDialog, QHBoxLayout, QLabel,
         QMessageBox, QPushButton, QVBoxLayout)
 from PyQt5.QtNetwork import (QHostAddress, QNetworkInterface, QTcpServer,
         QTcpSocket)
 
 
+def fortuneBlock(fortune):
+    """Return a fortune encoded as the block that is sent to a client."""
+
+    block = QByteArray()
+    outstr = QDataStream(block, QIODevice.WriteOnly)
+    outstr.setVersion(QDataStream.Qt_4_0)
+    outstr.writeUInt16(0)
+    outstr.writeQString(fortune)
+    outstr.device().seek(0)
+    outstr.writeUInt16(block.size() - 2)
+
+    return block
+
+
 class FortuneThread(QThread):
     error = pyqtSignal(QTcpSocket.SocketError)
 
@@ -67,19 +82,49 @@ class FortuneThread(QThread):
             self.error.emit(tcpSocket.error())
             return
 
-        block = QByteArray()
-        outstr = QDataStream(block, QIODevice.WriteOnly)
-        outstr.setVersion(QDataStream.Qt_4_0)
-        outstr.writeUInt16(0)
-        outstr.writeQString(self.text)
-        outstr.device().seek(0)
-        outstr.writeUInt16(block.size() - 2)
-
-        tcpSocket.write(block)
+        tcpSocket.write(fortuneBlock(self.text))
         tcpSocket.disconnectFromHost()
         tcpSocket.waitForDisconnected()
 
 
+class FortuneWorker(QObject):
+    """Serve connections in the event loop of the thread the worker is moved
+    to, with blocks of fortunes that are already encoded.
+    """
+
+    error = pyqtSignal(QTcpSocket.SocketError)
+    connectionFinished = pyqtSignal(int)
+    serveRequested = pyqtSignal(object)
+
+    def __init__(self, index, blocks, parent=None):
+        super(FortuneWorker, self).__init__(parent)
+
+        self.index = index
+        self.blocks = blocks
+
+        # The signal is emitted in the thread of the server, so the
+        # connection is queued.
+        self.serveRequested.connect(self.serve)
+
+    @pyqtSlot(object)
+    def serve(self, socketDescriptor):
+        tcpSocket = QTcpSocket(self)
+        if not tcpSocket.setSocketDescriptor(socketDescriptor):
+            self.error.emit(tcpSocket.error())
+            tcpSocket.deleteLater()
+            self.connectionFinished.emit(self.index)
+            return
+
+        tcpSocket.disconnected.connect(self.socketDisconnected)
+        tcpSocket.write(random.choice(self.blocks))
+        tcpSocket.disconnectFromHost()
+
+    @pyqtSlot()
+    def socketDisconnected(self):
+        self.sender().deleteLater()
+        self.connectionFinished.emit(self.index)
+
+
 class FortuneServer(QTcpServer):
     FORTUNES = (
         "You've been leading a dog's life. Stay off the furniture.",
@@ -90,26 +135,84 @@ class FortuneServer(QTcpServer):
         "You cannot kill time without injuring eternity.",
         "Computers are not intelligent. They only think they are.")
 
+    def __init__(self, workers=0, parent=None):
+        """Serve each connection in a thread of its own or, if workers isn't
+        0, with a pool of that number of threads.
+        """
+
+        super(FortuneServer, self).__init__(parent)
+
+        self.threads = []
+        self.workers = []
+        self.loads = []
+
+        if workers:
+            blocks = [fortuneBlock(fortune) for fortune in self.FORTUNES]
+
+            for index in range(workers):
+                thread = QThread()
+                worker = FortuneWorker(index, blocks)
+                worker.moveToThread(thread)
+                worker.connectionFinished.connect(self.connectionFinished)
+                thread.start()
+
+                self.threads.append(thread)
+                self.workers.append(worker)
+                self.loads.append(0)
+
     def incomingConnection(self, socketDescriptor):
+        if self.workers:
+            # Hand the connection to the worker with the fewest.
+            index = self.loads.index(min(self.loads))
+            self.loads[index] += 1
+            self.workers[index].serveRequested.emit(socketDescriptor)
+            return
+
         fortune = self.FORTUNES[random.randint(0, len(self.FORTUNES) - 1)]
 
         thread = FortuneThread(socketDescriptor, fortune, self)
         thread.finished.connect(thread.deleteLater)
         thread.start()
 
+    def connectionFinished(self, index):
+        # The counts are reset when the server is closed, but connections
+        # that were being served may still report that they have finished.
+        if self.loads[index] > 0:
+            self.loads[index] -= 1
+
+    def listen(self, address=QHostAddress.Any, port=0):
+        # The threads of a server that has been closed are started again.
+        for thread in self.threads:
+            thread.start()
+
+        return super(FortuneServer, self).listen(address, port)
+
+    def close(self):
+        """Stop listening and stop the threads of the pool.  The server can
+        listen again afterwards.
+        """
+
+        super(FortuneServer, self).close()
+
+        for thread in self.threads:
+            thread.quit()
+            thread.wait()
+
+        self.loads = [0] * len(self.workers)
+
 
 class Dialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, workers=0, port=0, parent=None):
         super(Dialog, self).__init__(parent)
 
-        self.server = FortuneServer()
+        self.server = FortuneServer(workers)
 
         statusLabel = QLabel()
         statusLabel.setWordWrap(True)
         quitButton = QPushButton("Quit")
         quitButton.setAutoDefault(False)
 
-        if not self.server.listen():
+        if not self.server.listen(QHostAddress.Any, port):
             QMessageBox.critical(self, "Threaded Fortune Server",
                     "Unable to start the server: %s." % self.server.errorString())
             self.close()
@@ -140,12 +243,31 @@ class Dialog(QDialog):
 
         self.setWindowTitle("Threaded Fortune Server")
 
+    def done(self, result):
+        self.server.close()
+        super(Dialog, self).done(result)
+
 
 if __name__ == '__main__':
 
     import sys
 
     app = QApplication(sys.argv)
-    dialog = Dialog()
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription("Threaded Fortune Server")
+    parser.addHelpOption()
+    workersOption = QCommandLineOption(['w', 'workers'],
+            "Serve connections with a pool of <count> threads, or with a "
+            "thread for each connection if it is 0.", 'count',
+            str(QThread.idealThreadCount()))
+    parser.addOption(workersOption)
+    portOption = QCommandLineOption(['p', 'port'],
+            "Listen on <port> rather than on any free port.", 'port', '0')
+    parser.addOption(portOption)
+    parser.process(app)
+
+    dialog = Dialog(int(parser.value(workersOption)),
+            int(parser.value(portOption)))
     dialog.show()
     sys.exit(dialog.exec_())
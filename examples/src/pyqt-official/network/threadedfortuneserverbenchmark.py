@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure how many connections a second the threaded fortune server can
+serve, with a thread for each connection and with a pool of threads.
+
+The server is run in a separate process, started by this script with the
+--serve option, so that the load generator doesn't compete with it for the
+Python interpreter.
+"""
+
+
+import subprocess
+import sys
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser,
+        QCoreApplication, QThread, QTimer)
+from PyQt5.QtNetwork import QHostAddress
+
+from fortuneload import FortuneLoad
+from threadedfortuneserver import FortuneServer
+
+
+def serve(app, workers):
+    server = FortuneServer(workers)
+    if not server.listen(QHostAddress.LocalHost, 0):
+        sys.exit("Unable to start the server: %s." % server.errorString())
+
+    # Tell the benchmark which port to connect to.
+    print(server.serverPort(), flush=True)
+    app.exec_()
+    server.close()
+
+
+def measure(app, workers, connections, duration):
+    server = subprocess.Popen([sys.executable, __file__, '--serve',
+            '--workers', str(workers)], stdout=subprocess.PIPE,
+            universal_newlines=True)
+
+    try:
+        port = int(server.stdout.readline())
+
+        load = FortuneLoad('127.0.0.1', port, connections, duration)
+        load.finished.connect(app.quit)
+        QTimer.singleShot(0, load.start)
+        app.exec_()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return load.report()
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure the connections a second served by the threaded "
+            "fortune server.")
+    parser.addHelpOption()
+    workersOption = QCommandLineOption(['w', 'workers'],
+            "Use a pool of <count> threads.", 'count',
+            str(QThread.idealThreadCount()))
+    parser.addOption(workersOption)
+    connectionsOption = QCommandLineOption(['c', 'connections'],
+            "Use the comma separated numbers of concurrent <connections>.",
+            'connections', '1,10,100')
+    parser.addOption(connectionsOption)
+    durationOption = QCommandLineOption(['d', 'duration'],
+            "Generate load for <seconds> for each measurement.", 'seconds',
+            '5')
+    parser.addOption(durationOption)
+    serveOption = QCommandLineOption('serve',
+            "Run the server, printing the port it is listening on.")
+    parser.addOption(serveOption)
+    parser.process(app)
+
+    workers = int(parser.value(workersOption))
+
+    if parser.isSet(serveOption):
+        serve(app, workers)
+        sys.exit()
+
+    duration = float(parser.value(durationOption))
+
+    print("%11s %-22s %14s %12s %12s %7s" % ("connections", "server",
+            "connections/s", "median (ms)", "99th % (ms)", "errors"))
+
+    for connections in [int(c) for c in
+            parser.value(connectionsOption).split(',')]:
+        for name, poolSize in (("thread per connection", 0),
+                ("pool of %d threads" % workers, workers)):
+            rate, median, p99, errors, invalid = measure(app, poolSize,
+                    connections, duration)
+            print("%11d %-22s %14.0f %12.2f %12.2f %7d" % (connections,
+                    name, rate, median * 1000, p99 * 1000, errors + invalid))
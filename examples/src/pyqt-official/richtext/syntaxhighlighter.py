@@ -42,10 +42,14 @@
 #############################################################################
 
 
-from PyQt5.QtCore import QFile, QRegExp, Qt
-from PyQt5.QtGui import QFont, QSyntaxHighlighter, QTextCharFormat
+import re
+import time
+
+from PyQt5.QtCore import QFile, QPoint, Qt, QTimer
+from PyQt5.QtGui import (QFont, QSyntaxHighlighter, QTextBlockUserData,
+        QTextCharFormat, QTextCursor)
 from PyQt5.QtWidgets import (QApplication, QFileDialog, QMainWindow, QMenu,
-        QMessageBox, QTextEdit)
+        QMessageBox, QPlainTextEdit)
 
 
 class MainWindow(QMainWindow):
@@ -94,10 +98,11 @@ class MainWindow(QMainWindow):
         font.setFixedPitch(True)
         font.setPointSize(10)
 
-        self.editor = QTextEdit()
+        self.editor = QPlainTextEdit()
         self.editor.setFont(font)
 
         self.highlighter = Highlighter(self.editor.document())
+        self.highlighter.setView(self.editor)
 
     def setupFileMenu(self):
         fileMenu = QMenu("&File", self)
@@ -115,82 +120,343 @@ class MainWindow(QMainWindow):
         helpMenu.addAction("About &Qt", QApplication.instance().aboutQt)
 
 
+class BlockData(QTextBlockUserData):
+    """The formats found in the text of a block, so that they needn't be
+    found again while the text and the state it starts in don't change.
+    """
+
+    __slots__ = ('textHash', 'inComment', 'tokens', 'state')
+
+    def __init__(self, textHash, inComment, tokens, state):
+        super(BlockData, self).__init__()
+
+        self.textHash = textHash
+        self.inComment = inComment
+        self.tokens = tokens
+        self.state = state
+
+
 class Highlighter(QSyntaxHighlighter):
+    # The states of a block.  Blocks that haven't been highlighted yet have
+    # no state.
+    Pending = -1
+    Normal = 0
+    InComment = 1
+
+    # Added to the state of a block highlighted before the blocks above it,
+    # when whether it started in a comment had to be guessed.
+    Guessed = 2
+
+    # Changes that add more than this many characters are highlighted from
+    # the visible blocks onwards in the background.
+    DeferThreshold = 20000
+
+    # When a change alters the state of more than this many blocks, such as
+    # when a comment is opened, the rest are highlighted in the background.
+    CascadeLimit = 1000
+
+    # The time in milliseconds spent on each chunk of background
+    # highlighting, and the number of blocks done between checking it.
+    ChunkTime = 20
+    ChunkBlocks = 256
+
+    # Tokens refer to their formats by these indexes into the formats of the
+    # highlighter, so that they are tuples of numbers alone.  Such tuples
+    # aren't tracked by the garbage collector, which would otherwise visit
+    # every cached token of a large document.
+    (KeywordFormat, ClassFormat, SingleLineCommentFormat, QuotationFormat,
+            FunctionFormat, MultiLineCommentFormat) = range(6)
+
     def __init__(self, parent=None):
-        super(Highlighter, self).__init__(parent)
+        # The document is set once the highlighter is ready to see changes
+        # to it before QSyntaxHighlighter does.
+        super(Highlighter, self).__init__(None)
 
         keywordFormat = QTextCharFormat()
         keywordFormat.setForeground(Qt.darkBlue)
         keywordFormat.setFontWeight(QFont.Bold)
 
-        keywordPatterns = ["\\bchar\\b", "\\bclass\\b", "\\bconst\\b",
-                "\\bdouble\\b", "\\benum\\b", "\\bexplicit\\b", "\\bfriend\\b",
-                "\\binline\\b", "\\bint\\b", "\\blong\\b", "\\bnamespace\\b",
-                "\\boperator\\b", "\\bprivate\\b", "\\bprotected\\b",
-                "\\bpublic\\b", "\\bshort\\b", "\\bsignals\\b", "\\bsigned\\b",
-                "\\bslots\\b", "\\bstatic\\b", "\\bstruct\\b",
-                "\\btemplate\\b", "\\btypedef\\b", "\\btypename\\b",
-                "\\bunion\\b", "\\bunsigned\\b", "\\bvirtual\\b", "\\bvoid\\b",
-                "\\bvolatile\\b"]
-
-        self.highlightingRules = [(QRegExp(pattern), keywordFormat)
-                for pattern in keywordPatterns]
+        keywords = ["char", "class", "const", "double", "enum", "explicit",
+                "friend", "inline", "int", "long", "namespace", "operator",
+                "private", "protected", "public", "short", "signals",
+                "signed", "slots", "static", "struct", "template", "typedef",
+                "typename", "union", "unsigned", "virtual", "void",
+                "volatile"]
 
         classFormat = QTextCharFormat()
         classFormat.setFontWeight(QFont.Bold)
         classFormat.setForeground(Qt.darkMagenta)
-        self.highlightingRules.append((QRegExp("\\bQ[A-Za-z]+\\b"),
-                classFormat))
+
+        # The keywords and class names are whole words so they can't
+        # overlap and are found with a single expression.
+        self.wordExpression = re.compile(
+                r"\b(?:(%s)|(Q[A-Za-z]+))\b" % "|".join(keywords))
+        self.wordFormats = (None, self.KeywordFormat, self.ClassFormat)
 
         singleLineCommentFormat = QTextCharFormat()
         singleLineCommentFormat.setForeground(Qt.red)
-        self.highlightingRules.append((QRegExp("//[^\n]*"),
-                singleLineCommentFormat))
 
-        self.multiLineCommentFormat = QTextCharFormat()
-        self.multiLineCommentFormat.setForeground(Qt.red)
+        multiLineCommentFormat = QTextCharFormat()
+        multiLineCommentFormat.setForeground(Qt.red)
 
         quotationFormat = QTextCharFormat()
         quotationFormat.setForeground(Qt.darkGreen)
-        self.highlightingRules.append((QRegExp("\".*\""), quotationFormat))
 
         functionFormat = QTextCharFormat()
         functionFormat.setFontItalic(True)
         functionFormat.setForeground(Qt.blue)
-        self.highlightingRules.append((QRegExp("\\b[A-Za-z0-9_]+(?=\\()"),
-                functionFormat))
-
-        self.commentStartExpression = QRegExp("/\\*")
-        self.commentEndExpression = QRegExp("\\*/")
-
-    def highlightBlock(self, text):
-        for pattern, format in self.highlightingRules:
-            expression = QRegExp(pattern)
-            index = expression.indexIn(text)
-            while index >= 0:
-                length = expression.matchedLength()
-                self.setFormat(index, length, format)
-                index = expression.indexIn(text, index + length)
-
-        self.setCurrentBlockState(0)
-
-        startIndex = 0
-        if self.previousBlockState() != 1:
-            startIndex = self.commentStartExpression.indexIn(text)
 
+        # These may overlap, later rules taking precedence.
+        self.highlightingRules = [
+                (re.compile(r"//[^\n]*"), self.SingleLineCommentFormat),
+                (re.compile(r'".*"'), self.QuotationFormat),
+                (re.compile(r"\b[A-Za-z0-9_]+(?=\()"), self.FunctionFormat)]
+
+        self.formats = (keywordFormat, classFormat, singleLineCommentFormat,
+                quotationFormat, functionFormat, multiLineCommentFormat)
+
+        self.view = None
+        self.highlighting = False
+        self.skipping = False
+        self.cascadeLength = 0
+        self.deferring = False
+        self.passCursor = None
+        self.passLimit = 0
+        self.visibleBlocks = (0, -1)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.highlightChunk)
+
+        if parent is not None:
+            self.setParent(parent)
+            self.setDocument(parent)
+
+    def setDocument(self, document):
+        old = self.document()
+        if old is not None:
+            old.contentsChange.disconnect(self.documentChanging)
+            old.contentsChange.disconnect(self.documentChanged)
+
+        self.deferring = False
+        self.timer.stop()
+
+        # QSyntaxHighlighter highlights changed blocks as soon as it is told
+        # of a change, so a large change must be noticed before that and a
+        # second connection notices when it is over.
+        if document is not None:
+            document.contentsChange.connect(self.documentChanging)
+
+        super(Highlighter, self).setDocument(document)
+
+        if document is not None:
+            document.contentsChange.connect(self.documentChanged)
+
+            if document.characterCount() > self.DeferThreshold:
+                self.defer(document.firstBlock())
+
+    def setView(self, view):
+        """Highlight the blocks visible in a view of the document before the
+        rest of a large change.
+        """
+
+        self.view = view
+        view.verticalScrollBar().valueChanged.connect(self.viewScrolled)
+
+    def viewScrolled(self):
+        if self.deferring:
+            self.timer.start()
+
+    def documentChanging(self, position, charsRemoved, charsAdded):
+        if self.highlighting:
+            return
+
+        self.cascadeLength = 0
+
+        if self.deferring:
+            # Blocks before the background pass may have been added or
+            # removed.
+            self.passLimit = self.passCursor.blockNumber()
+
+        if charsAdded > self.DeferThreshold:
+            self.skipping = True
+            block = self.document().findBlock(position)
+            if not self.deferring or block.blockNumber() < self.passLimit:
+                self.defer(block)
+
+    def documentChanged(self, position, charsRemoved, charsAdded):
+        self.skipping = False
+
+    def defer(self, block):
+        """Highlight the document from a block onwards in the background."""
+
+        self.deferring = True
+        self.passCursor = QTextCursor(block)
+        self.passLimit = block.blockNumber()
+        self.timer.start()
+
+    def updateVisibleBlocks(self):
+        viewport = self.view.viewport()
+        first = self.view.cursorForPosition(QPoint(0, 0)).blockNumber()
+        last = self.view.cursorForPosition(QPoint(viewport.width() - 1,
+                viewport.height() - 1)).blockNumber()
+        self.visibleBlocks = (first, last)
+
+    def highlightChunk(self):
+        deadline = time.perf_counter() + self.ChunkTime / 1000.0
+        document = self.document()
+
+        self.highlighting = True
+
+        if self.view is not None:
+            self.updateVisibleBlocks()
+            first, last = self.visibleBlocks
+            block = document.findBlockByNumber(first)
+            for number in range(first, last + 1):
+                if block.userState() == self.Pending:
+                    self.rehighlightBlock(block)
+                block = block.next()
+
+        # Continue the pass through the document from where it stopped.
+        # Rehighlighting a block carries on to the next block for as long
+        # as their states change, so only the first pending or guessed block
+        # of a run is rehighlighted here.
+        block = self.passCursor.block()
+        self.passLimit = block.blockNumber()
+        while block.isValid() and time.perf_counter() < deadline:
+            self.passLimit += self.ChunkBlocks
+            for i in range(self.ChunkBlocks):
+                if not block.isValid():
+                    break
+
+                state = block.userState()
+                if (state == self.Pending or state >= self.Guessed or
+                        block == self.passCursor.block()):
+                    self.rehighlightBlock(block)
+
+                block = block.next()
+
+        self.highlighting = False
+
+        if block.isValid():
+            self.passCursor = QTextCursor(block)
+            self.passLimit = block.blockNumber()
+        else:
+            self.deferring = False
+            self.visibleBlocks = (0, -1)
+            self.timer.stop()
+
+    def isHighlightable(self, block):
+        number = block.blockNumber()
+        first, last = self.visibleBlocks
+
+        return number < self.passLimit or first <= number <= last
+
+    def tokenize(self, text, inComment):
+        """Return the formats of a block of text as a tuple of (start, length,
+        format index) tuples, and the state of the block.
+        """
+
+        wordFormats = self.wordFormats
+        tokens = [(match.start(), match.end() - match.start(),
+                wordFormats[match.lastindex])
+                for match in self.wordExpression.finditer(text)]
+
+        for expression, format in self.highlightingRules:
+            tokens.extend((match.start(), match.end() - match.start(), format)
+                    for match in expression.finditer(text))
+
+        state = self.Normal
+
+        startIndex = 0 if inComment else text.find('/*')
         while startIndex >= 0:
-            endIndex = self.commentEndExpression.indexIn(text, startIndex)
+            endIndex = text.find('*/', startIndex)
 
             if endIndex == -1:
-                self.setCurrentBlockState(1)
+                state = self.InComment
                 commentLength = len(text) - startIndex
             else:
-                commentLength = endIndex - startIndex + self.commentEndExpression.matchedLength()
+                commentLength = endIndex - startIndex + 2
+
+            tokens.append((startIndex, commentLength,
+                    self.MultiLineCommentFormat))
+            startIndex = text.find('/*', startIndex + commentLength)
+
+        # Formats are set in UTF-16 code units rather than characters.
+        if tokens and not text.isascii() and max(text) > '\uffff':
+            offsets = [0]
+            for ch in text:
+                offsets.append(offsets[-1] + (2 if ch > '\uffff' else 1))
+
+            tokens = [(offsets[start], offsets[start + length] - offsets[start],
+                    format) for start, length, format in tokens]
+
+        return tuple(tokens), state
+
+    def keepBlock(self, text):
+        """Leave a block that will be highlighted later as it was, so that
+        QSyntaxHighlighter doesn't carry on to the next block.  A block whose
+        text or starting state has changed is marked as pending instead.
+        """
+
+        previous = self.previousBlockState()
+        data = self.currentBlockUserData()
+        if (data is not None and data.textHash == hash(text) and
+                (previous == self.Pending or data.inComment == (previous in
+                        (self.InComment, self.InComment + self.Guessed)))):
+            formats = self.formats
+            for start, length, format in data.tokens:
+                self.setFormat(start, length, formats[format])
+        else:
+            self.setCurrentBlockState(self.Pending)
 
-            self.setFormat(startIndex, commentLength,
-                    self.multiLineCommentFormat)
-            startIndex = self.commentStartExpression.indexIn(text,
-                    startIndex + commentLength);
+    def highlightBlock(self, text):
+        if self.skipping:
+            self.setCurrentBlockState(self.Pending)
+            return
+
+        block = self.currentBlock()
+
+        # Leave the rest of a long run of changed blocks to the background
+        # pass, moving the pass back if it has already gone past them.
+        if not self.highlighting:
+            self.cascadeLength += 1
+            if self.cascadeLength > self.CascadeLimit and (
+                    not self.deferring or
+                    block.blockNumber() < self.passLimit):
+                if self.view is not None:
+                    self.updateVisibleBlocks()
+
+                self.defer(block)
+
+        if self.deferring and not self.isHighlightable(block):
+            self.keepBlock(text)
+            return
+
+        previous = self.previousBlockState()
+        guessed = previous >= self.Guessed or (
+                previous == self.Pending and block.previous().isValid())
+        inComment = previous in (self.InComment,
+                self.InComment + self.Guessed)
+
+        textHash = hash(text)
+        data = self.currentBlockUserData()
+        if (data is not None and data.textHash == textHash and
+                data.inComment == inComment):
+            tokens, state = data.tokens, data.state
+        else:
+            tokens, state = self.tokenize(text, inComment)
+            self.setCurrentBlockUserData(BlockData(textHash, inComment,
+                    tokens, state))
+
+        formats = self.formats
+        for start, length, format in tokens:
+            self.setFormat(start, length, formats[format])
+
+        if guessed:
+            state += self.Guessed
+
+        self.setCurrentBlockState(state)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure how the syntax highlighter copes with large source files.
+
+A C++ source file of a given number of lines is generated and opened in a
+view, first with the Highlighter of the example and then with the QRegExp
+based highlighter it replaced.  For each the time that opening the file
+blocks the event loop is reported, then the time until the visible blocks
+are highlighted and until the whole file is, with the longest time that the
+event loop was blocked while the rest of the file was highlighted in the
+background.  Finally the time taken by edits in the middle of the file and
+by opening and closing a comment near its start is reported.
+"""
+
+
+import random
+import sys
+import time
+
+from PyQt5.QtCore import QCommandLineOption, QCommandLineParser, QRegExp, Qt
+from PyQt5.QtGui import QFont, QSyntaxHighlighter, QTextCharFormat, QTextCursor
+from PyQt5.QtWidgets import QApplication, QPlainTextEdit
+
+from syntaxhighlighter import Highlighter
+
+
+class RegExpHighlighter(QSyntaxHighlighter):
+    """The highlighter as it was before the rules were precompiled and the
+    highlighting of large changes was deferred.
+    """
+
+    def __init__(self, parent=None):
+        super(RegExpHighlighter, self).__init__(parent)
+
+        keywordFormat = QTextCharFormat()
+        keywordFormat.setForeground(Qt.darkBlue)
+        keywordFormat.setFontWeight(QFont.Bold)
+
+        keywordPatterns = ["\\bchar\\b", "\\bclass\\b", "\\bconst\\b",
+                "\\bdouble\\b", "\\benum\\b", "\\bexplicit\\b", "\\bfriend\\b",
+                "\\binline\\b", "\\bint\\b", "\\blong\\b", "\\bnamespace\\b",
+                "\\boperator\\b", "\\bprivate\\b", "\\bprotected\\b",
+                "\\bpublic\\b", "\\bshort\\b", "\\bsignals\\b", "\\bsigned\\b",
+                "\\bslots\\b", "\\bstatic\\b", "\\bstruct\\b",
+                "\\btemplate\\b", "\\btypedef\\b", "\\btypename\\b",
+                "\\bunion\\b", "\\bunsigned\\b", "\\bvirtual\\b", "\\bvoid\\b",
+                "\\bvolatile\\b"]
+
+        self.highlightingRules = [(QRegExp(pattern), keywordFormat)
+                for pattern in keywordPatterns]
+
+        classFormat = QTextCharFormat()
+        classFormat.setFontWeight(QFont.Bold)
+        classFormat.setForeground(Qt.darkMagenta)
+        self.highlightingRules.append((QRegExp("\\bQ[A-Za-z]+\\b"),
+                classFormat))
+
+        singleLineCommentFormat = QTextCharFormat()
+        singleLineCommentFormat.setForeground(Qt.red)
+        self.highlightingRules.append((QRegExp("//[^\n]*"),
+                singleLineCommentFormat))
+
+        self.multiLineCommentFormat = QTextCharFormat()
+        self.multiLineCommentFormat.setForeground(Qt.red)
+
+        quotationFormat = QTextCharFormat()
+        quotationFormat.setForeground(Qt.darkGreen)
+        self.highlightingRules.append((QRegExp("\".*\""), quotationFormat))
+
+        functionFormat = QTextCharFormat()
+        functionFormat.setFontItalic(True)
+        functionFormat.setForeground(Qt.blue)
+        self.highlightingRules.append((QRegExp("\\b[A-Za-z0-9_]+(?=\\()"),
+                functionFormat))
+
+        self.commentStartExpression = QRegExp("/\\*")
+        self.commentEndExpression = QRegExp("\\*/")
+
+    def highlightBlock(self, text):
+        for pattern, format in self.highlightingRules:
+            expression = QRegExp(pattern)
+            index = expression.indexIn(text)
+            while index >= 0:
+                length = expression.matchedLength()
+                self.setFormat(index, length, format)
+                index = expression.indexIn(text, index + length)
+
+        self.setCurrentBlockState(0)
+
+        startIndex = 0
+        if self.previousBlockState() != 1:
+            startIndex = self.commentStartExpression.indexIn(text)
+
+        while startIndex >= 0:
+            endIndex = self.commentEndExpression.indexIn(text, startIndex)
+
+            if endIndex == -1:
+                self.setCurrentBlockState(1)
+                commentLength = len(text) - startIndex
+            else:
+                commentLength = endIndex - startIndex + self.commentEndExpression.matchedLength()
+
+            self.setFormat(startIndex, commentLength,
+                    self.multiLineCommentFormat)
+            startIndex = self.commentStartExpression.indexIn(text,
+                    startIndex + commentLength);
+
+
+def generateSource(lineCount, seed=0):
+    """Return C++ source of the given number of lines made of classes and
+    functions with random names.  The only block comment is at the start, so
+    that a comment opened after it runs to the end of the source.
+    """
+
+    rand = random.Random(seed)
+
+    def identifier():
+        return ''.join(rand.choice('abcdefghijklmnopqrstuvwxyz')
+                for i in range(rand.randint(3, 10)))
+
+    types = ["int", "long", "double", "char *", "unsigned int", "QString",
+            "QStringList", "QWidget *", "const QVariant &"]
+
+    lines = ['/*', ' * Generated by the syntax highlighter benchmark.', ' */',
+            '', '#include <QtCore>', '#include <QtWidgets>', '']
+    while len(lines) < lineCount:
+        className = 'Q' + identifier().capitalize()
+        lines.append('// %s %s.' % (className, identifier()))
+        lines.append('class %s : public QObject' % className)
+        lines.append('{')
+        lines.append('public:')
+        for i in range(rand.randint(2, 6)):
+            lines.append('    virtual %s %s(%s %s) const;' % (
+                    rand.choice(types), identifier(), rand.choice(types),
+                    identifier()))
+        lines.append('};')
+        lines.append('')
+
+        for i in range(rand.randint(2, 6)):
+            lines.append('static %s %s(%s %s)' % (rand.choice(types),
+                    identifier(), rand.choice(types), identifier()))
+            lines.append('{')
+            for j in range(rand.randint(3, 12)):
+                name = identifier()
+                choice = rand.random()
+                if choice < 0.2:
+                    lines.append('    // %s %s' % (identifier(), name))
+                elif choice < 0.35:
+                    lines.append('    qDebug() << "%s" << %s; // %s' % (
+                            name, identifier(), identifier()))
+                else:
+                    lines.append('    %s %s = %s(%s, %d);' % (
+                            rand.choice(types), name, identifier(),
+                            identifier(), rand.randint(0, 1000)))
+            lines.append('    return %s;' % identifier())
+            lines.append('}')
+            lines.append('')
+
+    return '\n'.join(lines[:lineCount])
+
+
+def isDeferring(highlighter):
+    return getattr(highlighter, 'deferring', False)
+
+
+def finishHighlighting(app, highlighter):
+    """Process events until the highlighter has finished and return the
+    time taken and the longest time spent in a single pass of the event loop.
+    """
+
+    start = time.perf_counter()
+    longest = 0.0
+    while isDeferring(highlighter):
+        passStart = time.perf_counter()
+        app.processEvents()
+        longest = max(longest, time.perf_counter() - passStart)
+
+    return time.perf_counter() - start, longest
+
+
+def measureEdit(app, highlighter, edit):
+    """Return the time that an edit blocks the event loop for, and the time
+    until the highlighting of the document is finished.
+    """
+
+    start = time.perf_counter()
+    edit()
+    blocked = time.perf_counter() - start
+    finishHighlighting(app, highlighter)
+
+    return blocked, time.perf_counter() - start
+
+
+def measure(app, highlighterClass, text):
+    editor = QPlainTextEdit()
+    editor.resize(800, 600)
+    highlighter = highlighterClass(editor.document())
+    if hasattr(highlighter, 'setView'):
+        highlighter.setView(editor)
+    editor.show()
+    app.processEvents()
+
+    results = []
+
+    start = time.perf_counter()
+    editor.setPlainText(text)
+    results.append(time.perf_counter() - start)
+
+    # Show the middle of the file, as if it had been opened at a bookmark.
+    editor.verticalScrollBar().setValue(
+            editor.verticalScrollBar().maximum() // 2)
+    start = time.perf_counter()
+    app.processEvents()
+    results.append(time.perf_counter() - start)
+
+    finished, longest = finishHighlighting(app, highlighter)
+    results.append(results[-1] + finished)
+    results.append(longest)
+
+    document = editor.document()
+    middle = QTextCursor(document.findBlockByNumber(
+            document.blockCount() // 2))
+    middle.movePosition(QTextCursor.EndOfBlock)
+    editor.setTextCursor(middle)
+    results.append(measureEdit(app, highlighter,
+            lambda: middle.insertText('x'))[0])
+
+    top = QTextCursor(document.findBlockByNumber(3))
+
+    def removeComment():
+        top.movePosition(QTextCursor.PreviousCharacter,
+                QTextCursor.KeepAnchor, 2)
+        top.removeSelectedText()
+
+    results.extend(measureEdit(app, highlighter,
+            lambda: top.insertText('/*')))
+    results.extend(measureEdit(app, highlighter, removeComment))
+
+    editor.close()
+
+    return results
+
+
+if __name__ == '__main__':
+
+    app = QApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure how the syntax highlighter copes with large files.")
+    parser.addHelpOption()
+    linesOption = QCommandLineOption(['l', 'lines'],
+            "Use files of the comma separated numbers of <lines>.", 'lines',
+            '20000,200000')
+    parser.addOption(linesOption)
+    regExpOption = QCommandLineOption(['r', 'regexp-lines'],
+            "Use the QRegExp highlighter for files of up to <lines> lines.",
+            'lines', '200000')
+    parser.addOption(regExpOption)
+    parser.process(app)
+
+    regExpLines = int(parser.value(regExpOption))
+
+    print("All times are in seconds.  Opening and closing a comment is "
+            "timed until the")
+    print("event loop is free again, then until the file is highlighted.")
+    print()
+    print("%7s %-7s %6s %8s %8s %8s %7s %13s %13s" % ("lines", "mode",
+            "open", "visible", "finished", "longest", "type",
+            "open comment", "close comment"))
+
+    for lineCount in [int(l) for l in parser.value(linesOption).split(',')]:
+        text = generateSource(lineCount)
+
+        modes = [("chunked", Highlighter)]
+        if lineCount <= regExpLines:
+            modes.append(("qregexp", RegExpHighlighter))
+
+        for name, highlighterClass in modes:
+            (opened, visible, finished, longest, typed, commentOpened,
+                    commentOpenedFinished, commentClosed,
+                    commentClosedFinished) = measure(app, highlighterClass,
+                            text)
+            print("%7d %-7s %6.2f %8.2f %8.2f %8.3f %7.3f %6.2f/%-6.2f "
+                    "%6.2f/%-6.2f" % (lineCount, name, opened, visible,
+                    finished, longest, typed, commentOpened,
+                    commentOpenedFinished, commentClosed,
+                    commentClosedFinished))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Zero-copy conversions between QImage and NumPy arrays.
+
+The pixels of a QImage are exposed as a writable NumPy view of the image's own
+buffer, and a QImage can be constructed around an existing NumPy buffer.
+Neither conversion copies any pixel data.
+"""
+
+
+import numpy
+
+from PyQt5.QtGui import QImage, QPixelFormat
+
+
+class ImageArray(numpy.ndarray):
+    """A NumPy array that is a view of the pixels of a QImage.  It (and every
+    view derived from it) keeps a reference to the image so that the buffer is
+    not freed while the array is alive.
+    """
+
+    image = None
+
+    def __array_finalize__(self, obj):
+        self.image = getattr(obj, 'image', None)
+
+
+def imageToArray(image, writable=True):
+    """Return a view of the pixels of a QImage.
+
+    32-bit formats give a (height, width) array of uint32 in the same layout
+    as QImage.pixel(), 16-bit formats a (height, width) array of uint16, 8-bit
+    formats a (height, width) array of uint8 and 24-bit formats a (height,
+    width, 3) array of uint8.  The view has the same stride as the image's
+    bytesPerLine() so any padding at the end of each scan line is skipped.
+
+    Getting a writable view detaches the image.  Copies of the image made
+    afterwards (including those implicitly made by queued signals) share the
+    buffer until one of them is painted on, so they will see any changes made
+    through the view.  A read-only view does not detach the image.
+    """
+
+    depth = image.depth()
+
+    if depth == 32:
+        dtype, channels = numpy.uint32, None
+    elif depth == 24:
+        dtype, channels = numpy.uint8, 3
+    elif depth == 16:
+        dtype, channels = numpy.uint16, None
+    elif depth == 8:
+        dtype, channels = numpy.uint8, None
+    else:
+        raise ValueError("unsupported image depth %d" % depth)
+
+    height = image.height()
+    width = image.width()
+    bytesPerLine = image.bytesPerLine()
+
+    bits = image.bits() if writable else image.constBits()
+    bits.setsize(bytesPerLine * height)
+
+    itemSize = numpy.dtype(dtype).itemsize
+    if channels is None:
+        shape = (height, width)
+        strides = (bytesPerLine, itemSize)
+    else:
+        shape = (height, width, channels)
+        strides = (bytesPerLine, channels * itemSize, itemSize)
+
+    pixels = numpy.ndarray(shape, dtype=dtype, buffer=bits, strides=strides)
+    pixels = pixels.view(ImageArray)
+    pixels.image = image
+
+    return pixels
+
+
+def arrayToImage(pixels, format=None):
+    """Return a QImage that uses the buffer of a NumPy array as its pixels.
+
+    A (height, width) array of uint32 gives an RGB32 image, a (height, width)
+    array of uint8 a Grayscale8 image, a (height, width, 3) array of uint8 an
+    RGB888 image and a (height, width, 4) array of uint8 an RGBA8888 image.
+    Another format with the same pixel size may be given explicitly.  Each
+    scan line of the array must be contiguous but the lines themselves may
+    be padded.
+
+    The image keeps a reference to the array.  Copies of the image made with
+    QImage(image) share the buffer but not the reference, so use
+    image.copy() for an image that must outlive the array.
+    """
+
+    if pixels.ndim == 2:
+        channels = 1
+    elif pixels.ndim == 3:
+        channels = pixels.shape[2]
+    else:
+        raise ValueError("pixels must be a 2 or 3 dimensional array")
+
+    if format is None:
+        if pixels.dtype == numpy.uint32 and channels == 1:
+            format = QImage.Format_RGB32
+        elif pixels.dtype == numpy.uint8 and channels == 1:
+            format = QImage.Format_Grayscale8
+        elif pixels.dtype == numpy.uint8 and channels == 3:
+            format = QImage.Format_RGB888
+        elif pixels.dtype == numpy.uint8 and channels == 4:
+            format = QImage.Format_RGBA8888
+        else:
+            raise ValueError("no default format for a %s array with %d "
+                    "channels" % (pixels.dtype, channels))
+
+    pixelStride = pixels.dtype.itemsize * channels
+    if pixels.strides[1] != pixelStride or (channels > 1 and pixels.strides[2] != pixels.dtype.itemsize):
+        raise ValueError("the scan lines of pixels must be contiguous")
+
+    # The address of the first pixel is used rather than the array itself as
+    # a view with padded scan lines does not expose a contiguous buffer.
+    height, width = pixels.shape[:2]
+    image = QImage(pixels.__array_interface__['data'][0], width, height,
+            pixels.strides[0], format)
+    image.pixels = pixels
+
+    return image
+
+
+def grayArray(image):
+    """Return a (height, width) array of uint8 with the qGray() value of each
+    pixel of a QImage.  As with QImage.pixel(), the colours of an image with
+    a premultiplied format are used premultiplied.
+    """
+
+    if image.pixelFormat().premultiplied() == QPixelFormat.Premultiplied:
+        format = QImage.Format_ARGB32_Premultiplied
+    elif image.format() == QImage.Format_RGB32:
+        format = QImage.Format_RGB32
+    else:
+        format = QImage.Format_ARGB32
+
+    if image.format() != format:
+        image = image.convertToFormat(format)
+
+    pixels = numpy.asarray(imageToArray(image, writable=False))
+    red = (pixels >> 16) & 0xff
+    green = (pixels >> 8) & 0xff
+    blue = pixels & 0xff
+
+    return ((red * 11 + green * 16 + blue * 5) // 32).astype(numpy.uint8)
+
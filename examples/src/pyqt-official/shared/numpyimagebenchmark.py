@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Compare per-pixel QImage access with bulk access through numpyimage."""
+
+
+import sys
+import time
+
+import numpy
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser,
+        QCoreApplication)
+from PyQt5.QtGui import qGray, QImage, qRgb
+
+from numpyimage import arrayToImage, grayArray, imageToArray
+
+
+def perPixelWrite(image):
+    for y in range(image.height()):
+        for x in range(image.width()):
+            image.setPixel(x, y, qRgb(x & 0xff, y & 0xff, 0))
+
+
+def bulkWrite(image):
+    pixels = imageToArray(image)
+    xs = numpy.arange(image.width(), dtype=numpy.uint32) & 0xff
+    ys = numpy.arange(image.height(), dtype=numpy.uint32) & 0xff
+    pixels[:, :] = 0xff000000 | (xs[numpy.newaxis, :] << 16) | (ys[:, numpy.newaxis] << 8)
+
+
+def perPixelGray(image):
+    return [[qGray(image.pixel(x, y)) for x in range(image.width())]
+            for y in range(image.height())]
+
+
+def bulkGray(image):
+    return grayArray(image)
+
+
+def copyFromBytes(pixels):
+    height, width = pixels.shape
+    return QImage(pixels.tobytes(), width, height, QImage.Format_RGB32).copy()
+
+
+def wrapArray(pixels):
+    return arrayToImage(pixels)
+
+
+def timeIt(function, argument, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+if __name__ == '__main__':
+
+    app = QCoreApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Compare per-pixel QImage access with bulk NumPy access.")
+    parser.addHelpOption()
+    sizeOption = QCommandLineOption(['s', 'size'],
+            "Use a <size> x <size> pixel image.", 'size', '512')
+    parser.addOption(sizeOption)
+    repeatOption = QCommandLineOption(['r', 'repeat'],
+            "Report the best of <count> runs.", 'count', '3')
+    parser.addOption(repeatOption)
+    parser.process(app)
+
+    size = int(parser.value(sizeOption))
+    repeat = int(parser.value(repeatOption))
+
+    image = QImage(size, size, QImage.Format_RGB32)
+    image.fill(0)
+    pixels = numpy.zeros((size, size), dtype=numpy.uint32)
+
+    print("%d x %d pixels, best of %d" % (size, size, repeat))
+    print("%-24s %12s %12s %10s" % ("", "Qt", "NumPy", "speedup"))
+
+    for name, slow, fast, argument in (
+            ("write", perPixelWrite, bulkWrite, image),
+            ("gray", perPixelGray, bulkGray, image),
+            ("image from array", copyFromBytes, wrapArray, pixels)):
+        slowTime = timeIt(slow, argument, repeat)
+        fastTime = timeIt(fast, argument, repeat)
+
+        print("%-24s %10.2fms %10.2fms %9.0fx" % (name, slowTime * 1000,
+                fastTime * 1000, slowTime / fastTime))
@@ -42,11 +42,32 @@
 #############################################################################
 
 
-from PyQt5.QtCore import (pyqtSignal, QMutex, QMutexLocker, QPoint, QSize, Qt,
-        QThread, QWaitCondition)
+import array
+import collections
+import concurrent.futures
+import math
+import multiprocessing
+import os.path
+import sys
+
+from PyQt5.QtCore import (pyqtSignal, QCommandLineOption, QCommandLineParser,
+        QElapsedTimer, QMutex, QMutexLocker, QPoint, QSize, Qt, QThread,
+        QWaitCondition)
 from PyQt5.QtGui import QColor, QImage, QPainter, QPixmap, qRgb
 from PyQt5.QtWidgets import QApplication, QWidget
 
+# Access the shared module.
+sys.path.insert(1,
+        os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                'shared'))
+
+try:
+    import numpy
+    from numpyimage import imageToArray
+except ImportError:
+    numpy = None
+
 
 DefaultCenterX = -0.647011
 DefaultCenterY = -0.0395159
@@ -57,10 +78,165 @@ ZoomOutFactor = 1 / ZoomInFactor
 ScrollStep = 20
 
 
+def mandelbrotIterations(centerX, centerY, scaleFactor, xStart, xEnd, yStart,
+        yEnd, maxIterations, limit=4):
+    """Return a (yEnd - yStart, xEnd - xStart) array of escape iteration
+    counts.  Points that have not escaped after maxIterations iterations are
+    given maxIterations.
+    """
+
+    xs = centerX + numpy.arange(xStart, xEnd) * scaleFactor
+    ys = centerY + numpy.arange(yStart, yEnd) * scaleFactor
+    c0 = xs[numpy.newaxis, :] + 1j * ys[:, numpy.newaxis]
+
+    return escapeIterations(c0.ravel(), maxIterations, limit).reshape(
+            yEnd - yStart, xEnd - xStart)
+
+
+def escapeIterations(c0, maxIterations, limit=4):
+    """Return an array of the escape iteration counts of a one dimensional
+    array of points.
+    """
+
+    counts = numpy.full(c0.size, maxIterations, dtype=numpy.int32)
+    index = numpy.arange(c0.size)
+    z = c0.copy()
+    limitSquared = limit * limit
+
+    # Only the points that have not yet escaped are iterated.  The active set
+    # is compacted whenever some of its points escape so that the cost of
+    # each iteration is proportional to the number of points still running.
+    for numIterations in range(1, maxIterations + 1):
+        z *= z
+        z += c0
+        escaped = (z.real * z.real + z.imag * z.imag) >= limitSquared
+        if escaped.any():
+            counts[index[escaped]] = numIterations
+            active = ~escaped
+            z = z[active]
+            c0 = c0[active]
+            index = index[active]
+            if index.size == 0:
+                break
+
+    return counts
+
+
+def mandelbrotRowIterations(centerX, centerY, scaleFactor, xStart, xEnd, y,
+        maxIterations, limit=4):
+    """Return a list of the escape iteration counts of one row of points
+    computed in pure Python.
+    """
+
+    ay = 1j * (centerY + (y * scaleFactor))
+    counts = []
+
+    for x in range(xStart, xEnd):
+        c0 = centerX + (x * scaleFactor) + ay
+        c = c0
+        numIterations = 0
+
+        while numIterations < maxIterations:
+            numIterations += 1
+            c = c*c + c0
+            if abs(c) >= limit:
+                break
+            numIterations += 1
+            c = c*c + c0
+            if abs(c) >= limit:
+                break
+            numIterations += 1
+            c = c*c + c0
+            if abs(c) >= limit:
+                break
+            numIterations += 1
+            c = c*c + c0
+            if abs(c) >= limit:
+                break
+
+        counts.append(numIterations)
+
+    return counts
+
+
+# The state of a tile rendering worker process.  It is set up by
+# initTileWorker() when the process pool starts the worker.
+tileGeneration = None
+tileColormap = None
+tileColormapTable = None
+
+
+def initTileWorker(generation, colormap):
+    global tileGeneration, tileColormap, tileColormapTable
+
+    tileGeneration = generation
+    tileColormap = colormap
+
+    if numpy is not None:
+        tileColormapTable = numpy.array(colormap + [qRgb(0, 0, 0)],
+                dtype=numpy.uint32)
+
+
+def renderTile(generation, centerX, centerY, scaleFactor, xStart, xEnd,
+        yStart, yEnd, maxIterations, limit, useNumPy):
+    """Render one tile in a worker process.  Return a tuple of whether the
+    tile is entirely black and its RGB32 pixel data, or None if the render
+    was restarted before the tile was finished.
+    """
+
+    colormapSize = len(tileColormap)
+
+    if useNumPy and numpy is not None:
+        bands = []
+
+        for bandStart in range(yStart, yEnd, RenderThread.BandHeight):
+            if tileGeneration.value != generation:
+                return None
+
+            bandEnd = min(bandStart + RenderThread.BandHeight, yEnd)
+            bands.append(mandelbrotIterations(centerX, centerY, scaleFactor,
+                    xStart, xEnd, bandStart, bandEnd, maxIterations, limit))
+
+        counts = numpy.concatenate(bands)
+        inside = counts >= maxIterations
+        colors = numpy.where(inside, colormapSize, counts % colormapSize)
+
+        return bool(inside.all()), tileColormapTable[colors].tobytes()
+
+    black = qRgb(0, 0, 0)
+    pixels = array.array('I')
+    allBlack = True
+
+    for y in range(yStart, yEnd):
+        if tileGeneration.value != generation:
+            return None
+
+        for numIterations in mandelbrotRowIterations(centerX, centerY,
+                scaleFactor, xStart, xEnd, y, maxIterations, limit):
+            if numIterations < maxIterations:
+                pixels.append(tileColormap[numIterations % colormapSize])
+                allBlack = False
+            else:
+                pixels.append(black)
+
+    return allBlack, pixels.tobytes()
+
+
 class RenderThread(QThread):
     ColormapSize = 512
+    BandHeight = 16
+    TileSize = 64
+
+    # Images are streamed to the widget at most this often (in milliseconds)
+    # while the tiles of a pass are landing.
+    StreamInterval = 40
+
+    # The number of passes whose iteration counts are kept so that panning and
+    # zooming by a power of two only has to compute the newly exposed points.
+    CountCacheSize = 16
 
     renderedImage = pyqtSignal(QImage, float)
+    tileRate = pyqtSignal(float)
 
     def __init__(self, parent=None):
         super(RenderThread, self).__init__(parent)
@@ -75,10 +251,29 @@ class RenderThread(QThread):
 
         self.restart = False
         self.abort = False
+        self.useNumPy = numpy is not None
+        self.workerCount = 0
+
+        # The process pool is created on demand by the render thread.  The
+        # generation is shared with the workers so that they can give up on
+        # tiles of a render that has been restarted.
+        self.pool = None
+        self.poolSize = 0
+        self.mpContext = multiprocessing.get_context('spawn')
+        self.generation = self.mpContext.Value('i', 0)
+
+        # Iteration counts of complete passes, keyed by (centerX, centerY,
+        # scaleFactor, pass) with the most recently used last.
+        self.countCache = collections.OrderedDict()
 
         for i in range(RenderThread.ColormapSize):
             self.colormap.append(self.rgbFromWaveLength(380.0 + (i * 400.0 / RenderThread.ColormapSize)))
 
+        if numpy is not None:
+            # The extra last entry is used for points inside the set.
+            self.colormapTable = numpy.array(self.colormap + [qRgb(0, 0, 0)],
+                    dtype=numpy.uint32)
+
     def __del__(self):
         self.mutex.lock()
         self.abort = True
@@ -87,6 +282,9 @@ class RenderThread(QThread):
 
         self.wait()
 
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+
     def render(self, centerX, centerY, scaleFactor, resultSize):
         locker = QMutexLocker(self.mutex)
 
@@ -99,8 +297,19 @@ class RenderThread(QThread):
             self.start(QThread.LowPriority)
         else:
             self.restart = True
+            self.generation.value += 1
             self.condition.wakeOne()
 
+    def setUseNumPy(self, useNumPy):
+        locker = QMutexLocker(self.mutex)
+
+        self.useNumPy = useNumPy and numpy is not None
+
+    def setWorkerCount(self, workerCount):
+        locker = QMutexLocker(self.mutex)
+
+        self.workerCount = max(0, workerCount)
+
     def run(self):
         while True:
             self.mutex.lock()
@@ -108,63 +317,51 @@ class RenderThread(QThread):
             scaleFactor = self.scaleFactor
             centerX = self.centerX
             centerY = self.centerY
+            useNumPy = self.useNumPy
+            workerCount = self.workerCount
             self.mutex.unlock()
 
-            halfWidth = resultSize.width() // 2
-            halfHeight = resultSize.height() // 2
+            if workerCount and workerCount != self.poolSize:
+                if self.pool is not None:
+                    self.pool.shutdown(wait=False)
+
+                self.pool = concurrent.futures.ProcessPoolExecutor(
+                        workerCount, mp_context=self.mpContext,
+                        initializer=initTileWorker,
+                        initargs=(self.generation, self.colormap))
+                self.poolSize = workerCount
+
             image = QImage(resultSize, QImage.Format_RGB32)
+            image.fill(Qt.black)
 
             NumPasses = 8
             curpass = 0
+            streaming = False
 
             while curpass < NumPasses:
                 MaxIterations = (1 << (2 * curpass + 6)) + 32
                 Limit = 4
-                allBlack = True
-
-                for y in range(-halfHeight, halfHeight):
-                    if self.restart:
-                        break
-                    if self.abort:
-                        return
-
-                    ay = 1j * (centerY + (y * scaleFactor))
-
-                    for x in range(-halfWidth, halfWidth):
-                        c0 = centerX + (x * scaleFactor) + ay
-                        c = c0
-                        numIterations = 0
-
-                        while numIterations < MaxIterations:
-                            numIterations += 1
-                            c = c*c + c0
-                            if abs(c) >= Limit:
-                                break
-                            numIterations += 1
-                            c = c*c + c0
-                            if abs(c) >= Limit:
-                                break
-                            numIterations += 1
-                            c = c*c + c0
-                            if abs(c) >= Limit:
-                                break
-                            numIterations += 1
-                            c = c*c + c0
-                            if abs(c) >= Limit:
-                                break
-
-                        if numIterations < MaxIterations:
-                            image.setPixel(x + halfWidth, y + halfHeight,
-                                           self.colormap[numIterations % RenderThread.ColormapSize])
-                            allBlack = False
-                        else:
-                            image.setPixel(x + halfWidth, y + halfHeight, qRgb(0, 0, 0))
+
+                if workerCount:
+                    allBlack = self.renderPassTiled(image, centerX, centerY,
+                            scaleFactor, MaxIterations, Limit, useNumPy,
+                            streaming)
+                elif useNumPy:
+                    allBlack = self.renderPassNumPy(image, centerX, centerY,
+                            scaleFactor, MaxIterations, Limit, curpass)
+                else:
+                    allBlack = self.renderPassPython(image, centerX, centerY,
+                            scaleFactor, MaxIterations, Limit)
+
+                if self.abort:
+                    return
 
                 if allBlack and curpass == 0:
                     curpass = 4
                 else:
                     if not self.restart:
                         self.renderedImage.emit(image, scaleFactor)
+                        streaming = True
                     curpass += 1
 
             self.mutex.lock()
@@ -173,6 +370,183 @@ class RenderThread(QThread):
             self.restart = False
             self.mutex.unlock()
 
+    def renderPassPython(self, image, centerX, centerY, scaleFactor,
+            maxIterations, limit):
+        halfWidth = image.width() // 2
+        halfHeight = image.height() // 2
+        allBlack = True
+
+        for y in range(-halfHeight, halfHeight):
+            if self.restart or self.abort:
+                break
+
+            counts = mandelbrotRowIterations(centerX, centerY, scaleFactor,
+                    -halfWidth, halfWidth, y, maxIterations, limit)
+
+            for x, numIterations in enumerate(counts):
+                if numIterations < maxIterations:
+                    image.setPixel(x, y + halfHeight,
+                                   self.colormap[numIterations % RenderThread.ColormapSize])
+                    allBlack = False
+                else:
+                    image.setPixel(x, y + halfHeight, qRgb(0, 0, 0))
+
+        return allBlack
+
+    def renderPassNumPy(self, image, centerX, centerY, scaleFactor,
+            maxIterations, limit, curpass):
+        halfWidth = image.width() // 2
+        halfHeight = image.height() // 2
+        pixels = imageToArray(image)
+        allBlack = True
+
+        counts = self.cachedCounts(centerX, centerY, scaleFactor, halfWidth,
+                halfHeight, curpass)
+        xs = centerX + numpy.arange(-halfWidth, halfWidth) * scaleFactor
+
+        for bandStart in range(0, 2 * halfHeight, RenderThread.BandHeight):
+            if self.restart or self.abort:
+                return allBlack
+
+            # Only the points not seeded from the cache are computed.
+            bandEnd = min(bandStart + RenderThread.BandHeight, 2 * halfHeight)
+            band = counts[bandStart:bandEnd]
+            unknown = band < 0
+            if unknown.any():
+                ys = centerY + numpy.arange(bandStart - halfHeight,
+                        bandEnd - halfHeight) * scaleFactor
+                c0 = xs[numpy.newaxis, :] + 1j * ys[:, numpy.newaxis]
+                band[unknown] = escapeIterations(c0[unknown], maxIterations,
+                        limit)
+
+            inside = band >= maxIterations
+            if not inside.all():
+                allBlack = False
+
+            colors = numpy.where(inside, RenderThread.ColormapSize,
+                    band % RenderThread.ColormapSize)
+            pixels[bandStart:bandEnd, :2 * halfWidth] = \
+                    self.colormapTable[colors]
+
+        self.countCache[(centerX, centerY, scaleFactor, curpass)] = counts
+        while len(self.countCache) > RenderThread.CountCacheSize:
+            self.countCache.popitem(last=False)
+
+        return allBlack
+
+    def cachedCounts(self, centerX, centerY, scaleFactor, halfWidth,
+            halfHeight, curpass):
+        """Return a (2 * halfHeight, 2 * halfWidth) array of iteration counts
+        for a pass seeded from a cached pass whose points coincide with some
+        of the new ones.  Points without a cached count are set to -1.
+        """
+
+        counts = numpy.full((2 * halfHeight, 2 * halfWidth), -1,
+                dtype=numpy.int32)
+
+        for key in reversed(list(self.countCache)):
+            cachedCenterX, cachedCenterY, cachedScaleFactor, cachedPass = key
+            if cachedPass != curpass:
+                continue
+
+            # The grids can only share points if the scales differ by a power
+            # of two and the centers are a whole number of pixels apart.
+            ratio = scaleFactor / cachedScaleFactor
+            if math.frexp(ratio)[0] != 0.5:
+                continue
+
+            offsetX = (centerX - cachedCenterX) / cachedScaleFactor
+            offsetY = (centerY - cachedCenterY) / cachedScaleFactor
+            if abs(offsetX - round(offsetX)) > 1e-6 or abs(offsetY - round(offsetY)) > 1e-6:
+                continue
+
+            cached = self.countCache[key]
+            cachedHeight, cachedWidth = cached.shape
+
+            # The position of each new point in the cached grid.
+            xs = numpy.arange(-halfWidth, halfWidth) * ratio + round(offsetX) + cachedWidth // 2
+            ys = numpy.arange(-halfHeight, halfHeight) * ratio + round(offsetY) + cachedHeight // 2
+            validX = (xs == numpy.floor(xs)) & (xs >= 0) & (xs < cachedWidth)
+            validY = (ys == numpy.floor(ys)) & (ys >= 0) & (ys < cachedHeight)
+            if not validX.any() or not validY.any():
+                continue
+
+            counts[numpy.ix_(validY, validX)] = cached[numpy.ix_(
+                    ys[validY].astype(int), xs[validX].astype(int))]
+            self.countCache.move_to_end(key)
+            break
+
+        return counts
+
+    def renderPassTiled(self, image, centerX, centerY, scaleFactor,
+            maxIterations, limit, useNumPy, streaming):
+        halfWidth = image.width() // 2
+        halfHeight = image.height() // 2
+        generation = self.generation.value
+        tileSize = RenderThread.TileSize
+
+        # Submit the tiles nearest the center of the image first.
+        tiles = []
+        for yStart in range(-halfHeight, halfHeight, tileSize):
+            for xStart in range(-halfWidth, halfWidth, tileSize):
+                tiles.append((xStart, min(xStart + tileSize, halfWidth),
+                        yStart, min(yStart + tileSize, halfHeight)))
+
+        tiles.sort(key=lambda tile: abs(tile[0] + tile[1]) + abs(tile[2] + tile[3]))
+
+        futures = {}
+        for xStart, xEnd, yStart, yEnd in tiles:
+            future = self.pool.submit(renderTile, generation, centerX,
+                    centerY, scaleFactor, xStart, xEnd, yStart, yEnd,
+                    maxIterations, limit, useNumPy)
+            futures[future] = (xStart + halfWidth, yStart + halfHeight,
+                    xEnd - xStart, yEnd - yStart)
+
+        allBlack = True
+        tilesDone = 0
+        elapsed = QElapsedTimer()
+        elapsed.start()
+        lastStreamed = 0
+        pending = set(futures)
+
+        while pending:
+            if self.restart or self.abort:
+                for future in pending:
+                    future.cancel()
+                break
+
+            done, pending = concurrent.futures.wait(pending, timeout=0.05,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                result = future.result()
+                if result is None:
+                    continue
+
+                tileBlack, data = result
+                x, y, width, height = futures[future]
+                tile = QImage(data, width, height, width * 4,
+                        QImage.Format_RGB32)
+
+                # A painter is only held for the duration of one tile so that
+                # an image that has been streamed is detached before it is
+                # painted on again.
+                painter = QPainter(image)
+                painter.drawImage(x, y, tile)
+                painter.end()
+
+                allBlack = allBlack and tileBlack
+                tilesDone += 1
+
+            if streaming and pending and elapsed.elapsed() - lastStreamed >= RenderThread.StreamInterval:
+                self.renderedImage.emit(image, scaleFactor)
+                lastStreamed = elapsed.elapsed()
+
+        if tilesDone and elapsed.elapsed():
+            self.tileRate.emit(tilesDone * 1000.0 / elapsed.elapsed())
+
+        return allBlack
+
     def rgbFromWaveLength(self, wave):
         r = 0.0
         g = 0.0
@@ -222,10 +596,12 @@ class MandelbrotWidget(QWidget):
         self.centerY = DefaultCenterY
         self.pixmapScale = DefaultScale
         self.curScale = DefaultScale
+        self.tilesPerSecond = 0.0
 
         self.thread.renderedImage.connect(self.updatePixmap)
+        self.thread.tileRate.connect(self.updateTileRate)
 
-        self.setWindowTitle("Mandelbrot")
+        self.updateWindowTitle()
         self.setCursor(Qt.CrossCursor)
         self.resize(550, 400)
 
@@ -278,6 +654,10 @@ class MandelbrotWidget(QWidget):
             self.zoom(ZoomInFactor)
         elif event.key() == Qt.Key_Minus:
             self.zoom(ZoomOutFactor)
+        elif event.key() == Qt.Key_PageUp:
+            self.zoom(0.5)
+        elif event.key() == Qt.Key_PageDown:
+            self.zoom(2.0)
         elif event.key() == Qt.Key_Left:
             self.scroll(-ScrollStep, 0)
         elif event.key() == Qt.Key_Right:
@@ -286,6 +666,13 @@ class MandelbrotWidget(QWidget):
             self.scroll(0, -ScrollStep)
         elif event.key() == Qt.Key_Up:
             self.scroll(0, +ScrollStep)
+        elif event.key() == Qt.Key_E:
+            self.toggleEngine()
+        elif event.key() == Qt.Key_W:
+            if self.thread.workerCount:
+                self.setWorkerCount(0)
+            else:
+                self.setWorkerCount(QThread.idealThreadCount())
         else:
             super(MandelbrotWidget, self).keyPressEvent(event)
 
@@ -323,6 +710,35 @@ class MandelbrotWidget(QWidget):
         self.pixmapScale = scaleFactor
         self.update()
 
+    def toggleEngine(self):
+        self.thread.setUseNumPy(not self.thread.useNumPy)
+        self.updateWindowTitle()
+        self.thread.render(self.centerX, self.centerY, self.curScale,
+                self.size())
+
+    def setWorkerCount(self, workerCount):
+        self.thread.setWorkerCount(workerCount)
+        self.tilesPerSecond = 0.0
+        self.updateWindowTitle()
+        self.thread.render(self.centerX, self.centerY, self.curScale,
+                self.size())
+
+    def updateTileRate(self, tilesPerSecond):
+        self.tilesPerSecond = tilesPerSecond
+        self.updateWindowTitle()
+
+    def updateWindowTitle(self):
+        if self.thread.useNumPy:
+            engine = "NumPy"
+        else:
+            engine = "Python"
+
+        if self.thread.workerCount:
+            self.setWindowTitle("Mandelbrot (%s, %d workers, %.1f tiles/s)" %
+                    (engine, self.thread.workerCount, self.tilesPerSecond))
+        else:
+            self.setWindowTitle("Mandelbrot (%s)" % engine)
+
     def zoom(self, zoomFactor):
         self.curScale *= zoomFactor
         self.update()
@@ -339,9 +755,19 @@ class MandelbrotWidget(QWidget):
 
 if __name__ == '__main__':
 
-    import sys
-
     app = QApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription("Mandelbrot Example")
+    parser.addHelpOption()
+    workersOption = QCommandLineOption(['w', 'workers'],
+            "Render tiles on <count> worker processes (0 renders on a single "
+            "thread).", 'count', '0')
+    parser.addOption(workersOption)
+    parser.process(app)
+
     widget = MandelbrotWidget()
+    widget.thread.setWorkerCount(int(parser.value(workersOption)))
+    widget.updateWindowTitle()
     widget.show()
     sys.exit(app.exec_())
@@ -42,11 +42,13 @@
 #############################################################################
 
 
-from PyQt5.QtCore import QFile, QStringListModel, Qt
+from PyQt5.QtCore import QCommandLineOption, QCommandLineParser, Qt
 from PyQt5.QtGui import QCursor, QKeySequence, QTextCursor
 from PyQt5.QtWidgets import (QAction, QApplication, QCompleter, QMainWindow,
         QMessageBox, QTextEdit)
 
+from wordindex import MatchModel, WordIndex
+
 import customcompleter_rc
 
 
@@ -69,7 +71,11 @@ class TextEdit(QTextEdit):
         self._completer = c
 
         c.setWidget(self)
-        c.setCompletionMode(QCompleter.PopupCompletion)
+        if isinstance(c.model(), MatchModel):
+            # The model only holds the words that match.
+            c.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        else:
+            c.setCompletionMode(QCompleter.PopupCompletion)
         c.setCaseSensitivity(Qt.CaseInsensitive)
         c.activated.connect(self.insertCompletion)
 
@@ -81,10 +87,16 @@ class TextEdit(QTextEdit):
             return
 
         tc = self.textCursor()
-        extra = len(completion) - len(self._completer.completionPrefix())
+        prefix = self._completer.completionPrefix()
         tc.movePosition(QTextCursor.Left)
         tc.movePosition(QTextCursor.EndOfWord)
-        tc.insertText(completion[-extra:])
+        if completion.casefold().startswith(prefix.casefold()):
+            tc.insertText(completion[len(prefix):])
+        else:
+            # The completion contains the prefix elsewhere so it replaces it.
+            tc.movePosition(QTextCursor.Left, QTextCursor.KeepAnchor,
+                    len(prefix))
+            tc.insertText(completion)
         self.setTextCursor(tc)
 
     def textUnderCursor(self):
@@ -125,6 +137,9 @@ class TextEdit(QTextEdit):
             return
 
         if completionPrefix != self._completer.completionPrefix():
+            model = self._completer.model()
+            if isinstance(model, MatchModel):
+                model.setQuery(completionPrefix)
             self._completer.setCompletionPrefix(completionPrefix)
             self._completer.popup().setCurrentIndex(
                     self._completer.completionModel().index(0, 0))
@@ -135,15 +150,16 @@ class TextEdit(QTextEdit):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, wordList=':/resources/wordlist.txt',
+            substringMatching=False, maximumMatches=100):
         super(MainWindow, self).__init__(parent)
 
         self.createMenu()
 
         self.completingTextEdit = TextEdit()
         self.completer = QCompleter(self)
-        self.completer.setModel(self.modelFromFile(':/resources/wordlist.txt'))
-        self.completer.setModelSorting(QCompleter.CaseInsensitivelySortedModel)
+        self.completer.setModel(self.modelFromFile(wordList,
+                substringMatching, maximumMatches))
         self.completer.setCaseSensitivity(Qt.CaseInsensitive)
         self.completer.setWrapAround(False)
         self.completingTextEdit.setCompleter(self.completer)
@@ -168,27 +184,18 @@ class MainWindow(QMainWindow):
         helpMenu.addAction(aboutAct)
         helpMenu.addAction(aboutQtAct)
 
-    def modelFromFile(self, fileName):
-        f = QFile(fileName)
-        if not f.open(QFile.ReadOnly):
-            return QStringListModel(self.completer)
-
+    def modelFromFile(self, fileName, substringMatching=False,
+            maximumMatches=100):
+        # The index is only built the first time a word list is used, after
+        # which it is loaded from the user's cache directory.
         QApplication.setOverrideCursor(QCursor(Qt.WaitCursor))
-
-        words = []
-        while not f.atEnd():
-            line = f.readLine().trimmed()
-            if line.length() != 0:
-                try:
-                    line = str(line, encoding='ascii')
-                except TypeError:
-                    line = str(line)
-
-                words.append(line)
-
+        index = WordIndex.fromFile(fileName, withTrigrams=substringMatching)
         QApplication.restoreOverrideCursor()
 
-        return QStringListModel(words, self.completer)
+        model = MatchModel(index, maximumMatches, self.completer)
+        model.setSubstringMatching(substringMatching)
+
+        return model
 
     def about(self):
         QMessageBox.about(self, "About",
@@ -201,6 +208,24 @@ if __name__ == '__main__':
     import sys
 
     app = QApplication(sys.argv)
-    window = MainWindow()
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription("Custom Completer")
+    parser.addHelpOption()
+    wordsOption = QCommandLineOption(['w', 'words'],
+            "Complete the words in <file>, one per line.", 'file',
+            ':/resources/wordlist.txt')
+    parser.addOption(wordsOption)
+    substringOption = QCommandLineOption(['s', 'substring'],
+            "Also complete words that contain the text anywhere.")
+    parser.addOption(substringOption)
+    matchesOption = QCommandLineOption(['m', 'matches'],
+            "Show at most <matches> completions.", 'matches', '100')
+    parser.addOption(matchesOption)
+    parser.process(app)
+
+    window = MainWindow(wordList=parser.value(wordsOption),
+            substringMatching=parser.isSet(substringOption),
+            maximumMatches=int(parser.value(matchesOption)))
     window.show()
     sys.exit(app.exec_())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure how the completer copes with large word lists.
+
+A word list of a given number of random words is written to a temporary
+directory.  For the QStringListModel and QCompleter filtering that the
+example used to rely on, the time to read the word list is reported and then
+the time taken by each key press as words are typed.  The same is reported
+for a WordIndex, first when it is built and saved and then when it is loaded
+from the saved index, and for substring matching with its trigrams.
+"""
+
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import (QCommandLineOption, QCommandLineParser, QFile,
+        QStringListModel, Qt)
+from PyQt5.QtWidgets import QApplication, QCompleter
+
+from wordindex import MatchModel, WordIndex
+
+
+def generateWords(count, seed=0):
+    """Return a number of different random words made of syllables, some of
+    them capitalized.
+    """
+
+    rand = random.Random(seed)
+    syllables = [c + v for c in 'bcdfghjklmnprstvwz' for v in 'aeiou']
+    syllables.extend(s + 'n' for s in syllables[::3])
+
+    words = set()
+    while len(words) < count:
+        word = ''.join(rand.choice(syllables)
+                for i in range(rand.randint(2, 5)))
+        if rand.random() < 0.1:
+            word = word.capitalize()
+        words.add(word)
+
+    return sorted(words, key=lambda word: (word.casefold(), word))
+
+
+def modelFromFile(fileName):
+    """Return a QStringListModel of a word list read as the example used
+    to.
+    """
+
+    f = QFile(fileName)
+    f.open(QFile.ReadOnly)
+
+    words = []
+    while not f.atEnd():
+        line = f.readLine().trimmed()
+        if line.length() != 0:
+            words.append(str(line, encoding='ascii'))
+
+    return QStringListModel(words)
+
+
+def typedPrefixes(words, count, seed=0):
+    """Return the prefixes of at least three characters that are completed
+    as a number of words are typed.
+    """
+
+    rand = random.Random(seed)
+    prefixes = []
+    for word in rand.sample(words, count):
+        prefixes.extend(word[:length] for length in range(3, len(word) + 1))
+
+    return prefixes
+
+
+def typedSubstrings(words, count, seed=0):
+    """Return text of at least three characters taken from the middle of a
+    number of words, as it is typed.
+    """
+
+    rand = random.Random(seed)
+    substrings = []
+    for word in rand.sample(words, count):
+        start = rand.randrange(max(1, len(word) - 3))
+        text = word[start:start + rand.randint(3, 6)]
+        substrings.extend(text[:length] for length in range(3, len(text) + 1))
+
+    return substrings
+
+
+def measureQueries(query, queries):
+    times = []
+    for text in queries:
+        start = time.perf_counter()
+        query(text)
+        times.append(time.perf_counter() - start)
+
+    return sum(times) / len(times), max(times)
+
+
+def measureCompleter(fileName, queries, maximum):
+    start = time.perf_counter()
+    model = modelFromFile(fileName)
+    loadTime = time.perf_counter() - start
+
+    completer = QCompleter(model)
+    completer.setModelSorting(QCompleter.CaseInsensitivelySortedModel)
+    completer.setCaseSensitivity(Qt.CaseInsensitive)
+    completionModel = completer.completionModel()
+
+    def query(text):
+        completer.setCompletionPrefix(text)
+        rows = min(completionModel.rowCount(), maximum)
+        for row in range(rows):
+            completionModel.index(row, 0).data()
+
+    return (loadTime, ) + measureQueries(query, queries)
+
+
+def measureIndex(fileName, indexFileName, queries, maximum, substrings):
+    start = time.perf_counter()
+    index = WordIndex.fromFile(fileName, withTrigrams=substrings,
+            indexFileName=indexFileName)
+    loadTime = time.perf_counter() - start
+
+    model = MatchModel(index, maximum)
+    model.setSubstringMatching(substrings)
+
+    def query(text):
+        model.setQuery(text)
+        for row in range(model.rowCount()):
+            model.index(row, 0).data()
+
+    return (loadTime, ) + measureQueries(query, queries)
+
+
+if __name__ == '__main__':
+
+    app = QApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure how the completer copes with large word lists.")
+    parser.addHelpOption()
+    wordsOption = QCommandLineOption(['w', 'words'],
+            "Use word lists of the comma separated numbers of <words>.",
+            'words', '100000,1000000,3000000')
+    parser.addOption(wordsOption)
+    typedOption = QCommandLineOption(['t', 'typed'],
+            "Type <count> words for each word list.", 'count', '200')
+    parser.addOption(typedOption)
+    matchesOption = QCommandLineOption(['m', 'matches'],
+            "Show at most <matches> completions.", 'matches', '100')
+    parser.addOption(matchesOption)
+    parser.process(app)
+
+    typed = int(parser.value(typedOption))
+    maximum = int(parser.value(matchesOption))
+    directory = tempfile.mkdtemp()
+
+    print("%8s %-18s %9s %15s %14s" % ("words", "mode", "load (s)",
+            "key mean (ms)", "key max (ms)"))
+
+    try:
+        for count in [int(w) for w in parser.value(wordsOption).split(',')]:
+            words = generateWords(count)
+            fileName = os.path.join(directory, 'words-%d.txt' % count)
+            with open(fileName, 'w') as f:
+                f.write('\n'.join(words))
+
+            prefixes = typedPrefixes(words, typed)
+            substrings = typedSubstrings(words, typed)
+            indexFileName = os.path.join(directory, 'words-%d.index' % count)
+            trigramFileName = os.path.join(directory,
+                    'words-%d-trigrams.index' % count)
+
+            modes = [
+                ("qcompleter", lambda: measureCompleter(fileName, prefixes,
+                        maximum)),
+                ("index built", lambda: measureIndex(fileName,
+                        indexFileName, prefixes, maximum, False)),
+                ("index loaded", lambda: measureIndex(fileName,
+                        indexFileName, prefixes, maximum, False)),
+                ("substring built", lambda: measureIndex(fileName,
+                        trigramFileName, substrings, maximum, True)),
+                ("substring loaded", lambda: measureIndex(fileName,
+                        trigramFileName, substrings, maximum, True))]
+
+            for name, measure in modes:
+                loadTime, mean, longest = measure()
+                print("%8d %-18s %9.3f %15.3f %14.3f" % (count, name,
+                        loadTime, mean * 1000, longest * 1000))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""A sorted index of the words of a word list for the Custom Completer
+example, and a model of the words that match the text being completed.
+
+The words are sorted case-insensitively and written with their offsets to an
+index file that is memory mapped when it is loaded, so that words are only
+read when they are looked at.  The words that start with a prefix are then a
+contiguous range that is found by binary search.  The index file is kept in
+the user's cache directory and is rebuilt when the word list changes.
+
+The index may also record, for every trigram, the words that contain it so
+that the words containing some text anywhere are found without looking at
+every word.
+"""
+
+
+import array
+import bisect
+import hashlib
+import itertools
+import mmap
+import os
+import struct
+
+from PyQt5.QtCore import (QAbstractListModel, QDir, QFile, QFileInfo,
+        QModelIndex, QStandardPaths, Qt)
+
+
+def readWords(fileName):
+    """Return the non-empty lines of a word list, which may be a resource,
+    or None if it can't be read.
+    """
+
+    f = QFile(fileName)
+    if not f.open(QFile.ReadOnly):
+        return None
+
+    text = str(f.readAll(), encoding='utf-8', errors='replace')
+    f.close()
+
+    return [word for word in (line.strip() for line in text.splitlines())
+            if word]
+
+
+def trigrams(text):
+    """Return the set of trigrams of some text, each packed into an
+    integer.
+    """
+
+    return {(ord(a) << 42) | (ord(b) << 21) | ord(c)
+            for a, b, c in zip(text, text[1:], text[2:])}
+
+
+def align(offset):
+    return (offset + 7) & ~7
+
+
+class WordIndex(object):
+    """The words of a word list sorted case-insensitively.
+
+    The index is made of a header, the offsets of the words, the words
+    themselves encoded as UTF-8 and, if it has trigrams, the sorted trigrams
+    with the offsets of their postings and the postings, which are the
+    numbers of the words that contain each trigram.
+    """
+
+    Magic = b'CWIX'
+    Version = 1
+
+    # The flags of an index.
+    HasTrigrams = 1
+
+    # The magic, version, flags, number of words, size and modification time
+    # of the word list, and number of trigrams.
+    Header = struct.Struct('<4sIIxxxxqqqq')
+
+    def __init__(self, data):
+        (magic, version, self.flags, self.count, self.sourceSize,
+                self.sourceTime, self.trigramCount) = \
+                        WordIndex.Header.unpack_from(data)
+
+        if magic != WordIndex.Magic or version != WordIndex.Version:
+            raise ValueError("not a word index")
+
+        # The data is kept as the views below refer to it.
+        self.data = data
+        view = memoryview(data)
+
+        offset = WordIndex.Header.size
+        end = offset + 8 * (self.count + 1)
+        self.offsets = view[offset:end].cast('Q')
+
+        offset = end
+        end = offset + self.offsets[self.count]
+        self.words = view[offset:end]
+
+        if self.hasTrigrams():
+            offset = align(end)
+            end = offset + 8 * self.trigramCount
+            self.trigrams = view[offset:end].cast('Q')
+
+            offset = end
+            end = offset + 8 * (self.trigramCount + 1)
+            self.postingOffsets = view[offset:end].cast('Q')
+
+            offset = end
+            end = offset + 4 * self.postingOffsets[self.trigramCount]
+            self.postings = view[offset:end].cast('I')
+
+        if len(view) < end:
+            raise ValueError("truncated word index")
+
+    @staticmethod
+    def build(words, sourceSize=0, sourceTime=0, withTrigrams=False):
+        """Return the data of the index of a sequence of words."""
+
+        words = sorted(set(words), key=lambda word: (word.casefold(), word))
+        encoded = [word.encode('utf-8') for word in words]
+        offsets = array.array('Q',
+                itertools.accumulate(map(len, encoded), initial=0))
+        blob = b''.join(encoded)
+
+        parts = [None, offsets.tobytes(), blob,
+                bytes(align(len(blob)) - len(blob))]
+
+        flags = 0
+        trigramCount = 0
+        if withTrigrams:
+            flags |= WordIndex.HasTrigrams
+
+            postings = {}
+            for number, word in enumerate(words):
+                for trigram in trigrams(word.casefold()):
+                    try:
+                        postings[trigram].append(number)
+                    except KeyError:
+                        postings[trigram] = array.array('I', [number])
+
+            keys = sorted(postings)
+            trigramCount = len(keys)
+            parts.append(array.array('Q', keys).tobytes())
+            parts.append(array.array('Q', itertools.accumulate(
+                    (len(postings[key]) for key in keys),
+                    initial=0)).tobytes())
+            parts.extend(postings[key].tobytes() for key in keys)
+
+        parts[0] = WordIndex.Header.pack(WordIndex.Magic, WordIndex.Version,
+                flags, len(words), sourceSize, sourceTime, trigramCount)
+
+        return b''.join(parts)
+
+    @staticmethod
+    def defaultIndexFileName(fileName):
+        """Return the name of the index file of a word list in the user's
+        cache directory.
+        """
+
+        cacheDir = QStandardPaths.writableLocation(
+                QStandardPaths.CacheLocation)
+        QDir().mkpath(cacheDir)
+        path = QFileInfo(fileName).absoluteFilePath()
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()
+
+        return os.path.join(cacheDir, 'customcompleter-%s.index' % digest)
+
+    @classmethod
+    def load(cls, indexFileName):
+        """Return the index in an index file, memory mapped, or None if
+        there isn't a valid one.
+        """
+
+        try:
+            with open(indexFileName, 'rb') as f:
+                return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except (OSError, ValueError, struct.error):
+            return None
+
+    @classmethod
+    def fromFile(cls, fileName, withTrigrams=False, indexFileName=None):
+        """Return the index of a word list, building it and saving it in an
+        index file unless the file holds an up to date index.
+        """
+
+        info = QFileInfo(fileName)
+        sourceSize = info.size()
+        sourceTime = info.lastModified().toMSecsSinceEpoch()
+
+        if indexFileName is None:
+            indexFileName = cls.defaultIndexFileName(fileName)
+
+        index = cls.load(indexFileName)
+        if (index is not None and index.sourceSize == sourceSize and
+                index.sourceTime == sourceTime and
+                (index.hasTrigrams() or not withTrigrams)):
+            return index
+
+        words = readWords(fileName)
+        if words is None:
+            return cls(cls.build([]))
+
+        data = cls.build(words, sourceSize, sourceTime, withTrigrams)
+
+        # Replace any old index in one step as it may be in use elsewhere.
+        tempFileName = '%s.%d' % (indexFileName, os.getpid())
+        try:
+            with open(tempFileName, 'wb') as f:
+                f.write(data)
+            os.replace(tempFileName, indexFileName)
+        except OSError:
+            # Do without a saved index.
+            return cls(data)
+
+        return cls.load(indexFileName) or cls(data)
+
+    def __len__(self):
+        return self.count
+
+    def hasTrigrams(self):
+        return bool(self.flags & WordIndex.HasTrigrams)
+
+    def word(self, number):
+        return str(self.words[self.offsets[number]:self.offsets[number + 1]],
+                encoding='utf-8')
+
+    def key(self, number):
+        return self.word(number).casefold()
+
+    def prefixRange(self, prefix):
+        """Return the range of the numbers of the words that start with a
+        prefix, ignoring case.
+        """
+
+        prefix = prefix.casefold()
+        length = len(prefix)
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        first = low
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key(middle)[:length] == prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        return range(first, low)
+
+    def prefixMatches(self, prefix, limit, caseSensitive=False):
+        """Return, in order, up to limit words that start with a prefix."""
+
+        numbers = self.prefixRange(prefix)
+
+        if not caseSensitive:
+            return [self.word(number) for number in numbers[:limit]]
+
+        matches = []
+        for number in numbers:
+            word = self.word(number)
+            if word.startswith(prefix):
+                matches.append(word)
+                if len(matches) == limit:
+                    break
+
+        return matches
+
+    def posting(self, trigram):
+        """Return the numbers of the words that contain a trigram."""
+
+        i = bisect.bisect_left(self.trigrams, trigram)
+        if i == self.trigramCount or self.trigrams[i] != trigram:
+            return self.postings[0:0]
+
+        return self.postings[self.postingOffsets[i]:self.postingOffsets[i + 1]]
+
+    def substringMatches(self, text, limit, caseSensitive=False):
+        """Return up to limit words that contain some text, those that start
+        with it first.  Only words that start with text shorter than three
+        characters, or with any text if the index has no trigrams, are
+        returned.
+        """
+
+        matches = self.prefixMatches(text, limit, caseSensitive)
+
+        key = text.casefold()
+        keyTrigrams = trigrams(key)
+        if len(matches) == limit or not keyTrigrams or not self.hasTrigrams():
+            return matches
+
+        # The candidates are the words in the shortest posting that are also
+        # in all the others, each of which is searched from where the last
+        # candidate was found.
+        postings = sorted((self.posting(trigram) for trigram in keyTrigrams),
+                key=len)
+        starts = [0] * len(postings)
+        found = set(matches)
+
+        for number in postings[0]:
+            for i in range(1, len(postings)):
+                starts[i] = bisect.bisect_left(postings[i], number, starts[i])
+                if (starts[i] == len(postings[i]) or
+                        postings[i][starts[i]] != number):
+                    break
+            else:
+                word = self.word(number)
+                if word in found:
+                    continue
+
+                if caseSensitive:
+                    isMatch = text in word
+                else:
+                    isMatch = key in word.casefold()
+
+                if isMatch:
+                    matches.append(word)
+                    if len(matches) == limit:
+                        break
+
+        return matches
+
+
+class MatchModel(QAbstractListModel):
+    """A model of the words of a WordIndex that match the text being
+    completed, of which there are at most a maximum number.  It is meant for
+    a QCompleter in the UnfilteredPopupCompletion mode, with setQuery()
+    called as the text changes.
+    """
+
+    def __init__(self, wordIndex, maximum=100, parent=None):
+        super(MatchModel, self).__init__(parent)
+
+        self.wordIndex = wordIndex
+        self.maximum = maximum
+        self.caseSensitivity = Qt.CaseInsensitive
+        self.substringMatching = False
+        self.query = ''
+        self.matches = []
+
+    def setCaseSensitivity(self, caseSensitivity):
+        self.caseSensitivity = caseSensitivity
+        self.setQuery(self.query)
+
+    def setSubstringMatching(self, enabled):
+        """Match words containing the text anywhere, not just at the start.
+        """
+
+        self.substringMatching = enabled
+        self.setQuery(self.query)
+
+    def setQuery(self, text):
+        self.beginResetModel()
+
+        self.query = text
+        caseSensitive = self.caseSensitivity == Qt.CaseSensitive
+
+        if not text:
+            self.matches = []
+        elif self.substringMatching:
+            self.matches = self.wordIndex.substringMatches(text,
+                    self.maximum, caseSensitive)
+        else:
+            self.matches = self.wordIndex.prefixMatches(text, self.maximum,
+                    caseSensitive)
+
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+
+        return len(self.matches)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.matches[index.row()]
+
+        return None
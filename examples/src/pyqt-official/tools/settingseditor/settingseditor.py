@@ -42,10 +42,12 @@
 #############################################################################
 
 
+import collections
 import sys
 
-from PyQt5.QtCore import (QByteArray, QDate, QDateTime, QEvent, QPoint, QRect,
-        QRegExp, QSettings, QSize, Qt, QTime, QTimer)
+from PyQt5.QtCore import (pyqtSignal, QByteArray, QDate, QDateTime, QEvent,
+        QFileInfo, QFileSystemWatcher, QPoint, QRect, QRegExp, QSettings,
+        QSize, Qt, QThread, QTime, QTimer)
 from PyQt5.QtGui import QColor, QIcon, QRegExpValidator, QValidator
 from PyQt5.QtWidgets import (QAbstractItemView, QAction, QApplication,
         QComboBox, QDialog, QDialogButtonBox, QFileDialog, QGridLayout,
@@ -53,6 +55,9 @@ from PyQt5.QtWidgets import (QAbstractItemView, QAction, QApplication,
         QMainWindow, QMessageBox, QStyle, QStyleOptionViewItem, QTableWidget,
         QTableWidgetItem, QTreeWidget, QTreeWidgetItem, QVBoxLayout)
 
+from settingsreader import (InsertGroup, InsertKey, Remove, SettingsReader,
+        settingsArguments, settingsFileNames)
+
 
 class MainWindow(QMainWindow):
     def __init__(self, parent=None):
@@ -72,6 +77,10 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Settings Editor")
         self.resize(500, 600)
 
+    def closeEvent(self, event):
+        self.settingsTree.setSettingsObject(None)
+        super(MainWindow, self).closeEvent(event)
+
     def openSettings(self):
         if self.locationDialog is None:
             self.locationDialog = LocationDialog(self)
@@ -347,6 +356,15 @@ class LocationDialog(QDialog):
 
 
 class SettingsTree(QTreeWidget):
+    # The number of changes applied to the tree before processing events.
+    BatchSize = 500
+
+    # Changes to the files of the settings are gathered for this number of
+    # milliseconds before the settings are read again.
+    WatchDelay = 100
+
+    refreshRequested = pyqtSignal(int, object, bool, bool)
+
     def __init__(self, parent=None):
         super(SettingsTree, self).__init__(parent)
 
@@ -361,6 +379,30 @@ class SettingsTree(QTreeWidget):
         self.refreshTimer.setInterval(2000)
         self.autoRefresh = False
 
+        # The settings are read in a separate thread, and the changes since
+        # they were last read are applied to the tree in batches.  Changes
+        # read for settings that have since been replaced are ignored.
+        self.readerThread = None
+        self.reader = None
+        self.generation = 0
+        self.reading = False
+        self.readQueued = False
+        self.resetReader = False
+        self.modified = False
+        self.changes = collections.deque()
+        self.groupItems = {}
+
+        self.applyTimer = QTimer()
+        self.applyTimer.setInterval(0)
+
+        # Files are replaced rather than rewritten by QSettings and many
+        # editors, so the directories of the files are watched too.
+        self.watcher = QFileSystemWatcher(self)
+        self.watchedFiles = {}
+        self.watchTimer = QTimer()
+        self.watchTimer.setSingleShot(True)
+        self.watchTimer.setInterval(self.WatchDelay)
+
         self.groupIcon = QIcon()
         self.groupIcon.addPixmap(self.style().standardPixmap(QStyle.SP_DirClosedIcon),
                 QIcon.Normal, QIcon.Off)
@@ -370,18 +412,35 @@ class SettingsTree(QTreeWidget):
         self.keyIcon.addPixmap(self.style().standardPixmap(QStyle.SP_FileIcon))
 
         self.refreshTimer.timeout.connect(self.maybeRefresh)
+        self.applyTimer.timeout.connect(self.applyChanges)
+        self.watcher.fileChanged.connect(self.settingsFileChanged)
+        self.watcher.directoryChanged.connect(self.settingsFileChanged)
+        self.watchTimer.timeout.connect(self.maybeRefresh)
 
     def setSettingsObject(self, settings):
         self.settings = settings
         self.clear()
 
+        self.generation += 1
+        self.reading = False
+        self.readQueued = False
+        self.resetReader = True
+        self.modified = False
+        self.changes.clear()
+        self.applyTimer.stop()
+        self.groupItems = {(): None}
+        self.unwatchFiles()
+
         if self.settings is not None:
             self.settings.setParent(self)
+            self.startReader()
+            self.watchFiles()
             self.refresh()
-            if self.autoRefresh:
+            if self.autoRefresh and not self.watchedFiles:
                 self.refreshTimer.start()
         else:
             self.refreshTimer.stop()
+            self.stopReader()
 
     def sizeHint(self):
         return QSize(800, 600)
@@ -392,7 +451,11 @@ class SettingsTree(QTreeWidget):
         if self.settings is not None:
             if self.autoRefresh:
                 self.maybeRefresh()
-                self.refreshTimer.start()
+
+                # Poll settings that aren't in files, such as those in the
+                # Windows registry.
+                if not self.watchedFiles:
+                    self.refreshTimer.start()
             else:
                 self.refreshTimer.stop()
 
@@ -409,17 +472,136 @@ class SettingsTree(QTreeWidget):
         if self.settings is None:
             return
 
+        # Read the settings again once the current read is finished.
+        if self.reading:
+            self.readQueued = True
+            return
+
+        # Save any edits so that they are read.
+        if self.modified:
+            self.settings.sync()
+            self.modified = False
+
+        self.reading = True
+        self.refreshRequested.emit(self.generation,
+                settingsArguments(self.settings),
+                self.settings.fallbacksEnabled(), self.resetReader)
+        self.resetReader = False
+
+    def startReader(self):
+        if self.readerThread is None:
+            self.readerThread = QThread()
+            self.reader = SettingsReader()
+            self.reader.moveToThread(self.readerThread)
+            self.refreshRequested.connect(self.reader.read)
+            self.reader.changesRead.connect(self.queueChanges)
+            self.readerThread.start()
+
+    def stopReader(self):
+        if self.readerThread is not None:
+            self.refreshRequested.disconnect(self.reader.read)
+            self.readerThread.quit()
+            self.readerThread.wait()
+            self.readerThread = None
+            self.reader = None
+
+    def queueChanges(self, generation, changes):
+        if generation != self.generation:
+            return
+
+        self.changes.extend(changes)
+        if self.changes:
+            self.applyTimer.start()
+
+        self.reading = False
+        if self.readQueued:
+            self.readQueued = False
+            self.refresh()
+
+    def applyChanges(self):
         # The signal might not be connected.
         try:
             self.itemChanged.disconnect(self.updateSetting)
         except:
             pass
 
-        self.settings.sync()
-        self.updateChildItems(None)
+        for i in range(min(self.BatchSize, len(self.changes))):
+            kind, path, index, name, value = self.changes.popleft()
+            parent = self.groupItems[path]
+
+            if kind == Remove:
+                self.deleteItem(parent, index)
+                for groupPath in value:
+                    del self.groupItems[groupPath]
+            elif kind == InsertGroup:
+                item = self.createItem(name, self.groupIcon)
+                self.insertItem(parent, index, item)
+                self.groupItems[path + (name, )] = item
+            elif kind == InsertKey:
+                item = self.createItem(name, self.keyIcon)
+                self.setItemValue(item, value)
+                self.insertItem(parent, index, item)
+            else:
+                self.setItemValue(self.childAt(parent, index), value)
+
+        if not self.changes:
+            self.applyTimer.stop()
 
         self.itemChanged.connect(self.updateSetting)
 
+    def watchFiles(self):
+        """Watch the files of the settings, and the directories they are in,
+        for changes.
+        """
+
+        directories = set()
+        for fileName in settingsFileNames(self.settings):
+            directory = QFileInfo(fileName).absolutePath()
+            if QFileInfo(directory).isDir():
+                directories.add(directory)
+                self.watchedFiles[fileName] = self.fileStamp(fileName)
+
+        if directories:
+            self.watcher.addPaths(sorted(directories))
+            self.rewatchFiles()
+
+    def unwatchFiles(self):
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+
+        self.watchedFiles = {}
+
+    def rewatchFiles(self):
+        # Files that have been replaced, or have just been created, aren't
+        # watched.
+        watched = self.watcher.files()
+        fileNames = [fileName for fileName in self.watchedFiles
+                if fileName not in watched and QFileInfo(fileName).exists()]
+        if fileNames:
+            self.watcher.addPaths(fileNames)
+
+    @staticmethod
+    def fileStamp(fileName):
+        info = QFileInfo(fileName)
+        if not info.exists():
+            return None
+
+        return (info.size(), info.lastModified())
+
+    def settingsFileChanged(self, path):
+        self.rewatchFiles()
+
+        changed = False
+        for fileName, stamp in self.watchedFiles.items():
+            newStamp = self.fileStamp(fileName)
+            if newStamp != stamp:
+                self.watchedFiles[fileName] = newStamp
+                changed = True
+
+        if changed and self.autoRefresh:
+            self.watchTimer.start()
+
     def event(self, event):
         if event.type() == QEvent.WindowActivate:
             if self.isActiveWindow() and self.autoRefresh:
@@ -435,74 +617,33 @@ class SettingsTree(QTreeWidget):
             key = ancestor.text(0) + '/' + key
             ancestor = ancestor.parent()
 
-        d = item.data(2, Qt.UserRole)
         self.settings.setValue(key, item.data(2, Qt.UserRole))
+        self.modified = True
 
         if self.autoRefresh:
             self.refresh()
 
-    def updateChildItems(self, parent):
-        dividerIndex = 0
-
-        for group in self.settings.childGroups():
-            childIndex = self.findChild(parent, group, dividerIndex)
-            if childIndex != -1:
-                child = self.childAt(parent, childIndex)
-                child.setText(1, '')
-                child.setText(2, '')
-                child.setData(2, Qt.UserRole, None)
-                self.moveItemForward(parent, childIndex, dividerIndex)
-            else:
-                child = self.createItem(group, parent, dividerIndex)
-
-            child.setIcon(0, self.groupIcon)
-            dividerIndex += 1
-
-            self.settings.beginGroup(group)
-            self.updateChildItems(child)
-            self.settings.endGroup()
-
-        for key in self.settings.childKeys():
-            childIndex = self.findChild(parent, key, 0)
-            if childIndex == -1 or childIndex >= dividerIndex:
-                if childIndex != -1:
-                    child = self.childAt(parent, childIndex)
-                    for i in range(child.childCount()):
-                        self.deleteItem(child, i)
-                    self.moveItemForward(parent, childIndex, dividerIndex)
-                else:
-                    child = self.createItem(key, parent, dividerIndex)
-                child.setIcon(0, self.keyIcon)
-                dividerIndex += 1
-            else:
-                child = self.childAt(parent, childIndex)
-
-            value = self.settings.value(key)
-            if value is None:
-                child.setText(1, 'Invalid')
-            else:
-                child.setText(1, value.__class__.__name__)
-            child.setText(2, VariantDelegate.displayText(value))
-            child.setData(2, Qt.UserRole, value)
-
-        while dividerIndex < self.childCount(parent):
-            self.deleteItem(parent, dividerIndex)
-
-    def createItem(self, text, parent, index):
-        after = None
-
-        if index != 0:
-            after = self.childAt(parent, index - 1)
-
-        if parent is not None:
-            item = QTreeWidgetItem(parent, after)
+    def setItemValue(self, item, value):
+        if value is None:
+            item.setText(1, 'Invalid')
         else:
-            item = QTreeWidgetItem(self, after)
+            item.setText(1, value.__class__.__name__)
+        item.setText(2, VariantDelegate.displayText(value))
+        item.setData(2, Qt.UserRole, value)
 
+    def createItem(self, text, icon):
+        item = QTreeWidgetItem()
         item.setText(0, text)
+        item.setIcon(0, icon)
         item.setFlags(item.flags() | Qt.ItemIsEditable)
         return item
 
+    def insertItem(self, parent, index, item):
+        if parent is not None:
+            parent.insertChild(index, item)
+        else:
+            self.insertTopLevelItem(index, item)
+
     def deleteItem(self, parent, index):
         if parent is not None:
             item = parent.takeChild(index)
@@ -516,22 +657,6 @@ class SettingsTree(QTreeWidget):
         else:
             return self.topLevelItem(index)
 
-    def childCount(self, parent):
-        if parent is not None:
-            return parent.childCount()
-        else:
-            return self.topLevelItemCount()
-
-    def findChild(self, parent, text, startIndex):
-        for i in range(self.childCount(parent)):
-            if self.childAt(parent, i).text(0) == text:
-                return i
-        return -1
-
-    def moveItemForward(self, parent, oldIndex, newIndex):
-        for int in range(oldIndex - newIndex):
-            self.deleteItem(parent, newIndex)
-
 
 class VariantDelegate(QItemDelegate):
     def __init__(self, parent=None):
@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Measure how the settings tree copes with large settings files.
+
+An INI file of a given number of keys, in groups of a given size, is shown
+by the SettingsTree of the example and by the tree it replaced, which reads
+the settings and updates the items in the GUI thread.  For each the time
+until the tree is filled is reported, with the longest time the event loop
+was blocked.  Then the same is reported for refreshing the tree when nothing
+has changed and when one key has been changed by another program.
+"""
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import QCommandLineOption, QCommandLineParser, QSettings, Qt
+from PyQt5.QtWidgets import QApplication, QTreeWidget, QTreeWidgetItem
+
+from settingseditor import SettingsTree, VariantDelegate
+
+
+class PollingSettingsTree(QTreeWidget):
+    """The tree as it was before the settings were read in a separate
+    thread, without the parts that don't update the items.
+    """
+
+    def __init__(self, parent=None):
+        super(PollingSettingsTree, self).__init__(parent)
+
+        self.settings = None
+
+    def setSettingsObject(self, settings):
+        self.settings = settings
+        self.clear()
+        self.refresh()
+
+    def refresh(self):
+        self.settings.sync()
+        self.updateChildItems(None)
+
+    def updateChildItems(self, parent):
+        dividerIndex = 0
+
+        for group in self.settings.childGroups():
+            childIndex = self.findChild(parent, group, dividerIndex)
+            if childIndex != -1:
+                child = self.childAt(parent, childIndex)
+                child.setText(1, '')
+                child.setText(2, '')
+                child.setData(2, Qt.UserRole, None)
+                self.moveItemForward(parent, childIndex, dividerIndex)
+            else:
+                child = self.createItem(group, parent, dividerIndex)
+
+            dividerIndex += 1
+
+            self.settings.beginGroup(group)
+            self.updateChildItems(child)
+            self.settings.endGroup()
+
+        for key in self.settings.childKeys():
+            childIndex = self.findChild(parent, key, 0)
+            if childIndex == -1 or childIndex >= dividerIndex:
+                if childIndex != -1:
+                    child = self.childAt(parent, childIndex)
+                    for i in range(child.childCount()):
+                        self.deleteItem(child, i)
+                    self.moveItemForward(parent, childIndex, dividerIndex)
+                else:
+                    child = self.createItem(key, parent, dividerIndex)
+                dividerIndex += 1
+            else:
+                child = self.childAt(parent, childIndex)
+
+            value = self.settings.value(key)
+            if value is None:
+                child.setText(1, 'Invalid')
+            else:
+                child.setText(1, value.__class__.__name__)
+            child.setText(2, VariantDelegate.displayText(value))
+            child.setData(2, Qt.UserRole, value)
+
+        while dividerIndex < self.childCount(parent):
+            self.deleteItem(parent, dividerIndex)
+
+    def createItem(self, text, parent, index):
+        after = None
+
+        if index != 0:
+            after = self.childAt(parent, index - 1)
+
+        if parent is not None:
+            item = QTreeWidgetItem(parent, after)
+        else:
+            item = QTreeWidgetItem(self, after)
+
+        item.setText(0, text)
+        item.setFlags(item.flags() | Qt.ItemIsEditable)
+        return item
+
+    def deleteItem(self, parent, index):
+        if parent is not None:
+            item = parent.takeChild(index)
+        else:
+            item = self.takeTopLevelItem(index)
+        del item
+
+    def childAt(self, parent, index):
+        if parent is not None:
+            return parent.child(index)
+        else:
+            return self.topLevelItem(index)
+
+    def childCount(self, parent):
+        if parent is not None:
+            return parent.childCount()
+        else:
+            return self.topLevelItemCount()
+
+    def findChild(self, parent, text, startIndex):
+        for i in range(self.childCount(parent)):
+            if self.childAt(parent, i).text(0) == text:
+                return i
+        return -1
+
+    def moveItemForward(self, parent, oldIndex, newIndex):
+        for int in range(oldIndex - newIndex):
+            self.deleteItem(parent, newIndex)
+
+
+def writeSettings(fileName, keyCount, groupSize):
+    settings = QSettings(fileName, QSettings.IniFormat)
+    settings.clear()
+
+    for i in range(keyCount):
+        group, key = divmod(i, groupSize)
+        settings.setValue('group%d/section%d/key%d' % (group // 10, group,
+                key), 'value %d' % i)
+
+    settings.sync()
+
+
+def changeSetting(fileName, key, value):
+    """Change a setting as another program would, and make sure that the
+    change is seen even with a coarse file modification time.
+    """
+
+    modified = os.stat(fileName).st_mtime
+
+    settings = QSettings(fileName, QSettings.IniFormat)
+    settings.setValue(key, value)
+    settings.sync()
+
+    os.utime(fileName, (modified + 2, modified + 2))
+
+
+def valueText(tree, key):
+    """Return the text of the value of a key in a SettingsTree."""
+
+    path = key.split('/')
+    parent = tree.groupItems.get(tuple(path[:-1]))
+    if parent is not None:
+        for i in range(parent.childCount() - 1, -1, -1):
+            if parent.child(i).text(0) == path[-1]:
+                return parent.child(i).text(2)
+
+    return None
+
+
+def waitUntilRefreshed(app, tree, isRefreshed=None):
+    """Process events until a SettingsTree has read the settings and applied
+    the changes, and return the time taken and the longest time that the
+    event loop was blocked.
+    """
+
+    start = time.perf_counter()
+    longest = 0.0
+    while (tree.reading or tree.changes or
+            (isRefreshed is not None and not isRefreshed())):
+        passStart = time.perf_counter()
+        app.processEvents()
+        longest = max(longest, time.perf_counter() - passStart)
+
+    return time.perf_counter() - start, longest
+
+
+def measurePolling(app, fileName, settingKey):
+    tree = PollingSettingsTree()
+    tree.show()
+    app.processEvents()
+
+    results = []
+
+    start = time.perf_counter()
+    tree.setSettingsObject(QSettings(fileName, QSettings.IniFormat))
+    app.processEvents()
+    results.append(time.perf_counter() - start)
+    results.append(results[-1])
+
+    start = time.perf_counter()
+    tree.refresh()
+    app.processEvents()
+    results.append(time.perf_counter() - start)
+    results.append(results[-1])
+
+    changeSetting(fileName, settingKey, 'changed by polling')
+    start = time.perf_counter()
+    tree.refresh()
+    app.processEvents()
+    results.append(time.perf_counter() - start)
+    results.append(results[-1])
+
+    tree.close()
+
+    return results
+
+
+def measureThreaded(app, fileName, settingKey):
+    tree = SettingsTree()
+    tree.setAutoRefresh(True)
+    tree.show()
+    app.processEvents()
+
+    results = []
+
+    start = time.perf_counter()
+    tree.setSettingsObject(QSettings(fileName, QSettings.IniFormat))
+    blocked = time.perf_counter() - start
+    elapsed, longest = waitUntilRefreshed(app, tree)
+    results.extend([blocked + elapsed, max(blocked, longest)])
+
+    start = time.perf_counter()
+    tree.refresh()
+    blocked = time.perf_counter() - start
+    elapsed, longest = waitUntilRefreshed(app, tree)
+    results.extend([blocked + elapsed, max(blocked, longest)])
+
+    # The change is noticed by watching the file.
+    changeSetting(fileName, settingKey, 'changed by watching')
+    results.extend(waitUntilRefreshed(app, tree,
+            lambda: valueText(tree, settingKey) == 'changed by watching'))
+
+    tree.setSettingsObject(None)
+    tree.close()
+
+    return results
+
+
+if __name__ == '__main__':
+
+    app = QApplication(sys.argv)
+
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(
+            "Measure how the settings tree copes with large settings files.")
+    parser.addHelpOption()
+    keysOption = QCommandLineOption(['k', 'keys'],
+            "Use files of the comma separated numbers of <keys>.", 'keys',
+            '1000,10000,50000')
+    parser.addOption(keysOption)
+    groupOption = QCommandLineOption(['g', 'group-size'],
+            "Put <keys> keys in each group.", 'keys', '500')
+    parser.addOption(groupOption)
+    pollingOption = QCommandLineOption(['p', 'polling-keys'],
+            "Use the polling tree for files of up to <keys> keys.", 'keys',
+            '50000')
+    parser.addOption(pollingOption)
+    parser.process(app)
+
+    groupSize = int(parser.value(groupOption))
+    pollingKeys = int(parser.value(pollingOption))
+    directory = tempfile.mkdtemp()
+
+    print("All times are in seconds, each followed by the longest time that "
+            "the event loop")
+    print("was blocked.  A key changed by another program is noticed by the "
+            "threaded tree")
+    print("watching the file, and by the polling tree when it is next "
+            "refreshed.")
+    print()
+    print("%6s %-9s %15s %15s %15s" % ("keys", "tree", "open",
+            "refresh", "changed key"))
+
+    try:
+        for keyCount in [int(k) for k in parser.value(keysOption).split(',')]:
+            fileName = os.path.join(directory, 'settings-%d.ini' % keyCount)
+            settingKey = 'group0/section0/key%d' % (
+                    min(keyCount, groupSize) // 2)
+
+            modes = [("threaded", measureThreaded)]
+            if keyCount <= pollingKeys:
+                modes.append(("polling", measurePolling))
+
+            for name, measure in modes:
+                writeSettings(fileName, keyCount, groupSize)
+                results = measure(app, fileName, settingKey)
+                print("%6d %-9s %7.3f/%-7.3f %7.3f/%-7.3f %7.3f/%-7.3f" % (
+                        (keyCount, name) + tuple(results)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
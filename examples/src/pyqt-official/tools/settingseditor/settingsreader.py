@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+
+
+#############################################################################
+##
+## Copyright (C) 2013 Riverbank Computing Limited.
+## All rights reserved.
+##
+## This file is part of the examples of PyQt.
+##
+## $QT_BEGIN_LICENSE:BSD$
+## You may use this file under the terms of the BSD license as follows:
+##
+## "Redistribution and use in source and binary forms, with or without
+## modification, are permitted provided that the following conditions are
+## met:
+##   * Redistributions of source code must retain the above copyright
+##     notice, this list of conditions and the following disclaimer.
+##   * Redistributions in binary form must reproduce the above copyright
+##     notice, this list of conditions and the following disclaimer in
+##     the documentation and/or other materials provided with the
+##     distribution.
+##   * Neither the name of Nokia Corporation and its Subsidiary(-ies) nor
+##     the names of its contributors may be used to endorse or promote
+##     products derived from this software without specific prior written
+##     permission.
+##
+## THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+## "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+## LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+## A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+## OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+## SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+## LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+## DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+## THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+## (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+## OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE."
+## $QT_END_LICENSE$
+##
+#############################################################################
+
+
+
+"""Snapshots of settings read in a worker thread, and the changes that turn
+the tree of one snapshot into that of the next.
+
+A snapshot records the groups and keys of every group of some settings, and
+the values of the keys, in the order QSettings gives them.  The changes
+between two snapshots are a list of tuples of the kind of change, the path of
+the parent group, the index of the child in the parent, its name and, for a
+key, its value.  For each group the changes remove children from the highest
+index down, then insert and change children from the lowest index up, before
+the changes within its groups.  Applied in order they leave the children of
+every group in the order of the new snapshot.
+"""
+
+
+from PyQt5.QtCore import pyqtSignal, pyqtSlot, QObject, QSettings
+
+
+# The kinds of change.
+Remove, InsertGroup, InsertKey, Change = range(4)
+
+# The kinds of children of a group, groups coming before keys.
+Group, Key = range(2)
+
+
+class Snapshot(object):
+    __slots__ = ('groups', 'keys')
+
+    def __init__(self):
+        # Dictionaries keep the order the names were read in.
+        self.groups = {}
+        self.keys = {}
+
+    def children(self):
+        return ([(Group, name) for name in self.groups] +
+                [(Key, name) for name in self.keys])
+
+    def groupPaths(self, path):
+        """Yield the path of the group and those of all of its groups."""
+
+        yield path
+
+        for name, group in self.groups.items():
+            for groupPath in group.groupPaths(path + (name, )):
+                yield groupPath
+
+
+def settingsArguments(settings):
+    """Return the arguments that create a QSettings object for the same
+    settings as another, as a QSettings object can only be used in one
+    thread.
+    """
+
+    if settings.organizationName():
+        return (settings.format(), settings.scope(),
+                settings.organizationName(), settings.applicationName())
+
+    return (settings.fileName(), settings.format())
+
+
+def settingsFileNames(settings):
+    """Return the names of the files that some settings may be read from,
+    which include those that are fallbacks for them.
+    """
+
+    fileNames = [settings.fileName()]
+
+    organization = settings.organizationName()
+    if organization:
+        if settings.scope() == QSettings.UserScope:
+            scopes = [QSettings.UserScope, QSettings.SystemScope]
+        else:
+            scopes = [QSettings.SystemScope]
+
+        applications = ['']
+        if settings.applicationName():
+            applications.insert(0, settings.applicationName())
+
+        for scope in scopes:
+            for application in applications:
+                fileName = QSettings(settings.format(), scope, organization,
+                        application).fileName()
+                if fileName not in fileNames:
+                    fileNames.append(fileName)
+
+    return fileNames
+
+
+def readSnapshot(settings):
+    """Return a snapshot of the current group of some settings."""
+
+    snapshot = Snapshot()
+
+    for group in settings.childGroups():
+        settings.beginGroup(group)
+        snapshot.groups[group] = readSnapshot(settings)
+        settings.endGroup()
+
+    for key in settings.childKeys():
+        snapshot.keys[key] = settings.value(key)
+
+    return snapshot
+
+
+def sameValue(value1, value2):
+    return type(value1) is type(value2) and value1 == value2
+
+
+def diffSnapshots(old, new, path=(), changes=None):
+    """Return the changes that turn the tree of an old snapshot into that of
+    a new one.  Instead of a value, the removal of a group has a list of the
+    paths of the group and of all the groups within it.
+    """
+
+    if changes is None:
+        changes = []
+
+    oldChildren = old.children()
+    newChildren = new.children()
+
+    # The children in both are kept if they are in the same order, which
+    # they are unless QSettings has changed how it orders them.
+    newSet = set(newChildren)
+    kept = [child for child in oldChildren if child in newSet]
+    oldSet = set(oldChildren)
+    if kept != [child for child in newChildren if child in oldSet]:
+        kept = []
+    kept = set(kept)
+
+    for index in range(len(oldChildren) - 1, -1, -1):
+        child = oldChildren[index]
+        if child not in kept:
+            kind, name = child
+            if kind == Group:
+                groupPaths = list(old.groups[name].groupPaths(
+                        path + (name, )))
+            else:
+                groupPaths = []
+            changes.append((Remove, path, index, name, groupPaths))
+
+    for index, child in enumerate(newChildren):
+        kind, name = child
+        if child in kept:
+            if kind == Key and not sameValue(old.keys[name], new.keys[name]):
+                changes.append((Change, path, index, name, new.keys[name]))
+        elif kind == Group:
+            changes.append((InsertGroup, path, index, name, None))
+        else:
+            changes.append((InsertKey, path, index, name, new.keys[name]))
+
+    for name, group in new.groups.items():
+        if (Group, name) in kept:
+            oldGroup = old.groups[name]
+        else:
+            oldGroup = Snapshot()
+
+        diffSnapshots(oldGroup, group, path + (name, ), changes)
+
+    return changes
+
+
+class SettingsReader(QObject):
+    """Read snapshots of settings in the thread the reader is moved to, and
+    report the changes since the last snapshot.
+    """
+
+    changesRead = pyqtSignal(int, object)
+
+    def __init__(self, parent=None):
+        super(SettingsReader, self).__init__(parent)
+
+        self.snapshot = Snapshot()
+
+    @pyqtSlot(int, object, bool, bool)
+    def read(self, generation, arguments, fallbacksEnabled, reset):
+        """Read the settings that QSettings creates from some arguments.  If
+        reset is True the changes are those from having no settings.
+        """
+
+        if reset:
+            self.snapshot = Snapshot()
+
+        settings = QSettings(*arguments)
+        settings.setFallbacksEnabled(fallbacksEnabled)
+        settings.sync()
+        snapshot = readSnapshot(settings)
+
+        changes = diffSnapshots(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        self.changesRead.emit(generation, changes)